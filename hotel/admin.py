@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import Building, Floor, Room, Category, Product, Order, OrderItem
+from .models import (
+    Building, Floor, Room, Category, Product, Order, OrderItem, TelegramOutbox, SalesRollup,
+    ArchivedOrder, ArchivedOrderItem, CartItem, SlugRedirect,
+)
 
 
 @admin.register(Building)
@@ -59,5 +62,46 @@ class OrderAdmin(admin.ModelAdmin):
     date_hierarchy = 'created_at'
 
 
+@admin.register(TelegramOutbox)
+class TelegramOutboxAdmin(admin.ModelAdmin):
+    list_display = ['id', 'kind', 'order', 'status', 'attempts', 'next_attempt_at', 'sent_at']
+    list_filter = ['kind', 'status']
+    readonly_fields = ['created_at', 'sent_at']
+    raw_id_fields = ['order']
 
 
+@admin.register(SalesRollup)
+class SalesRollupAdmin(admin.ModelAdmin):
+    list_display = ['hour', 'location_type', 'location_id', 'product', 'orders', 'quantity', 'revenue']
+    list_filter = ['location_type']
+    raw_id_fields = ['product']
+    date_hierarchy = 'hour'
+
+
+class ArchivedOrderItemInline(admin.TabularInline):
+    model = ArchivedOrderItem
+    extra = 0
+    raw_id_fields = ['product']
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(admin.ModelAdmin):
+    list_display = ['id', 'location', 'total_price', 'status', 'created_at', 'archived_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['id', 'location']
+    readonly_fields = ['archived_at']
+    inlines = [ArchivedOrderItemInline]
+
+
+@admin.register(CartItem)
+class CartItemAdmin(admin.ModelAdmin):
+    list_display = ['session_key', 'location_type', 'location_id', 'product', 'quantity', 'updated_at']
+    list_filter = ['location_type']
+    raw_id_fields = ['product']
+
+
+@admin.register(SlugRedirect)
+class SlugRedirectAdmin(admin.ModelAdmin):
+    list_display = ['old_slug', 'location_type', 'location_id', 'created_at']
+    list_filter = ['location_type']
+    search_fields = ['old_slug']
@@ -1,4 +1,4 @@
-from django.urls import path
+from django.urls import path, re_path
 from . import api_views
 
 urlpatterns = [
@@ -6,5 +6,10 @@ urlpatterns = [
     path('orders/live/', api_views.orders_live, name='orders_live'),
     path('notifications/unviewed/', api_views.unviewed_orders, name='unviewed_orders'),
     path('orders/<int:order_id>/mark-viewed/', api_views.mark_order_viewed, name='mark_order_viewed'),
+    # Статус заказа гостя: только вместе с местом доставки, как на странице статуса
+    re_path(
+        r'^orders/(?P<location_type>room|floor|building)/(?P<slug>[-\w]+)/(?P<order_id>\d+)/status/$',
+        api_views.order_status_poll, name='order_status_poll',
+    ),
 ]
 
@@ -1,9 +1,19 @@
-from django.http import JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, HttpResponseNotAllowed
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_http_methods
+from django.views.decorators.http import require_http_methods, condition
+from datetime import datetime, timedelta, timezone as dt_timezone
+from asgiref.sync import sync_to_async
+import asyncio
 import json
 from .models import Order
-from .utils import update_order_status_telegram
+from .utils import enqueue_order_status_update, enqueue_callback_answer
+from .archive import maybe_archive_orders
+from .locations import resolve_location
+from .realtime import (
+    live_orders_queryset, serialize_order, serialize_notification, serialize_order_status,
+    publish_order_event, get_orders_version, ORDER_STATUS_CHANGED, ORDER_VIEWED,
+)
 
 
 @csrf_exempt
@@ -41,23 +51,18 @@ def telegram_webhook(request):
                     if new_status == 'done':
                         order.is_archived = True
                     order.save()
+                    publish_order_event(order, ORDER_STATUS_CHANGED)
                     
-                    # Обновляем сообщение в Telegram
-                    update_order_status_telegram(order)
+                    # Обновляем сообщение и отвечаем на callback через очередь,
+                    # чтобы webhook отвечал Telegram сразу
+                    enqueue_order_status_update(order)
                     
-                    # Отвечаем на callback
-                    from django.conf import settings
-                    import requests
-                    
-                    bot_token = settings.TELEGRAM_BOT_TOKEN
                     callback_id = callback_query.get('id')
-                    
-                    if bot_token and callback_id:
-                        url = f"https://api.telegram.org/bot{bot_token}/answerCallbackQuery"
-                        requests.post(url, json={
-                            "callback_query_id": callback_id,
-                            "text": f"Статус изменен на: {order.get_status_display()}"
-                        })
+                    if callback_id:
+                        enqueue_callback_answer(
+                            callback_id,
+                            f"Статус изменен на: {order.get_status_display()}"
+                        )
         
         return JsonResponse({'ok': True})
     except Exception as e:
@@ -65,121 +70,122 @@ def telegram_webhook(request):
         return JsonResponse({'ok': False, 'error': str(e)})
 
 
+# Перекрытие окна ?since=: заказ, сохраненный до курсора, но закоммиченный
+# после него, все равно попадет в следующую дельту
+SINCE_OVERLAP = timedelta(seconds=5)
+DELTA_LIMIT = 200
+
+
+def parse_since(request):
+    """Курсор ?since= (версия заказов в наносекундах) -> граница по updated_at"""
+    since = request.GET.get('since', '')
+    if not since.isdigit():
+        return None
+    return datetime.fromtimestamp(int(since) / 1e9, tz=dt_timezone.utc) - SINCE_OVERLAP
+
+
+def orders_etag(request, *args, **kwargs):
+    """ETag меняется только при изменении заказов (и параметров запроса)"""
+    if not request.user.is_authenticated:
+        return None
+    # До проверки If-None-Match: иначе опросы с ответом 304 архивацию не запускают,
+    # а заказы, ушедшие в архив, меняют версию и ETag
+    maybe_archive_orders()
+    return f"{get_orders_version()}-{request.GET.get('status', '')}-{request.GET.get('since', '')}"
+
+
 @require_http_methods(["GET"])
+@condition(etag_func=orders_etag)
 def orders_live(request):
-    """API для получения списка заказов в реальном времени"""
-    from django.contrib.auth.decorators import login_required
-    from django.utils.decorators import method_decorator
-    
+    """
+    API для получения списка заказов в реальном времени
+
+    Без параметров возвращает 50 последних активных заказов. С ?since=<cursor>
+    возвращает только заказы, измененные после курсора (включая ушедшие в
+    архив - клиент убирает их сам). С ?status= дельта содержит только заказы
+    этого статуса, а id остальных измененных заказов приходят в removed.
+    Если ничего не менялось, отвечает 304.
+    """
     if not request.user.is_authenticated:
         return JsonResponse({'orders': []})
     
+    cursor = get_orders_version()
     status_filter = request.GET.get('status', '')
+    since = parse_since(request)
+    
+    if since is not None:
+        changed = list(
+            live_orders_queryset().filter(updated_at__gte=since).order_by('-updated_at')[:DELTA_LIMIT + 1]
+        )
+        if len(changed) <= DELTA_LIMIT:
+            removed = []
+            if status_filter:
+                # Заказы, ушедшие из фильтра (другой статус или архив), клиент удаляет по id
+                removed = [order.id for order in changed if order.status != status_filter or order.is_archived]
+                changed = [order for order in changed if order.status == status_filter and not order.is_archived]
+            return JsonResponse({
+                'orders': [serialize_order(order) for order in changed],
+                'removed': removed,
+                'cursor': str(cursor),
+                'delta': True,
+            })
+        # Изменений слишком много - проще отдать полный список
     
-    orders = Order.objects.filter(is_archived=False).select_related('room', 'room__floor', 'room__floor__building', 'building', 'floor', 'floor__building').prefetch_related('items__product').order_by('-created_at')
+    orders = live_orders_queryset().live().order_by('-created_at')
     
     if status_filter:
         orders = orders.filter(status=status_filter)
     
     orders = orders[:50]
     
-    orders_data = []
-    for order in orders:
-        if order.room:
-            room_info = f"{order.room.number}"
-            if order.room.floor and order.room.floor.building:
-                room_info += f" ({order.room.floor.building.name}, {order.room.floor.name})"
-            elif order.room.floor:
-                room_info += f" ({order.room.floor.name})"
-            room_number = order.room.number
-            building_name = order.room.floor.building.name if order.room.floor and order.room.floor.building else None
-            floor_number = order.room.floor.name if order.room.floor else None
-        elif order.building:
-            room_info = f"Корпус {order.building.name}"
-            room_number = None
-            building_name = order.building.name
-            floor_number = None
-        elif order.floor:
-            room_info = f"Этаж {order.floor.name}"
-            room_number = None
-            building_name = order.floor.building.name if order.floor.building else None
-            floor_number = order.floor.name
-        else:
-            room_info = "Не указано"
-            room_number = None
-            building_name = None
-            floor_number = None
-        
-        items_data = []
-        for item in order.items.all():
-            items_data.append({
-                'name': item.product.name,
-                'quantity': item.quantity,
-                'price': float(item.price_at_moment),
-            })
-        
-        orders_data.append({
-            'id': order.id,
-            'room': room_info,
-            'room_number': room_number,
-            'building': building_name,
-            'floor': floor_number,
-            'total_price': float(order.total_price),
-            'status': order.status,
-            'status_display': order.get_status_display(),
-            'created_at': order.created_at.strftime('%H:%M:%S'),
-            'items': items_data,
-            'items_count': len(items_data),
-        })
-    
-    return JsonResponse({'orders': orders_data})
+    orders_data = [serialize_order(order) for order in orders]
+    
+    return JsonResponse({'orders': orders_data, 'cursor': str(cursor), 'delta': False})
 
 
 @require_http_methods(["GET"])
+@condition(etag_func=orders_etag)
 def unviewed_orders(request):
-    """API для получения непросмотренных заказов"""
+    """
+    API для получения непросмотренных заказов
+
+    С ?since=<cursor> возвращает только новые/измененные уведомления и список
+    removed с заказами, которые больше не требуют внимания.
+    """
     if not request.user.is_authenticated:
         return JsonResponse({'notifications': [], 'count': 0})
     
-    orders = Order.objects.filter(
-        is_archived=False,
-        is_viewed=False
-    ).select_related('room', 'room__floor', 'room__floor__building', 'building', 'floor', 'floor__building').prefetch_related('items__product').order_by('-created_at')[:20]
-    
-    notifications = []
-    for order in orders:
-        if order.room:
-            room_info = f"{order.room.number}"
-            if order.room.floor and order.room.floor.building:
-                room_info += f" ({order.room.floor.building.name}, {order.room.floor.name})"
-            elif order.room.floor:
-                room_info += f" ({order.room.floor.name})"
-        elif order.building:
-            room_info = f"Корпус {order.building.name}"
-        elif order.floor:
-            room_info = f"Этаж {order.floor.name}"
-        else:
-            room_info = "Не указано"
-        
-        items_summary = []
-        for item in order.items.all()[:3]:
-            items_summary.append(f"{item.product.name} x{item.quantity}")
-        if order.items.count() > 3:
-            items_summary.append(f"+{order.items.count() - 3} еще")
-        
-        notifications.append({
-            'order_id': order.id,
-            'title': f'Новый заказ #{order.id}',
-            'message': f'Комната {room_info} • {order.total_price} ₽',
-            'items': items_summary,
-            'time': order.created_at.strftime('%H:%M:%S'),
-            'status': order.status,
-            'created_at_timestamp': int(order.created_at.timestamp()),
-        })
+    cursor = get_orders_version()
+    since = parse_since(request)
+    unviewed = Order.objects.unviewed()
+    
+    if since is not None:
+        changed = list(
+            live_orders_queryset().filter(updated_at__gte=since).order_by('-updated_at')[:DELTA_LIMIT + 1]
+        )
+        if len(changed) <= DELTA_LIMIT:
+            # Выборка идет по индексу updated_at, уведомления - от новых к старым
+            changed.sort(key=lambda order: order.created_at, reverse=True)
+            return JsonResponse({
+                'notifications': [
+                    serialize_notification(order) for order in changed
+                    if not order.is_viewed and not order.is_archived
+                ],
+                'removed': [order.id for order in changed if order.is_viewed or order.is_archived],
+                'count': unviewed.count(),
+                'cursor': str(cursor),
+                'delta': True,
+            })
+    
+    orders = live_orders_queryset().unviewed().order_by('-created_at')[:20]
+    
+    notifications = [serialize_notification(order) for order in orders]
     
     return JsonResponse({
         'notifications': notifications,
-        'count': len(notifications)
+        'count': unviewed.count(),
+        'cursor': str(cursor),
+        'delta': False,
     })
 
 
@@ -193,7 +199,62 @@ def mark_order_viewed(request, order_id):
         order = Order.objects.get(id=order_id)
         order.is_viewed = True
         order.save()
+        publish_order_event(order, ORDER_VIEWED)
         return JsonResponse({'success': True})
     except Order.DoesNotExist:
         return JsonResponse({'success': False, 'error': 'Order not found'})
 
+
+# Long-poll статуса заказа: сколько держать запрос и как часто проверять версию
+STATUS_POLL_TIMEOUT = 25
+STATUS_POLL_INTERVAL = 1
+# Без ASGI ожидание заняло бы синхронного воркера: ответ сразу, клиент
+# повторяет запрос через столько секунд
+STATUS_POLL_RETRY = 5
+
+
+async def order_status_poll(request, location_type, slug, order_id):
+    """
+    Статус заказа для страницы гостя (если WebSocket недоступен).
+
+    ?status= - статус, который уже показан гостю. Под ASGI это long-poll:
+    ответ приходит, как только статус изменится, или через
+    STATUS_POLL_TIMEOUT секунд; пока заказы не менялись, ожидание стоит
+    одного чтения версии из кэша в секунду, без БД. Под WSGI (gunicorn с
+    синхронными воркерами) ответ приходит сразу, с интервалом retry для
+    следующего запроса. Заказ ищется так же, как на странице статуса:
+    только среди заказов места доставки из адреса.
+    """
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    
+    location = await sync_to_async(resolve_location)(location_type, slug=slug)
+    if location is None:
+        return JsonResponse({'error': 'Order not found'}, status=404)
+    orders = Order.objects.filter(pk=order_id, **location.order_filter())
+    
+    if not isinstance(request, ASGIRequest):
+        order = await orders.afirst()
+        if order is None:
+            return JsonResponse({'error': 'Order not found'}, status=404)
+        return JsonResponse({**serialize_order_status(order), 'retry': STATUS_POLL_RETRY})
+    
+    known_status = request.GET.get('status', '')
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + STATUS_POLL_TIMEOUT
+    version = None
+    
+    while True:
+        current_version = await sync_to_async(get_orders_version)()
+        if current_version != version:
+            version = current_version
+            order = await orders.afirst()
+            if order is None:
+                return JsonResponse({'error': 'Order not found'}, status=404)
+            if order.status != known_status:
+                break
+        if loop.time() >= deadline:
+            break
+        await asyncio.sleep(STATUS_POLL_INTERVAL)
+    
+    return JsonResponse(serialize_order_status(order))
@@ -5,6 +5,9 @@ class HotelConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'hotel'
 
+    def ready(self):
+        from . import signals  # noqa: F401
+
 
 
 
@@ -0,0 +1,141 @@
+"""
+Автоматическая архивация выполненных заказов.
+
+Заказ, который провел в статусе "done" дольше ORDER_AUTO_ARCHIVE_MINUTES,
+получает is_archived=True и пропадает из живых запросов дашборда, поэтому
+они работают с активными заказами, а не со всей историей. Архивация идет
+порциями: командой archive_orders (по расписанию) и из запросов дашборда не
+чаще раза в ORDER_AUTO_ARCHIVE_INTERVAL секунд (maybe_archive_orders).
+
+Очень старые заказы можно дополнительно перенести в таблицы ArchivedOrder и
+ArchivedOrderItem (ORDER_ARCHIVE_MOVE_DAYS).
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Order, ArchivedOrder, ArchivedOrderItem
+from .realtime import bump_orders_version, publish_orders_archived, get_order_location
+from .sales import keep_sales_on_delete
+
+ARCHIVE_LOCK_KEY = 'orders:auto_archive'
+
+
+def archive_done_orders(after_minutes=None, batch_size=500, max_batches=None):
+    """
+    Архивирует заказы, выполненные больше after_minutes минут назад.
+
+    Время в статусе "done" считается по updated_at (смена статуса - последнее
+    изменение выполненного заказа). Возвращает число архивированных заказов.
+    """
+    if after_minutes is None:
+        after_minutes = getattr(settings, 'ORDER_AUTO_ARCHIVE_MINUTES', 0)
+    if after_minutes <= 0:
+        return 0
+
+    cutoff = timezone.now() - timedelta(minutes=after_minutes)
+    archived = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        with transaction.atomic():
+            order_ids = list(
+                Order.objects.live().filter(status='done', updated_at__lt=cutoff)
+                .order_by('id').values_list('id', flat=True)[:batch_size]
+            )
+            if not order_ids:
+                break
+            # update() не вызывает auto_now: updated_at выставляем сами,
+            # чтобы изменение попало в дельты ?since= дашборда
+            count = Order.objects.filter(pk__in=order_ids, is_archived=False).update(
+                is_archived=True, updated_at=timezone.now(),
+            )
+            transaction.on_commit(bump_orders_version)
+            publish_orders_archived(order_ids)
+        archived += count
+        batches += 1
+        if len(order_ids) < batch_size:
+            break
+    return archived
+
+
+def move_old_orders(after_days=None, batch_size=500, max_batches=None):
+    """
+    Переносит архивные заказы старше after_days дней в ArchivedOrder/ArchivedOrderItem.
+
+    Сводка продаж при этом не меняется. Возвращает число перенесенных заказов.
+    """
+    if after_days is None:
+        after_days = getattr(settings, 'ORDER_ARCHIVE_MOVE_DAYS', 0)
+    if after_days <= 0:
+        return 0
+
+    cutoff = timezone.now() - timedelta(days=after_days)
+    moved = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        with transaction.atomic():
+            orders = list(
+                Order.objects.filter(is_archived=True, created_at__lt=cutoff)
+                .select_related('room', 'room__floor', 'room__floor__building', 'building', 'floor', 'floor__building')
+                .prefetch_related('items__product')
+                .order_by('id')[:batch_size]
+            )
+            if not orders:
+                break
+
+            ArchivedOrder.objects.bulk_create([
+                ArchivedOrder(
+                    id=order.id,
+                    room_id=order.room_id,
+                    building_id=order.building_id,
+                    floor_id=order.floor_id,
+                    location=get_order_location(order)[0],
+                    total_price=order.total_price,
+                    status=order.status,
+                    created_at=order.created_at,
+                    updated_at=order.updated_at,
+                )
+                for order in orders
+            ])
+            ArchivedOrderItem.objects.bulk_create([
+                ArchivedOrderItem(
+                    order_id=order.id,
+                    product_id=item.product_id,
+                    product_name=item.product.name,
+                    quantity=item.quantity,
+                    price_at_moment=item.price_at_moment,
+                )
+                for order in orders
+                for item in order.items.all()
+            ])
+
+            with keep_sales_on_delete():
+                Order.objects.filter(pk__in=[order.id for order in orders]).delete()
+        moved += len(orders)
+        batches += 1
+        if len(orders) < batch_size:
+            break
+    return moved
+
+
+def maybe_archive_orders():
+    """
+    Периодическая архивация из запросов дашборда.
+
+    Выполняется не чаще раза в ORDER_AUTO_ARCHIVE_INTERVAL секунд на все
+    воркеры (блокировка через общий кэш) и обрабатывает одну порцию заказов,
+    так что задержка запроса ограничена.
+    """
+    interval = getattr(settings, 'ORDER_AUTO_ARCHIVE_INTERVAL', 300)
+    if interval <= 0 or getattr(settings, 'ORDER_AUTO_ARCHIVE_MINUTES', 0) <= 0:
+        return 0
+    if not cache.add(ARCHIVE_LOCK_KEY, timezone.now().timestamp(), interval):
+        return 0
+    try:
+        return archive_done_orders(batch_size=200, max_batches=1)
+    except Exception as e:
+        print(f"Error archiving orders: {e}")
+        return 0
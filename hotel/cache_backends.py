@@ -0,0 +1,69 @@
+"""
+Файловый кэш без случайной очистки бессрочных ключей.
+
+FileBasedCache на каждой записи перечисляет весь каталог кэша, а после
+MAX_ENTRIES файлов удаляет случайную треть - вместе с бессрочными версиями
+меню, заказов, мест и настроек. После этого все снимки и курсоры ?since=
+разом устаревают. FileCache:
+
+- проверяет размер каталога не чаще раза в CULL_INTERVAL секунд на процесс;
+- сначала удаляет просроченные файлы;
+- если файлов все еще больше MAX_ENTRIES, удаляет случайную часть только
+  среди ключей со сроком жизни; бессрочные ключи (timeout=None) остаются.
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'hotel.cache_backends.FileCache',
+            'LOCATION': '/path/to/cache',
+            'OPTIONS': {'MAX_ENTRIES': 100000, 'CULL_INTERVAL': 60},
+        },
+    }
+"""
+import pickle
+import random
+import time
+
+from django.core.cache.backends.filebased import FileBasedCache
+
+
+class FileCache(FileBasedCache):
+    """FileBasedCache с редкой очисткой, не трогающей бессрочные ключи"""
+
+    def __init__(self, dir, params):
+        options = dict(params.get('OPTIONS') or {})
+        self.cull_interval = options.pop('CULL_INTERVAL', 60)
+        super().__init__(dir, {**params, 'OPTIONS': options})
+        self._last_cull = 0
+
+    def _cull(self):
+        now = time.monotonic()
+        if now - self._last_cull < self.cull_interval:
+            return
+        self._last_cull = now
+
+        filelist = self._list_cache_files()
+        if len(filelist) < self._max_entries:
+            return
+
+        remaining = 0
+        expiring = []
+        for fname in filelist:
+            try:
+                with open(fname, 'rb') as f:
+                    if self._is_expired(f):
+                        continue
+                    remaining += 1
+                    f.seek(0)
+                    if pickle.load(f) is not None:
+                        expiring.append(fname)
+            except (OSError, EOFError, pickle.UnpicklingError):
+                continue
+
+        if remaining < self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            count = len(expiring)
+        else:
+            count = max(remaining - self._max_entries, len(expiring) // self._cull_frequency)
+        for fname in random.sample(expiring, min(count, len(expiring))):
+            self._delete(fname)
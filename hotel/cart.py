@@ -0,0 +1,366 @@
+"""
+Корзина гостя.
+
+Раньше корзина лежала в request.session['cart'], и каждый клик "+"/"-"
+перезаписывал строку сессии целиком, а параллельные AJAX-запросы с одного
+телефона затирали изменения друг друга. Теперь корзина хранится отдельно
+от сессии - по ключу сессии и месту доставки (номер, корпус, этаж) - и
+меняется атомарными операциями:
+
+    add     - изменить количество на quantity (может быть отрицательным)
+    set     - установить количество
+    remove  - убрать блюдо
+    clear   - очистить корзину
+
+Хранилище выбирается настройкой CART_STORE:
+
+    hotel.cart.DatabaseCartStore - таблица CartItem (по умолчанию, работает
+        с любым кэшем, атомарность обеспечивает UPDATE ... SET quantity = quantity + n;
+        пакет операций выполняется постоянным числом запросов)
+    hotel.cart.CacheCartStore - ключи в кэше с cache.incr; атомарно только с
+        кэшем, у которого incr атомарный (Redis, Memcached), но не с FileBasedCache
+
+У каждой корзины есть версия в кэше: она меняется при каждом изменении и
+входит в ETag ответа корзины (опрос без изменений получает 304).
+"""
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .menu_cache import get_menu_categories, get_menu_version
+from .models import CartItem, Product
+
+CART_OPERATIONS = ('add', 'set', 'remove', 'clear')
+CART_MAX_OPERATIONS = 100
+CART_MAX_QUANTITY = 99
+
+
+class CartError(Exception):
+    """Операция с корзиной не может быть выполнена (неизвестное блюдо, неверные данные)"""
+
+
+def cart_timeout():
+    """Сколько живет брошенная корзина: столько же, сколько сессия"""
+    return getattr(settings, 'SESSION_COOKIE_AGE', 60 * 60 * 24)
+
+
+class CartStore:
+    """
+    Базовое хранилище корзины одной сессии для одного места доставки.
+
+    Наследники реализуют get_lines и apply.
+    """
+
+    def __init__(self, session_key, location_type, location_id):
+        self.session_key = session_key
+        self.location_type = location_type
+        self.location_id = location_id
+        self.key_prefix = f'cart:{session_key}:{location_type}:{location_id}'
+
+    def get_lines(self):
+        """Содержимое корзины: {product_id: quantity}"""
+        raise NotImplementedError
+
+    def apply(self, operations):
+        """
+        Выполняет список уже проверенных операций (см. parse_operations)
+        и один раз меняет версию корзины.
+        """
+        raise NotImplementedError
+
+    def get_version(self):
+        """Версия корзины (создается при первом обращении)"""
+        key = f'{self.key_prefix}:version'
+        version = cache.get(key)
+        if version is None:
+            version = time.time_ns()
+            if not cache.add(key, version, cart_timeout()):
+                version = cache.get(key, version)
+        return version
+
+    def bump_version(self):
+        version = time.time_ns()
+        cache.set(f'{self.key_prefix}:version', version, cart_timeout())
+        return version
+
+
+class DatabaseCartStore(CartStore):
+    """Корзина в таблице CartItem"""
+
+    def lines_queryset(self):
+        return CartItem.objects.filter(
+            session_key=self.session_key,
+            location_type=self.location_type,
+            location_id=self.location_id,
+        )
+
+    def get_lines(self):
+        return dict(
+            self.lines_queryset().filter(quantity__gt=0).order_by('id').values_list('product_id', 'quantity')
+        )
+
+    def apply(self, operations):
+        """
+        Пакет операций - постоянное число запросов, без чтения корзины:
+        INSERT ... ON CONFLICT DO NOTHING для новых блюд, один UPDATE
+        (quantity = quantity + n или = n по каждому блюду) и, если что-то
+        удаляется, один DELETE.
+        Несколько add одного блюда складываются в одно изменение.
+        """
+        if not operations:
+            return
+        cleared = False
+        # product_id -> ('add', n) или ('set', n)
+        changes = {}
+        for op, product_id, quantity in operations:
+            if op == 'clear':
+                cleared = True
+                changes = {}
+            elif op == 'add':
+                kind, value = changes.get(product_id, ('set', 0) if cleared else ('add', 0))
+                changes[product_id] = (kind, max(value + quantity, 0) if kind == 'set' else value + quantity)
+            elif op == 'set':
+                changes[product_id] = ('set', max(quantity, 0))
+            elif op == 'remove':
+                changes[product_id] = ('set', 0)
+
+        # Блюда, которые останутся в корзине или изменятся на n
+        updated = {
+            product_id: (kind, value) for product_id, (kind, value) in changes.items()
+            if value > 0 or (kind == 'add' and value)
+        }
+        added = [product_id for product_id, (kind, value) in updated.items() if value > 0]
+        with transaction.atomic():
+            if added:
+                # Строки-заготовки для новых блюд; параллельно созданная строка не мешает
+                CartItem.objects.bulk_create([
+                    CartItem(
+                        session_key=self.session_key,
+                        location_type=self.location_type,
+                        location_id=self.location_id,
+                        product_id=product_id,
+                        quantity=0,
+                    )
+                    for product_id in added
+                ], ignore_conflicts=True)
+            if updated:
+                self.lines_queryset().filter(product_id__in=updated).update(
+                    quantity=Case(
+                        *(
+                            When(product_id=product_id, then=F('quantity') + value if kind == 'add' else Value(value))
+                            for product_id, (kind, value) in updated.items()
+                        ),
+                        default=F('quantity'),
+                    ),
+                    updated_at=timezone.now(),
+                )
+            removed = [product_id for product_id, (kind, value) in changes.items() if kind == 'set' and value <= 0]
+            if cleared:
+                self.lines_queryset().filter(Q(quantity__lte=0) | ~Q(product_id__in=added)).delete()
+            elif removed or any(value < 0 for kind, value in updated.values()):
+                self.lines_queryset().filter(Q(quantity__lte=0) | Q(product_id__in=removed)).delete()
+        self.bump_version()
+
+
+class CacheCartStore(CartStore):
+    """
+    Корзина в кэше: отдельный счетчик на каждое блюдо.
+
+    Список блюд корзины не хранится (его обновление не было бы атомарным):
+    содержимое читается одним get_many по блюдам из снимка меню, поэтому
+    блюда из стоп-листа из корзины просто пропадают.
+    """
+
+    def line_key(self, product_id):
+        return f'{self.key_prefix}:p{product_id}'
+
+    def menu_product_ids(self):
+        return [product.id for category in get_menu_categories() for product in category.products.all()]
+
+    def get_lines(self):
+        keys = {self.line_key(product_id): product_id for product_id in self.menu_product_ids()}
+        values = cache.get_many(list(keys))
+        return {keys[key]: quantity for key, quantity in values.items() if quantity and quantity > 0}
+
+    def apply(self, operations):
+        """Операции выполняются по одной, каждая - атомарной командой кэша"""
+        for op, product_id, quantity in operations:
+            if op == 'add':
+                self.add(product_id, quantity)
+            elif op == 'set':
+                self.set(product_id, quantity)
+            elif op == 'remove':
+                self.remove(product_id)
+            elif op == 'clear':
+                self.clear()
+        if operations:
+            self.bump_version()
+
+    def add(self, product_id, quantity):
+        key = self.line_key(product_id)
+        cache.add(key, 0, cart_timeout())
+        try:
+            value = cache.incr(key, quantity)
+        except ValueError:
+            # Ключ истек между add и incr
+            value = quantity
+            cache.set(key, value, cart_timeout())
+        if value <= 0:
+            cache.delete(key)
+
+    def set(self, product_id, quantity):
+        if quantity <= 0:
+            self.remove(product_id)
+        else:
+            cache.set(self.line_key(product_id), quantity, cart_timeout())
+
+    def remove(self, product_id):
+        cache.delete(self.line_key(product_id))
+
+    def clear(self):
+        cache.delete_many([self.line_key(product_id) for product_id in self.menu_product_ids()])
+
+
+def get_cart_session_key(request):
+    """
+    Ключ сессии гостя для корзины.
+
+    Сессия сохраняется только один раз - при первом обращении гостя;
+    дальше корзина меняется без записи в таблицу сессий.
+    """
+    # Чтение сессии заодно сбрасывает ключ истекшей сессии
+    if not request.session.get('guest'):
+        # Пустую сессию SessionMiddleware не отправляет в cookie; повторно
+        # сохранять ее middleware не будет (см. hotel.sessions)
+        request.session['guest'] = True
+        request.session.save()
+    return request.session.session_key
+
+
+def get_cart_store(session_key, location_type, location_id):
+    store_class = import_string(getattr(settings, 'CART_STORE', 'hotel.cart.DatabaseCartStore'))
+    return store_class(session_key, location_type, location_id)
+
+
+def get_request_cart(request, location_type, location_id, create_session=False):
+    """
+    Корзина текущего гостя для места доставки.
+
+    Без create_session для гостя без сессии возвращает None (корзина пуста).
+    """
+    session_key = request.session.session_key
+    if create_session:
+        session_key = get_cart_session_key(request)
+    elif not session_key:
+        return None
+    return get_cart_store(session_key, location_type, location_id)
+
+
+def parse_operations(data):
+    """
+    Проверяет операции из запроса и возвращает список (op, product_id, quantity).
+
+    Блюда, которые добавляются в корзину, должны существовать и быть доступны
+    для заказа - проверяются одним запросом.
+    """
+    if not isinstance(data, list):
+        raise CartError('Ожидается список операций')
+    if len(data) > CART_MAX_OPERATIONS:
+        raise CartError('Слишком много операций')
+
+    operations = []
+    for item in data:
+        if not isinstance(item, dict) or item.get('op') not in CART_OPERATIONS:
+            raise CartError('Неизвестная операция')
+        op = item['op']
+        product_id = None
+        quantity = 0
+        try:
+            if op != 'clear':
+                product_id = int(item.get('product_id'))
+            if op in ('add', 'set'):
+                quantity = int(item.get('quantity', 1))
+        except (TypeError, ValueError):
+            raise CartError('Неверные данные операции')
+        if abs(quantity) > CART_MAX_QUANTITY:
+            raise CartError('Неверное количество')
+        operations.append((op, product_id, quantity))
+
+    added = {
+        product_id for op, product_id, quantity in operations
+        if op in ('add', 'set') and quantity > 0
+    }
+    if added:
+        available = set(
+            Product.objects.filter(pk__in=added, is_available=True).values_list('pk', flat=True)
+        )
+        if added - available:
+            raise CartError('Блюдо недоступно для заказа')
+    return operations
+
+
+def get_cart_contents(lines):
+    """
+    Позиции, сумма и количество для ответа корзины (по текущим ценам).
+
+    Блюда берутся из снимка меню в кэше; в БД идет один in_bulk и только
+    за блюдами, которых в снимке нет.
+    """
+    products = {
+        product.id: product
+        for category in get_menu_categories()
+        for product in category.products.all()
+        if product.id in lines
+    }
+    missing = [product_id for product_id in lines if product_id not in products]
+    if missing:
+        products.update(Product.objects.filter(is_available=True).in_bulk(missing))
+
+    items = []
+    total = Decimal('0')
+    for product_id, quantity in lines.items():
+        product = products.get(product_id)
+        if product is None:
+            continue
+        line_total = product.price * quantity
+        items.append({
+            'id': product.id,
+            'name': product.name,
+            'quantity': quantity,
+            'price': float(product.price),
+            'total': float(line_total),
+        })
+        total += line_total
+    return {
+        'items': items,
+        'total': float(total),
+        'count': sum(item['quantity'] for item in items),
+    }
+
+
+def get_cart_etag(cart):
+    """
+    ETag ответа корзины: версия корзины и версия меню (цены и стоп-лист).
+
+    Пока ни то ни другое не менялось, опрос корзины отвечает 304 без
+    чтения позиций.
+    """
+    cart_version = cart.get_version() if cart is not None else 0
+    return f'"cart-{cart_version}-{get_menu_version()}"'
+
+
+def clear_stale_carts(max_age=None):
+    """Удаляет позиции DatabaseCartStore, не менявшиеся дольше срока сессии"""
+    if max_age is None:
+        max_age = cart_timeout()
+    deleted, _ = CartItem.objects.filter(
+        updated_at__lt=timezone.now() - timedelta(seconds=max_age),
+    ).delete()
+    return deleted
@@ -0,0 +1,568 @@
+"""
+Channel layer на SQLite для нескольких процессов без Redis.
+
+InMemoryChannelLayer живет внутри одного процесса: при нескольких воркерах
+событие заказа, отправленное из запроса в одном процессе, не доходило до
+WebSocket дашборда, подключенного к другому. Этот слой хранит сообщения и
+группы в общем файле SQLite (режим WAL: чтение не блокирует запись), поэтому
+работает для всех процессов на одном сервере.
+
+Каждый процесс забирает сообщения своих каналов одним запросом раз в
+poll_interval секунд и раскладывает их по очередям в памяти, так что число
+запросов к файлу не зависит от числа открытых WebSocket. Задержка доставки -
+до poll_interval (по умолчанию 50 мс). Пустой опрос - одно чтение по
+соединению потока, без блокировки записи: блокировку берет только опрос,
+которому есть что удалить.
+
+Сообщения сериализуются в JSON (как и все, что realtime отправляет в
+браузер). Для нескольких серверов нужен Redis (channels_redis).
+
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'hotel.channel_layers.SQLiteChannelLayer',
+            'CONFIG': {'path': '/path/to/channels.sqlite3'},
+        },
+    }
+
+RedisFallbackChannelLayer выбирает слой на ходу: Redis, пока он отвечает,
+и SQLite, если Redis нет. Доступность Redis проверяется в фоновом потоке
+(не при импорте настроек и не в запросе), поэтому запуск manage.py и
+воркеров не ждет сети, а Redis, поднятый после старта, подхватывается без
+перезапуска.
+"""
+import asyncio
+import json
+import random
+from collections import OrderedDict
+import sqlite3
+import string
+import threading
+import time
+import uuid
+
+from channels.exceptions import ChannelFull
+from channels.layers import BaseChannelLayer
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+try:
+    import redis
+    from channels_redis.core import RedisChannelLayer
+except ImportError:
+    redis = None
+    RedisChannelLayer = None
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS channel_messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    channel TEXT NOT NULL,
+    client TEXT NOT NULL,
+    expires REAL NOT NULL,
+    body TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS channel_messages_channel_idx ON channel_messages (channel, id);
+CREATE INDEX IF NOT EXISTS channel_messages_client_idx ON channel_messages (client, id);
+CREATE TABLE IF NOT EXISTS channel_groups (
+    group_name TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    expires REAL NOT NULL,
+    PRIMARY KEY (group_name, channel)
+);
+"""
+
+# Как часто удалять просроченные сообщения и подписки (секунды)
+CLEANUP_INTERVAL = 60
+
+# Как часто receive пересматривает выбор слоя (секунды)
+RECEIVE_RECHECK_INTERVAL = 1
+
+# Метка сообщения, отправленного через оба слоя: получатель берет первую копию
+MIRROR_ID_KEY = '__mirror_id__'
+# Сколько меток полученных копий помнит процесс
+MIRROR_SEEN_LIMIT = 1000
+
+
+def default_path():
+    return str(settings.BASE_DIR / 'channels.sqlite3')
+
+
+class SQLiteChannelLayer(BaseChannelLayer):
+    """
+    Channel layer с группами на общем файле SQLite.
+
+    Параметры те же, что у InMemoryChannelLayer, плюс path (файл БД) и
+    poll_interval (пауза между опросами, секунды).
+    """
+
+    extensions = ['groups', 'flush']
+
+    def __init__(self, path=None, expiry=60, group_expiry=86400, capacity=100,
+                 channel_capacity=None, poll_interval=0.05, **kwargs):
+        super().__init__(expiry=expiry, capacity=capacity, channel_capacity=channel_capacity, **kwargs)
+        self.channel_capacity = self.compile_capacities(self.channel_capacity)
+        self.path = str(path or default_path())
+        self.group_expiry = group_expiry
+        self.poll_interval = poll_interval
+        # Префикс каналов этого процесса: specific.<client>!<случайная часть>
+        self.client_prefix = uuid.uuid4().hex
+        self.receive_buffer = {}
+        self._poll_lock = None
+        self._schema_ready = False
+        # Соединение с файлом у каждого потока пула свое и живет вместе с потоком
+        self._local = threading.local()
+        self._last_cleanup = 0
+
+    # Работа с файлом (синхронно, в потоке пула)
+
+    def connect(self):
+        """Соединение текущего потока (создается при первом обращении)"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            if not self._schema_ready:
+                connection.execute('PRAGMA journal_mode=WAL')
+                connection.executescript(SCHEMA)
+                self._schema_ready = True
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def execute(self, func, *args):
+        """Выполняет func(connection, *args) в транзакции с блокировкой записи"""
+        connection = self.connect()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            result = func(connection, *args)
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return result
+
+    async def run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.execute, func, *args)
+
+    async def take(self, column, value, limit=None):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.take_messages, column, value, limit)
+
+    def insert_message(self, connection, channel, message, now):
+        """Кладет сообщение в канал; False, если канал переполнен"""
+        queued = connection.execute(
+            'SELECT COUNT(*) FROM channel_messages WHERE channel = ? AND expires > ?',
+            (channel, now),
+        ).fetchone()[0]
+        if queued >= self.get_capacity(channel):
+            return False
+        connection.execute(
+            'INSERT INTO channel_messages (channel, client, expires, body) VALUES (?, ?, ?, ?)',
+            (channel, self.non_local_name(channel), now + self.expiry, message),
+        )
+        return True
+
+    def messages_query(self, column, limit=None):
+        query = f'SELECT id, channel, body FROM channel_messages WHERE {column} = ? AND expires > ? ORDER BY id'
+        if limit:
+            query += f' LIMIT {int(limit)}'
+        return query
+
+    def take_messages(self, column, value, limit=None):
+        """
+        Забирает сообщения по каналу или клиенту.
+
+        Сначала - простое чтение: пока сообщений нет (и очистка не нужна),
+        транзакция с блокировкой записи не открывается и не мешает отправке.
+        """
+        now = time.time()
+        if now - self._last_cleanup <= CLEANUP_INTERVAL:
+            found = self.connect().execute(self.messages_query(column, 1), (value, now)).fetchone()
+            if found is None:
+                return []
+        return self.execute(self.pop_messages, column, value, limit)
+
+    def pop_messages(self, connection, column, value, limit=None):
+        """Забирает (удаляет и возвращает) непросроченные сообщения по каналу или клиенту"""
+        now = time.time()
+        rows = connection.execute(self.messages_query(column, limit), (value, now)).fetchall()
+        if rows:
+            connection.executemany('DELETE FROM channel_messages WHERE id = ?', [(row[0],) for row in rows])
+        if now - self._last_cleanup > CLEANUP_INTERVAL:
+            self._last_cleanup = now
+            connection.execute('DELETE FROM channel_messages WHERE expires <= ?', (now,))
+            connection.execute('DELETE FROM channel_groups WHERE expires <= ?', (now,))
+        return [(channel, json.loads(body)) for _, channel, body in rows]
+
+    # Каналы
+
+    async def send(self, channel, message):
+        assert isinstance(message, dict), 'message is not a dict'
+        self.valid_channel_name(channel)
+        assert '__asgi_channel__' not in message
+        body = json.dumps(message, cls=DjangoJSONEncoder)
+        if not await self.run(self.insert_message, channel, body, time.time()):
+            raise ChannelFull(channel)
+
+    async def new_channel(self, prefix='specific'):
+        random_part = ''.join(random.choice(string.ascii_letters) for _ in range(12))
+        channel = f'{prefix}.{self.client_prefix}!{random_part}'
+        # Очередь создается сразу: сообщения для каналов без очереди отбрасываются
+        self.receive_buffer[channel] = asyncio.Queue()
+        return channel
+
+    async def receive(self, channel):
+        self.valid_channel_name(channel)
+        if '!' not in channel:
+            return await self.receive_single(channel)
+
+        queue = self.receive_buffer.setdefault(channel, asyncio.Queue())
+        if self._poll_lock is None:
+            self._poll_lock = asyncio.Lock()
+        try:
+            while True:
+                if not queue.empty():
+                    return queue.get_nowait()
+                if self._poll_lock.locked():
+                    # БД уже опрашивает receive другого канала этого процесса
+                    try:
+                        return await asyncio.wait_for(queue.get(), self.poll_interval)
+                    except asyncio.TimeoutError:
+                        continue
+                async with self._poll_lock:
+                    await self.poll_local_channels()
+                    if queue.empty():
+                        # Пауза под блокировкой: за интервал процесс опрашивает БД один раз
+                        await asyncio.sleep(self.poll_interval)
+        except asyncio.CancelledError:
+            # Потребитель отключился: канал больше не читается
+            self.receive_buffer.pop(channel, None)
+            raise
+
+    async def poll_local_channels(self):
+        """Одним запросом на префикс забирает сообщения всех каналов процесса"""
+        clients = {self.non_local_name(channel) for channel in self.receive_buffer}
+        for client in clients:
+            for channel, message in await self.take('client', client):
+                queue = self.receive_buffer.get(channel)
+                if queue is not None:
+                    queue.put_nowait(message)
+
+    async def receive_single(self, channel):
+        """Общий (не принадлежащий процессу) канал: опрос по имени"""
+        while True:
+            messages = await self.take('channel', channel, 1)
+            if messages:
+                return messages[0][1]
+            await asyncio.sleep(self.poll_interval)
+
+    # Группы
+
+    async def group_add(self, group, channel):
+        self.valid_group_name(group)
+        self.valid_channel_name(channel)
+
+        def add(connection):
+            connection.execute(
+                'INSERT OR REPLACE INTO channel_groups (group_name, channel, expires) VALUES (?, ?, ?)',
+                (group, channel, time.time() + self.group_expiry),
+            )
+
+        await self.run(add)
+
+    async def group_discard(self, group, channel):
+        self.valid_group_name(group)
+        self.valid_channel_name(channel)
+
+        def discard(connection):
+            connection.execute(
+                'DELETE FROM channel_groups WHERE group_name = ? AND channel = ?',
+                (group, channel),
+            )
+
+        await self.run(discard)
+
+    async def group_send(self, group, message):
+        assert isinstance(message, dict), 'Message is not a dict'
+        self.valid_group_name(group)
+        body = json.dumps(message, cls=DjangoJSONEncoder)
+
+        def send(connection):
+            now = time.time()
+            channels = [
+                row[0] for row in connection.execute(
+                    'SELECT channel FROM channel_groups WHERE group_name = ? AND expires > ?',
+                    (group, now),
+                )
+            ]
+            for channel in channels:
+                # Переполненный канал пропускается, как в RedisChannelLayer
+                self.insert_message(connection, channel, body, now)
+
+        await self.run(send)
+
+    # Flush
+
+    async def flush(self):
+        def delete_all(connection):
+            connection.execute('DELETE FROM channel_messages')
+            connection.execute('DELETE FROM channel_groups')
+
+        self.receive_buffer = {}
+        await self.run(delete_all)
+
+    async def close(self):
+        pass
+
+
+class RedisFallbackChannelLayer(BaseChannelLayer):
+    """
+    Redis с запасным SQLiteChannelLayer.
+
+    Подписки на группы пишутся в оба слоя, а receive слушает оба, поэтому
+    переключение не теряет подписчиков. Сообщения отправляются через Redis,
+    пока последняя проверка (фоновый ping раз в probe_interval секунд)
+    успешна; ошибка Redis при отправке сразу переключает на SQLite. После
+    каждой успешной проверки подписки этого процесса повторяются в Redis.
+
+    Другие процессы замечают Redis (или его перезапуск, стерший группы) на
+    своей проверке, до probe_interval секунд позже. Поэтому в течение двух
+    probe_interval после переключения group_send отправляет сообщение и в
+    SQLite, с меткой MIRROR_ID_KEY; receive отбрасывает вторую копию.
+    """
+
+    extensions = ['groups', 'flush']
+
+    def __init__(self, hosts=None, prefix='asgi', path=None, expiry=60, group_expiry=86400, capacity=100,
+                 channel_capacity=None, poll_interval=0.05, probe_interval=30, probe_timeout=1, **kwargs):
+        super().__init__(expiry=expiry, capacity=capacity, channel_capacity=channel_capacity, **kwargs)
+        self.fallback = SQLiteChannelLayer(
+            path=path, expiry=expiry, group_expiry=group_expiry, capacity=capacity,
+            channel_capacity=channel_capacity, poll_interval=poll_interval,
+        )
+        # Конструктор RedisChannelLayer не подключается к Redis
+        self.redis = None
+        if RedisChannelLayer is not None:
+            self.redis = RedisChannelLayer(
+                hosts=hosts, prefix=prefix, expiry=expiry, group_expiry=group_expiry,
+                capacity=capacity, channel_capacity=channel_capacity,
+            )
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+
+        self.redis_up = False
+        # Подписки этого процесса уже повторены в Redis
+        self.redis_synced = False
+        # Когда Redis появился или перезапустился, и его run_id по хостам
+        self.switched_at = None
+        self.server_ids = None
+        self.checked_at = None
+        self._probing = False
+        self._probe_lock = threading.Lock()
+        self.memberships = set()
+        self.receive_tasks = {}
+        self.mirror_seen = OrderedDict()
+
+    # Проверка Redis
+
+    def check_redis(self):
+        """Запускает фоновую проверку Redis, если пора; сама не ждет сети"""
+        if self.redis is None:
+            return
+        with self._probe_lock:
+            now = time.monotonic()
+            if self._probing or (self.checked_at is not None and now - self.checked_at < self.probe_interval):
+                return
+            self._probing = True
+        threading.Thread(target=self.probe, name='redis-channel-layer-probe', daemon=True).start()
+
+    def probe(self):
+        try:
+            server_ids = tuple(self.ping(host) for host in self.redis.hosts)
+            up = None not in server_ids
+        except Exception as e:
+            print(f"Error checking Redis: {e}")
+            up = False
+        with self._probe_lock:
+            now = time.monotonic()
+            if up and (not self.redis_up or server_ids != self.server_ids):
+                # Redis появился или перезапустился с пустыми группами
+                self.switched_at = now
+            # Подписки повторяются после каждой успешной проверки
+            self.redis_synced = False
+            self.server_ids = server_ids if up else None
+            self.redis_up = up
+            self.checked_at = now
+            self._probing = False
+
+    def ping(self, host):
+        """
+        Синхронный ping одного хоста из конфигурации channels_redis.
+
+        Возвращает run_id сервера (меняется при перезапуске Redis), пустую
+        строку, если его не узнать, или None, если Redis недоступен.
+        """
+        options = {'socket_connect_timeout': self.probe_timeout, 'socket_timeout': self.probe_timeout}
+        if 'address' in host:
+            client = redis.Redis.from_url(host['address'], **options)
+        elif 'host' in host:
+            client = redis.Redis(host=host['host'], port=host.get('port', 6379), **options)
+        else:
+            # Sentinel: доступность покажет первая отправка
+            return ''
+        try:
+            if not client.ping():
+                return None
+            try:
+                return client.info('server').get('run_id', '')
+            except redis.ResponseError:
+                # INFO может быть запрещен в конфигурации Redis
+                return ''
+        except (redis.RedisError, OSError):
+            return None
+        finally:
+            client.close()
+
+    def mark_redis_down(self, error):
+        print(f"Error in Redis channel layer, using SQLite: {error}")
+        with self._probe_lock:
+            self.redis_up = False
+            self.redis_synced = False
+            self.checked_at = time.monotonic()
+
+    def mirroring(self):
+        """Подписки других процессов могут быть еще не повторены в Redis"""
+        return self.switched_at is not None and time.monotonic() - self.switched_at < 2 * self.probe_interval
+
+    async def get_redis(self):
+        """Слой Redis, если он доступен (подписки процесса при этом повторяются в нем)"""
+        self.check_redis()
+        if not self.redis_up:
+            return None
+        if not self.redis_synced:
+            try:
+                for group, channel in list(self.memberships):
+                    await self.redis.group_add(group, channel)
+            except Exception as e:
+                self.mark_redis_down(e)
+                return None
+            self.redis_synced = True
+        return self.redis
+
+    # Каналы
+
+    async def send(self, channel, message):
+        layer = await self.get_redis()
+        if layer is not None:
+            try:
+                return await layer.send(channel, message)
+            except ChannelFull:
+                raise
+            except Exception as e:
+                self.mark_redis_down(e)
+        await self.fallback.send(channel, message)
+
+    async def new_channel(self, prefix='specific'):
+        if self.redis is not None:
+            # Имя с префиксом процесса Redis: такой канал читается из обоих слоев
+            return await self.redis.new_channel(prefix)
+        return await self.fallback.new_channel(prefix)
+
+    async def receive(self, channel):
+        tasks = self.receive_tasks.setdefault(channel, {})
+        try:
+            while True:
+                if 'sqlite' not in tasks:
+                    tasks['sqlite'] = asyncio.ensure_future(self.fallback.receive(channel))
+                if 'redis' not in tasks:
+                    layer = await self.get_redis()
+                    if layer is not None:
+                        tasks['redis'] = asyncio.ensure_future(layer.receive(channel))
+                        tasks['redis'].add_done_callback(self.redis_receive_done)
+
+                # Незабранный результат второго слоя остается в tasks до следующего вызова
+                await asyncio.wait(
+                    list(tasks.values()), timeout=RECEIVE_RECHECK_INTERVAL, return_when=asyncio.FIRST_COMPLETED,
+                )
+                for name, task in list(tasks.items()):
+                    if not task.done():
+                        continue
+                    del tasks[name]
+                    if name == 'redis' and task.exception() is not None:
+                        continue
+                    message = task.result()
+                    if self.seen_mirror(channel, message):
+                        continue
+                    return message
+        except asyncio.CancelledError:
+            for task in self.receive_tasks.pop(channel, {}).values():
+                task.cancel()
+            raise
+
+    def seen_mirror(self, channel, message):
+        """Снимает метку MIRROR_ID_KEY; True, если копия из другого слоя уже получена"""
+        mirror_id = message.pop(MIRROR_ID_KEY, None)
+        if mirror_id is None:
+            return False
+        key = (channel, mirror_id)
+        if key in self.mirror_seen:
+            del self.mirror_seen[key]
+            return True
+        self.mirror_seen[key] = None
+        if len(self.mirror_seen) > MIRROR_SEEN_LIMIT:
+            self.mirror_seen.popitem(last=False)
+        return False
+
+    def redis_receive_done(self, task):
+        # Ошибка забирается сразу, даже если канал больше никто не читает
+        if not task.cancelled() and task.exception() is not None:
+            self.mark_redis_down(task.exception())
+
+    # Группы
+
+    async def group_add(self, group, channel):
+        self.memberships.add((group, channel))
+        await self.fallback.group_add(group, channel)
+        layer = await self.get_redis()
+        if layer is not None:
+            try:
+                await layer.group_add(group, channel)
+            except Exception as e:
+                self.mark_redis_down(e)
+
+    async def group_discard(self, group, channel):
+        self.memberships.discard((group, channel))
+        await self.fallback.group_discard(group, channel)
+        layer = await self.get_redis()
+        if layer is not None:
+            try:
+                await layer.group_discard(group, channel)
+            except Exception as e:
+                self.mark_redis_down(e)
+
+    async def group_send(self, group, message):
+        layer = await self.get_redis()
+        if layer is not None:
+            mirror = self.mirroring()
+            if mirror:
+                message = {**message, MIRROR_ID_KEY: uuid.uuid4().hex}
+            try:
+                await layer.group_send(group, message)
+            except Exception as e:
+                self.mark_redis_down(e)
+            else:
+                if mirror:
+                    # Подписчики процессов, еще не заметивших Redis, есть только в SQLite
+                    await self.fallback.group_send(group, message)
+                return
+        await self.fallback.group_send(group, message)
+
+    # Flush
+
+    async def flush(self):
+        self.memberships.clear()
+        await self.fallback.flush()
+        if self.redis_up:
+            try:
+                await self.redis.flush()
+            except Exception as e:
+                self.mark_redis_down(e)
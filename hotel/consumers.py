@@ -2,26 +2,75 @@ import json
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from .models import Order
+from .archive import maybe_archive_orders
+from .locations import resolve_location
+from .realtime import ORDERS_GROUP, order_status_group, serialize_order_status
 
 
 class OrderConsumer(AsyncWebsocketConsumer):
     async def connect(self):
+        # Заказы видит только персонал, вошедший в дашборд
+        user = self.scope.get('user')
+        if not user or not user.is_authenticated:
+            await self.close()
+            return
+        await self.channel_layer.group_add(ORDERS_GROUP, self.channel_name)
         await self.accept()
-        await self.channel_layer.group_add("orders", self.channel_name)
-    
+        # Пока сокет открыт, дашборд не опрашивает API, и архивация из опроса не запускается
+        await database_sync_to_async(maybe_archive_orders)()
+
     async def disconnect(self, close_code):
-        await self.channel_layer.group_discard("orders", self.channel_name)
-    
+        await self.channel_layer.group_discard(ORDERS_GROUP, self.channel_name)
+
     async def receive(self, text_data):
         pass
-    
+
     async def order_update(self, event):
         """Отправка обновления заказа клиенту"""
         await self.send(text_data=json.dumps({
             'type': 'order_update',
-            'order': event['order']
+            'event': event.get('event'),
+            'order': event['order'],
+            'notification': event.get('notification'),
         }))
 
 
+class OrderStatusConsumer(AsyncWebsocketConsumer):
+    """Статус одного заказа для страницы гостя"""
+
+    async def connect(self):
+        kwargs = self.scope['url_route']['kwargs']
+        self.location_type = kwargs['location_type']
+        self.slug = kwargs['slug']
+        self.order_id = int(kwargs['order_id'])
+        status = await self.get_order_status()
+        if status is None:
+            await self.close()
+            return
+        self.group_name = order_status_group(self.order_id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+        # Текущий статус сразу: он мог измениться между отрисовкой страницы и подключением
+        await self.send(text_data=json.dumps({'type': 'order_status', **status}))
+
+    async def disconnect(self, close_code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
 
+    async def order_status(self, event):
+        """Отправка нового статуса заказа гостю"""
+        await self.send(text_data=json.dumps({
+            'type': 'order_status',
+            'order_id': event['order_id'],
+            'status': event['status'],
+            'status_display': event['status_display'],
+        }))
 
+    @database_sync_to_async
+    def get_order_status(self):
+        # Как на странице статуса: заказ только среди заказов места из адреса
+        location = resolve_location(self.location_type, slug=self.slug)
+        if location is None:
+            return None
+        order = Order.objects.filter(pk=self.order_id, **location.order_filter()).first()
+        return serialize_order_status(order) if order else None
@@ -1,6 +1,7 @@
 from django.urls import path
 from . import views
-from .qr_generator import generate_qr_images
+from .qr_generator import generate_qr_images, print_qr_sheet
+from .perf import dashboard_perf, perf_metrics
 
 urlpatterns = [
     path('', views.dashboard_home, name='dashboard_home'),
@@ -10,12 +11,14 @@ urlpatterns = [
     path('orders/<int:order_id>/update-status/', views.update_order_status, name='update_order_status'),
     path('products/<int:product_id>/toggle/', views.toggle_product_availability, name='toggle_product_availability'),
     path('qr/generate/', generate_qr_images, name='generate_qr_images'),
+    path('qr/print-sheet/', print_qr_sheet, name='print_qr_sheet'),
     # Management URLs
     path('building/add/', views.dashboard_building_add, name='dashboard_building_add'),
     path('building/<int:building_id>/delete/', views.dashboard_building_delete, name='dashboard_building_delete'),
     path('building/<int:building_id>/regenerate-qr/', views.dashboard_building_regenerate_qr, name='dashboard_building_regenerate_qr'),
     path('floor/add/', views.dashboard_floor_add, name='dashboard_floor_add'),
     path('floor/<int:floor_id>/delete/', views.dashboard_floor_delete, name='dashboard_floor_delete'),
+    path('floor/<int:floor_id>/rooms/', views.dashboard_floor_rooms, name='dashboard_floor_rooms'),
     path('floor/<int:floor_id>/regenerate-qr/', views.dashboard_floor_regenerate_qr, name='dashboard_floor_regenerate_qr'),
     path('room/add/', views.dashboard_room_add, name='dashboard_room_add'),
     path('room/<int:room_id>/delete/', views.dashboard_room_delete, name='dashboard_room_delete'),
@@ -27,5 +30,7 @@ urlpatterns = [
     path('product/<int:product_id>/edit/', views.dashboard_product_edit, name='dashboard_product_edit'),
     path('product/<int:product_id>/delete/', views.dashboard_product_delete, name='dashboard_product_delete'),
     path('settings/', views.dashboard_settings, name='dashboard_settings'),
+    path('perf/', dashboard_perf, name='dashboard_perf'),
+    path('perf/metrics/', perf_metrics, name='perf_metrics'),
 ]
 
@@ -0,0 +1,204 @@
+"""
+Места доставки (номер, этаж, корпус) для гостевых страниц.
+
+Все гостевые маршруты - страница меню, корзина, оформление и статус
+заказа - начинают с поиска места по slug (или token). Вместо запроса к БД
+на каждый клик место превращается в компактную запись ServicePoint и
+кэшируется по глобальной версии мест. Версия меняется при сохранении или
+удалении Building/Floor/Room (см. hotel.signals): переименование корпуса
+меняет и подписи его этажей и номеров, поэтому сбрасываются все записи.
+
+QR-коды ведут на короткую ссылку /t/<код>/ (код выводится из token места):
+индекс кодов строится тремя запросами и хранится в кэше и в памяти
+процесса. Прежние slug переименованных мест ведут на текущий адрес через
+таблицу SlugRedirect.
+"""
+import time
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.http import Http404
+
+from .models import Building, Floor, Room, SlugRedirect, token_short_code
+
+LOCATIONS_VERSION_KEY = 'locations:version'
+LOCATIONS_CACHE_TIMEOUT = 60 * 60 * 24
+
+LOCATION_TYPES = ('room', 'floor', 'building')
+LOCATION_MODELS = {'room': Room, 'floor': Floor, 'building': Building}
+
+# Отметка в кэше для несуществующего slug/token (None означает промах кэша)
+MISSING = 'missing'
+
+# Индекс коротких ссылок в памяти процесса: (версия мест, {код: (тип, slug)})
+_short_code_index = None
+
+
+class ServicePoint:
+    """
+    Место доставки заказа: номер, этаж или корпус.
+
+    Атрибуты slug и name и строковое представление совпадают с моделями,
+    поэтому запись можно передавать в шаблоны вместо room/floor/building.
+    """
+
+    def __init__(self, type, id, slug, token, is_active, name, label,
+                 building_id=None, building_name='', floor_id=None, floor_name='', room_number=''):
+        self.type = type
+        self.id = id
+        self.slug = slug
+        self.token = token
+        self.is_active = is_active
+        self.name = name
+        self.label = label
+        self.building_id = building_id
+        self.building_name = building_name
+        self.floor_id = floor_id
+        self.floor_name = floor_name
+        self.room_number = room_number
+
+    def __str__(self):
+        return self.label
+
+    def __repr__(self):
+        return f'<ServicePoint {self.type}#{self.id} {self.slug}>'
+
+    @property
+    def pk(self):
+        return self.id
+
+    def order_filter(self):
+        """Поле заказа, указывающее на это место: {'room_id': id} и т.п."""
+        return {f'{self.type}_id': self.id}
+
+
+def get_locations_version():
+    """Текущая версия мест доставки (создается при первом обращении)"""
+    version = cache.get(LOCATIONS_VERSION_KEY)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(LOCATIONS_VERSION_KEY, version, None):
+            version = cache.get(LOCATIONS_VERSION_KEY, version)
+    return version
+
+
+def bump_locations_version():
+    version = time.time_ns()
+    cache.set(LOCATIONS_VERSION_KEY, version, None)
+    return version
+
+
+def build_service_point(obj):
+    """ServicePoint из модели Room, Floor или Building"""
+    if isinstance(obj, Room):
+        floor = obj.floor
+        building = floor.building
+        return ServicePoint(
+            'room', obj.id, obj.slug, str(obj.token), obj.is_active, obj.number, str(obj),
+            building_id=floor.building_id, building_name=building.name if building else '',
+            floor_id=floor.id, floor_name=floor.name, room_number=obj.number,
+        )
+    if isinstance(obj, Floor):
+        building = obj.building
+        return ServicePoint(
+            'floor', obj.id, obj.slug, str(obj.token), obj.is_active, obj.name, str(obj),
+            building_id=obj.building_id, building_name=building.name if building else '',
+            floor_id=obj.id, floor_name=obj.name,
+        )
+    if isinstance(obj, Building):
+        return ServicePoint(
+            'building', obj.id, obj.slug, str(obj.token), obj.is_active, obj.name, str(obj),
+            building_id=obj.id, building_name=obj.name,
+        )
+    raise TypeError(f'Unknown location: {obj!r}')
+
+
+def location_queryset(location_type):
+    if location_type == 'room':
+        return Room.objects.select_related('floor', 'floor__building')
+    if location_type == 'floor':
+        return Floor.objects.select_related('building')
+    if location_type == 'building':
+        return Building.objects.all()
+    raise ValueError(f'Unknown location type: {location_type}')
+
+
+def resolve_location(location_type, slug=None, token=None):
+    """
+    ServicePoint по slug или token из кэша (или из БД при промахе).
+
+    Возвращает None, если места нет.
+    """
+    if token is not None:
+        field, value = 'token', str(token)
+    else:
+        field, value = 'slug', slug
+    key = f'location:{get_locations_version()}:{location_type}:{field}:{value}'
+
+    point = cache.get(key)
+    if point is None:
+        queryset = location_queryset(location_type)
+        try:
+            point = build_service_point(queryset.get(**{field: value}))
+        except (queryset.model.DoesNotExist, ValidationError):
+            # Неверный UUID в token - такой же промах, как несуществующий slug
+            point = MISSING
+        cache.set(key, point, LOCATIONS_CACHE_TIMEOUT)
+    return None if point == MISSING else point
+
+
+def get_location_or_404(location_type, slug, active_only=True):
+    """ServicePoint для гостевого маршрута; неактивное место - 404 (если active_only)"""
+    point = resolve_location(location_type, slug=slug)
+    if point is None or (active_only and not point.is_active):
+        raise Http404('Место доставки не найдено')
+    return point
+
+
+def get_short_code_index():
+    """Индекс коротких ссылок {код: (тип места, slug)} для текущей версии мест"""
+    global _short_code_index
+    version = get_locations_version()
+    if _short_code_index is not None and _short_code_index[0] == version:
+        return _short_code_index[1]
+
+    key = f'locations:{version}:short_codes'
+    index = cache.get(key)
+    if index is None:
+        index = {}
+        for location_type in LOCATION_TYPES:
+            for token, slug in LOCATION_MODELS[location_type].objects.values_list('token', 'slug'):
+                # Совпадение 40-битных кодов маловероятно; при нем код остается за первым местом
+                index.setdefault(token_short_code(token), (location_type, slug))
+        cache.set(key, index, LOCATIONS_CACHE_TIMEOUT)
+    _short_code_index = (version, index)
+    return index
+
+
+def resolve_short_code(code):
+    """(тип места, slug) по коду короткой ссылки или None"""
+    return get_short_code_index().get(code.upper())
+
+
+def get_renamed_slug(location_type, slug):
+    """
+    Текущий slug места, которое раньше было доступно по slug.
+
+    None, если slug действующий или неизвестный.
+    """
+    if resolve_location(location_type, slug=slug) is not None:
+        return None
+
+    key = f'location:{get_locations_version()}:{location_type}:renamed:{slug}'
+    new_slug = cache.get(key)
+    if new_slug is None:
+        new_slug = MISSING
+        location_id = SlugRedirect.objects.filter(
+            location_type=location_type, old_slug=slug,
+        ).values_list('location_id', flat=True).first()
+        if location_id is not None:
+            new_slug = LOCATION_MODELS[location_type].objects.filter(
+                pk=location_id,
+            ).values_list('slug', flat=True).first() or MISSING
+        cache.set(key, new_slug, LOCATIONS_CACHE_TIMEOUT)
+    return None if new_slug == MISSING else new_slug
@@ -0,0 +1,45 @@
+"""
+Management command для архивации выполненных заказов.
+
+Запускается по расписанию (например, из cron раз в 10 минут):
+
+    python manage.py archive_orders
+    python manage.py archive_orders --after-minutes 60 --move-after-days 90
+"""
+from django.core.management.base import BaseCommand
+
+from hotel.archive import archive_done_orders, move_old_orders
+
+
+class Command(BaseCommand):
+    help = 'Архивирует выполненные заказы и переносит старые заказы в архивные таблицы'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--after-minutes',
+            type=int,
+            default=None,
+            help='Через сколько минут в статусе "Выполнен" заказ уходит в архив '
+                 '(по умолчанию ORDER_AUTO_ARCHIVE_MINUTES)',
+        )
+        parser.add_argument(
+            '--move-after-days',
+            type=int,
+            default=None,
+            help='Переносить архивные заказы старше N дней в архивные таблицы '
+                 '(по умолчанию ORDER_ARCHIVE_MOVE_DAYS, 0 - не переносить)',
+        )
+        parser.add_argument(
+            '--batch',
+            type=int,
+            default=500,
+            help='Размер порции (по умолчанию 500)',
+        )
+
+    def handle(self, *args, **options):
+        archived = archive_done_orders(after_minutes=options['after_minutes'], batch_size=options['batch'])
+        self.stdout.write(self.style.SUCCESS(f'Архивировано заказов: {archived}'))
+
+        moved = move_old_orders(after_days=options['move_after_days'], batch_size=options['batch'])
+        if moved:
+            self.stdout.write(self.style.SUCCESS(f'Перенесено в архивные таблицы: {moved}'))
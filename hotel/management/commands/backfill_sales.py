@@ -0,0 +1,37 @@
+"""
+Management command для пересчета сводки продаж (SalesRollup) по истории заказов.
+
+Нужен один раз после установки сводки, а также после ручных правок заказов
+в админке:
+
+    python manage.py backfill_sales
+    python manage.py backfill_sales --days 30   # только последние 30 дней
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from hotel.sales import rebuild_sales_rollup
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает сводку продаж для страницы статистики'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=None,
+            help='Пересчитать только последние N дней (по умолчанию - всю историю)',
+        )
+
+    def handle(self, *args, **options):
+        since = None
+        if options['days'] is not None:
+            if options['days'] <= 0:
+                raise CommandError('--days должно быть больше нуля')
+            since = timezone.now() - timedelta(days=options['days'])
+
+        created = rebuild_sales_rollup(since=since)
+        self.stdout.write(self.style.SUCCESS(f'Сводка продаж пересчитана: {created} строк'))
@@ -0,0 +1,440 @@
+"""
+Management command для замера горячих путей гостя и дашборда.
+
+Создает временную тестовую БД (как manage.py test), наполняет ее
+синтетическим отелем - корпуса, этажи, номера, меню и история заказов - и
+прогоняет настоящие views через тестовый клиент Django: страница меню,
+корзина, оформление заказа, живой список заказов, уведомления, статистика
+и выгрузка QR-кодов архивом. Кэш и медиафайлы на время замера
+перенаправляются во временный каталог, рабочие БД и кэш не затрагиваются.
+
+Для каждого сценария выводятся p50/p95/p99 времени ответа, число запросов
+к БД и пиковая память (tracemalloc, отдельным прогоном, чтобы трассировка
+не искажала время). Результат пишется в JSON, с --compare - сравнивается
+с прошлым замером.
+
+    python manage.py bench
+    python manage.py bench --rooms 40 --orders 20000 --requests 200
+    python manage.py bench --output bench.json
+    python manage.py bench --compare bench.json --output bench-new.json
+    python manage.py bench --scenario menu_page --scenario cart_add
+"""
+import json
+import math
+import platform
+import random
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from hotel.models import Building, Category, Floor, Order, OrderItem, Product, Room
+from hotel.sales import rebuild_sales_rollup
+
+SCENARIOS = (
+    'menu_page',
+    'cart_add',
+    'cart_update',
+    'cart_get',
+    'create_order',
+    'orders_live',
+    'unviewed_orders',
+    'statistics',
+    'qr_export',
+)
+
+# Сценарии, где один запрос обрабатывает весь отель: их прогоняют реже
+HEAVY_SCENARIOS = ('qr_export',)
+
+# Рост p95 или числа запросов больше чем на столько считается регрессией
+REGRESSION_THRESHOLD = 0.2
+
+BULK_BATCH_SIZE = 500
+
+
+def percentile(values, fraction):
+    """Процентиль по ближайшему рангу (values отсортирован)"""
+    if not values:
+        return 0.0
+    index = max(0, math.ceil(fraction * len(values)) - 1)
+    return values[index]
+
+
+def consume(response):
+    """Тело ответа целиком: потоковый ответ (ZIP) отдается только при чтении"""
+    if getattr(response, 'streaming', False):
+        return b''.join(response.streaming_content)
+    return response.content
+
+
+def is_failure(response, body):
+    if response.status_code >= 400:
+        return True
+    if response.get('Content-Type', '').startswith('application/json'):
+        try:
+            return json.loads(body).get('success') is False
+        except ValueError:
+            return True
+    return False
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = 'Замер времени ответа, запросов к БД и памяти горячих views на синтетическом отеле'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--buildings', type=int, default=2, help='Корпусов (по умолчанию 2)')
+        parser.add_argument('--floors', type=int, default=5, help='Этажей в корпусе (по умолчанию 5)')
+        parser.add_argument('--rooms', type=int, default=20, help='Номеров на этаже (по умолчанию 20)')
+        parser.add_argument('--categories', type=int, default=8, help='Категорий меню (по умолчанию 8)')
+        parser.add_argument('--products', type=int, default=10, help='Блюд в категории (по умолчанию 10)')
+        parser.add_argument(
+            '--orders',
+            type=int,
+            default=5000,
+            help='Заказов в истории, в архиве (по умолчанию 5000)',
+        )
+        parser.add_argument(
+            '--live-orders',
+            type=int,
+            default=40,
+            help='Активных заказов на дашборде (по умолчанию 40)',
+        )
+        parser.add_argument('--days', type=int, default=90, help='За сколько дней история заказов (по умолчанию 90)')
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=50,
+            help='Запросов на сценарий (по умолчанию 50)',
+        )
+        parser.add_argument(
+            '--heavy-requests',
+            type=int,
+            default=3,
+            help='Запросов для тяжелых сценариев - выгрузки QR-кодов (по умолчанию 3)',
+        )
+        parser.add_argument(
+            '--scenario',
+            action='append',
+            choices=SCENARIOS,
+            help='Прогнать только этот сценарий (можно указать несколько раз)',
+        )
+        parser.add_argument('--seed', type=int, default=1, help='Зерно генератора данных (по умолчанию 1)')
+        parser.add_argument('--output', help='Записать результат в JSON-файл')
+        parser.add_argument('--compare', help='Сравнить с результатом из JSON-файла прошлого замера')
+
+    def handle(self, *args, **options):
+        for name in ('buildings', 'floors', 'rooms', 'categories', 'products', 'requests', 'heavy_requests'):
+            if options[name] <= 0:
+                raise CommandError(f'--{name.replace("_", "-")} должно быть больше нуля')
+        if options['orders'] < 0 or options['live_orders'] < 0:
+            raise CommandError('Число заказов не может быть отрицательным')
+
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare'], encoding='utf-8') as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Не удалось прочитать {options["compare"]}: {e}')
+
+        self.random = random.Random(options['seed'])
+        scenarios = options['scenario'] or list(SCENARIOS)
+
+        temp_dir = tempfile.mkdtemp(prefix='qrhotel-bench-')
+        cache_settings = dict(settings.CACHES['default'])
+        # Файловые кэши (и hotel.cache_backends.FileCache) - во временный каталог
+        if issubclass(import_string(cache_settings['BACKEND']), FileBasedCache):
+            cache_settings['LOCATION'] = f'{temp_dir}/cache'
+        else:
+            cache_settings['KEY_PREFIX'] = f'bench-{time.time_ns()}'
+
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(
+                CACHES={'default': cache_settings},
+                MEDIA_ROOT=f'{temp_dir}/media',
+                CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+                # QR-коды номеров при наполнении не рисуются, выгрузка рисует их сама
+                QR_GENERATION='deferred',
+            ):
+                started = time.perf_counter()
+                self.build_hotel(options)
+                self.stdout.write(
+                    f'Отель: {self.describe_hotel()}; наполнение {time.perf_counter() - started:.1f} с'
+                )
+                results = self.run_scenarios(scenarios, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+        report = {
+            'revision': git_revision(),
+            'created_at': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'database': connection.vendor,
+            'cache': cache_settings['BACKEND'],
+            'params': {
+                name: options[name]
+                for name in ('buildings', 'floors', 'rooms', 'categories', 'products',
+                             'orders', 'live_orders', 'days', 'requests', 'heavy_requests', 'seed')
+            },
+            'scenarios': results,
+        }
+
+        self.print_report(results)
+        if baseline is not None:
+            if baseline.get('params') != report['params']:
+                self.stdout.write(self.style.WARNING('Параметры отеля или числа запросов отличаются от прошлого замера'))
+            self.print_comparison(results, baseline)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Результат записан в {options["output"]}'))
+
+    def build_hotel(self, options):
+        """Синтетический отель: bulk_create без сигналов и генерации QR-кодов"""
+        rng = self.random
+
+        buildings = Building.objects.bulk_create([
+            Building(name=f'Корпус {b + 1}', slug=f'bench-building-{b + 1}')
+            for b in range(options['buildings'])
+        ])
+        floors = Floor.objects.bulk_create([
+            Floor(building=building, name=f'{f + 1} этаж', number=f + 1, slug=f'{building.slug}-floor-{f + 1}')
+            for building in buildings
+            for f in range(options['floors'])
+        ])
+        rooms = Room.objects.bulk_create([
+            Room(floor=floor, number=str(floor.number * 100 + r + 1), slug=f'{floor.slug}-room-{r + 1}')
+            for floor in floors
+            for r in range(options['rooms'])
+        ], batch_size=BULK_BATCH_SIZE)
+
+        categories = Category.objects.bulk_create([
+            Category(name=f'Категория {c + 1}', order_priority=c)
+            for c in range(options['categories'])
+        ])
+        products = Product.objects.bulk_create([
+            Product(
+                category=category,
+                name=f'Блюдо {category.order_priority + 1}.{p + 1}',
+                description='Описание блюда для замера',
+                price=Decimal(rng.randrange(150, 2500, 10)),
+                order_priority=p,
+                weight='300г',
+                cooking_time='15-20 мин',
+            )
+            for category in categories
+            for p in range(options['products'])
+        ], batch_size=BULK_BATCH_SIZE)
+
+        now = timezone.now()
+        history = options['orders']
+        self.create_orders(
+            rooms, products, history,
+            lambda: now - timedelta(seconds=rng.randrange(3600, max(options['days'], 1) * 86400)),
+            status=lambda: 'done', is_archived=True,
+        )
+        self.create_orders(
+            rooms, products, options['live_orders'],
+            lambda: now - timedelta(seconds=rng.randrange(0, 3600)),
+            status=lambda: rng.choice(('new', 'new', 'cooking', 'done')), is_archived=False,
+        )
+        rebuild_sales_rollup()
+
+        user_model = get_user_model()
+        self.staff = user_model.objects.create_superuser('bench', 'bench@example.com', None)
+        self.rooms = rooms
+        self.products = [product for product in products if product.is_available]
+
+    def create_orders(self, rooms, products, count, created_at, status, is_archived):
+        """Заказы с позициями; created_at проставляется отдельно (auto_now_add)"""
+        rng = self.random
+        for start in range(0, count, BULK_BATCH_SIZE):
+            orders = []
+            lines = []
+            for _ in range(min(BULK_BATCH_SIZE, count - start)):
+                items = [(product, rng.randint(1, 3)) for product in rng.sample(products, min(len(products), rng.randint(1, 4)))]
+                orders.append(Order(
+                    room=rng.choice(rooms),
+                    total_price=sum(product.price * quantity for product, quantity in items),
+                    status=status(),
+                    is_archived=is_archived,
+                    is_viewed=is_archived or rng.random() < 0.5,
+                ))
+                lines.append(items)
+            orders = Order.objects.bulk_create(orders)
+
+            for order in orders:
+                order.created_at = order.updated_at = created_at()
+            Order.objects.bulk_update(orders, ['created_at', 'updated_at'])
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product=product, quantity=quantity, price_at_moment=product.price)
+                for order, items in zip(orders, lines)
+                for product, quantity in items
+            ])
+
+    def describe_hotel(self):
+        return (
+            f'корпусов {Building.objects.count()}, этажей {Floor.objects.count()}, '
+            f'номеров {Room.objects.count()}, блюд {Product.objects.count()}, '
+            f'заказов {Order.objects.count()}'
+        )
+
+    def scenario_requests(self):
+        """
+        Сценарии: {имя: (подготовка, запрос)}.
+
+        Подготовка (не входит в замер) и запрос получают номер итерации.
+        """
+        guest = Client()
+        staff = Client()
+        staff.force_login(self.staff)
+        rng = self.random
+        rooms = self.rooms
+        products = self.products
+        # Корзина одного гостя в одном номере: как серия кликов с телефона
+        cart_room = rooms[0].slug
+
+        def post_json(url, data):
+            return guest.post(url, json.dumps(data), content_type='application/json')
+
+        def fill_cart(i):
+            for product in rng.sample(products, min(3, len(products))):
+                post_json(reverse('cart_add', args=[cart_room]), {'product_id': product.id, 'quantity': 1})
+
+        return {
+            'menu_page': (None, lambda i: guest.get(reverse('order_page', args=[rooms[i % len(rooms)].slug]))),
+            'cart_add': (None, lambda i: post_json(
+                reverse('cart_add', args=[cart_room]),
+                {'product_id': products[i % len(products)].id, 'quantity': 1},
+            )),
+            'cart_update': (None, lambda i: post_json(
+                reverse('cart_update', args=[cart_room]),
+                {'product_id': products[i % len(products)].id, 'quantity': i % 5 + 1},
+            )),
+            'cart_get': (None, lambda i: guest.get(reverse('get_cart', args=[cart_room]))),
+            'create_order': (fill_cart, lambda i: guest.post(reverse('create_order', args=[cart_room]))),
+            'orders_live': (None, lambda i: staff.get(reverse('orders_live'))),
+            'unviewed_orders': (None, lambda i: staff.get(reverse('unviewed_orders'))),
+            'statistics': (None, lambda i: staff.get(reverse('dashboard_statistics'))),
+            'qr_export': (None, lambda i: staff.get(reverse('generate_qr_images'))),
+        }
+
+    def run_scenarios(self, scenarios, options):
+        requests = self.scenario_requests()
+        results = {}
+        for name in scenarios:
+            prepare, request = requests[name]
+            count = options['heavy_requests'] if name in HEAVY_SCENARIOS else options['requests']
+            results[name] = self.run_scenario(name, prepare, request, count)
+        return results
+
+    def run_scenario(self, name, prepare, request, count):
+        def call(i):
+            if prepare is not None:
+                prepare(i)
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = request(i)
+                body = consume(response)
+                elapsed = time.perf_counter() - started
+            return elapsed, len(queries), response, body
+
+        # Первый запрос - с холодным кэшем, в процентили не входит
+        cold, cold_queries, response, body = call(0)
+        if is_failure(response, body):
+            raise CommandError(f'{name}: ответ {response.status_code} {body[:200]!r}')
+
+        timings = []
+        query_counts = []
+        failures = 0
+        for i in range(1, count + 1):
+            elapsed, query_count, response, body = call(i)
+            timings.append(elapsed * 1000)
+            query_counts.append(query_count)
+            failures += is_failure(response, body)
+
+        if prepare is not None:
+            prepare(count + 1)
+        tracemalloc.start()
+        try:
+            consume(request(count + 1))
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        timings.sort()
+        return {
+            'requests': count,
+            'failures': failures,
+            'cold_ms': round(cold * 1000, 2),
+            'cold_queries': cold_queries,
+            'mean_ms': round(sum(timings) / len(timings), 2),
+            'p50_ms': round(percentile(timings, 0.50), 2),
+            'p95_ms': round(percentile(timings, 0.95), 2),
+            'p99_ms': round(percentile(timings, 0.99), 2),
+            'queries_mean': round(sum(query_counts) / len(query_counts), 2),
+            'queries_max': max(query_counts),
+            'peak_memory_kb': round(peak / 1024, 1),
+            'response_bytes': len(body),
+        }
+
+    def print_report(self, results):
+        self.stdout.write(
+            f'{"Сценарий":<16} {"p50, мс":>8} {"p95, мс":>8} {"p99, мс":>8} {"холодный":>9} '
+            f'{"запросы":>8} {"макс":>5} {"память, КБ":>11} {"ошибки":>7}'
+        )
+        for name, result in results.items():
+            line = (
+                f'{name:<16} {result["p50_ms"]:>8.2f} {result["p95_ms"]:>8.2f} {result["p99_ms"]:>8.2f} '
+                f'{result["cold_ms"]:>9.2f} {result["queries_mean"]:>8.1f} {result["queries_max"]:>5} '
+                f'{result["peak_memory_kb"]:>11.1f} {result["failures"]:>7}'
+            )
+            self.stdout.write(self.style.ERROR(line) if result['failures'] else line)
+
+    def print_comparison(self, results, baseline):
+        previous = baseline.get('scenarios', {})
+        self.stdout.write(f'\nСравнение с {baseline.get("revision") or "прошлым замером"} (p95 и запросы к БД):')
+        for name, result in results.items():
+            old = previous.get(name)
+            if not old:
+                self.stdout.write(f'{name:<16} нет в прошлом замере')
+                continue
+            p95_change = (result['p95_ms'] - old['p95_ms']) / old['p95_ms'] if old['p95_ms'] else 0
+            line = (
+                f'{name:<16} p95 {old["p95_ms"]:.2f} -> {result["p95_ms"]:.2f} мс ({p95_change:+.0%}), '
+                f'запросы {old["queries_mean"]:.1f} -> {result["queries_mean"]:.1f}'
+            )
+            regressed = (
+                p95_change > REGRESSION_THRESHOLD
+                or result['queries_mean'] > old['queries_mean'] * (1 + REGRESSION_THRESHOLD)
+            )
+            self.stdout.write(self.style.WARNING(line) if regressed else line)
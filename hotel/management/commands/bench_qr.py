@@ -0,0 +1,84 @@
+"""
+Management command для сравнения способов отрисовки PNG с QR-кодами.
+
+Рисует QR-коды для синтетических коротких ссылок номеров тремя способами:
+фабрикой изображений qrcode + Pillow (прежний путь), растеризацией матрицы
+в NumPy (render_qr_png) и PNG-писателем segno. Кэш QR-кодов не используется.
+
+    python manage.py bench_qr
+    python manage.py bench_qr --count 1000 --border 0   # как выгрузка ZIP
+"""
+import time
+import uuid
+from io import BytesIO
+
+import segno
+from django.core.management.base import BaseCommand, CommandError
+
+from hotel.models import short_link_url
+from hotel.qr_render import np, qr_matrix, render_qr_png, render_qr_png_pil
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает скорость отрисовки PNG с QR-кодами: qrcode, NumPy и segno'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--count',
+            type=int,
+            default=1000,
+            help='Сколько QR-кодов рисовать каждым способом (по умолчанию 1000)',
+        )
+        parser.add_argument(
+            '--border',
+            type=int,
+            default=4,
+            help='Отступ QR-кода в модулях (по умолчанию 4, в выгрузке ZIP - 0)',
+        )
+        parser.add_argument(
+            '--box-size',
+            type=int,
+            default=10,
+            help='Размер модуля в пикселях (по умолчанию 10)',
+        )
+
+    def handle(self, *args, **options):
+        count = options['count']
+        if count <= 0:
+            raise CommandError('--count должно быть больше нуля')
+        border = options['border']
+        box_size = options['box_size']
+
+        urls = [short_link_url(uuid.uuid4()) for _ in range(count)]
+
+        def segno_png(url):
+            buffer = BytesIO()
+            segno.make(url, error='l', boost_error=False, micro=False).save(
+                buffer, kind='png', border=border, scale=box_size,
+            )
+            return buffer.getvalue()
+
+        renderers = [
+            ('qrcode: только матрица', lambda url: qr_matrix(url, border)),
+            ('qrcode + Pillow (прежний путь)', lambda url: render_qr_png_pil(url, border=border, box_size=box_size)),
+        ]
+        if np is not None:
+            renderers.append(('qrcode + NumPy (render_qr_png)', lambda url: render_qr_png(url, border=border, box_size=box_size)))
+        else:
+            self.stdout.write(self.style.WARNING('NumPy не установлен: render_qr_png использует Pillow'))
+        renderers.append(('segno PNG', segno_png))
+
+        self.stdout.write(f'QR-кодов: {count}, border={border}, box_size={box_size}')
+        self.stdout.write(f'{"Способ":<34} {"всего, с":>9} {"мс/код":>8} {"байт/PNG":>9}')
+        for name, render in renderers:
+            started = time.perf_counter()
+            size = 0
+            for url in urls:
+                result = render(url)
+                if isinstance(result, bytes):
+                    size += len(result)
+            elapsed = time.perf_counter() - started
+            average_size = f'{size // count}' if size else '-'
+            self.stdout.write(
+                f'{name:<34} {elapsed:>9.2f} {elapsed * 1000 / count:>8.2f} {average_size:>9}'
+            )
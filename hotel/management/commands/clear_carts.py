@@ -0,0 +1,33 @@
+"""
+Management command для удаления брошенных корзин гостей (DatabaseCartStore).
+
+Запускается по расписанию (например, из cron раз в сутки):
+
+    python manage.py clear_carts
+    python manage.py clear_carts --hours 48
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from hotel.cart import clear_stale_carts
+
+
+class Command(BaseCommand):
+    help = 'Удаляет корзины гостей, которые не менялись дольше срока сессии'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours',
+            type=int,
+            default=None,
+            help='Удалять корзины старше N часов (по умолчанию - срок сессии SESSION_COOKIE_AGE)',
+        )
+
+    def handle(self, *args, **options):
+        max_age = None
+        if options['hours'] is not None:
+            if options['hours'] <= 0:
+                raise CommandError('--hours должно быть больше нуля')
+            max_age = options['hours'] * 60 * 60
+
+        deleted = clear_stale_carts(max_age=max_age)
+        self.stdout.write(self.style.SUCCESS(f'Удалено позиций корзин: {deleted}'))
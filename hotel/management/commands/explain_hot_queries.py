@@ -0,0 +1,88 @@
+"""
+Management command для проверки планов горячих запросов к заказам.
+
+Выполняет EXPLAIN для каждого запроса, который дашборд и страницы гостя
+делают постоянно, и отмечает полный просмотр таблицы hotel_order:
+
+    python manage.py explain_hot_queries
+    python manage.py explain_hot_queries --fail   # код ошибки при полном просмотре
+"""
+import json
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from hotel.models import Order
+
+
+def hot_queries():
+    """Запросы в той форме, в какой их строят представления"""
+    now = timezone.now()
+    today_start = timezone.localtime(now).replace(hour=0, minute=0, second=0, microsecond=0)
+    return [
+        ('Живой список заказов', Order.objects.live().order_by('-created_at')[:50]),
+        ('Счетчик заказов по статусу', Order.objects.live().filter(status='new')),
+        ('Непросмотренные заказы', Order.objects.unviewed().order_by('-created_at')[:20]),
+        ('Активный заказ гостя (номер)', Order.objects.filter(
+            room_id=1, session_key='x', is_archived=False, status__in=['new', 'cooking'])[:1]),
+        ('Активный заказ гостя (корпус)', Order.objects.filter(
+            building_id=1, session_key='x', is_archived=False, status__in=['new', 'cooking'])[:1]),
+        ('Активный заказ гостя (этаж)', Order.objects.filter(
+            floor_id=1, session_key='x', is_archived=False, status__in=['new', 'cooking'])[:1]),
+        ('Заказы за сегодня', Order.objects.filter(created_at__gte=today_start)),
+        ('Дельта ?since=', Order.objects.filter(
+            updated_at__gte=now - timedelta(minutes=5)).order_by('-updated_at')[:201]),
+    ]
+
+
+def sqlite_full_scan(plan):
+    # "SCAN hotel_order" - просмотр всей таблицы или всего индекса,
+    # в отличие от "SEARCH hotel_order USING INDEX ..."
+    return any('SCAN hotel_order' in line for line in plan.splitlines())
+
+
+def mysql_full_scan(node):
+    # В JSON-плане MySQL полный просмотр - access_type "ALL"
+    if isinstance(node, dict):
+        if node.get('table_name') == Order._meta.db_table and node.get('access_type') == 'ALL':
+            return True
+        return any(mysql_full_scan(value) for value in node.values())
+    if isinstance(node, list):
+        return any(mysql_full_scan(value) for value in node)
+    return False
+
+
+class Command(BaseCommand):
+    help = 'Показывает планы выполнения горячих запросов к заказам'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fail',
+            action='store_true',
+            help='Завершиться с ошибкой, если какой-то запрос просматривает всю таблицу',
+        )
+
+    def handle(self, *args, **options):
+        vendor = connection.vendor
+        full_scans = []
+
+        for title, queryset in hot_queries():
+            if vendor == 'mysql':
+                plan = queryset.explain(format='JSON')
+                full_scan = mysql_full_scan(json.loads(plan))
+            else:
+                plan = queryset.explain()
+                full_scan = vendor == 'sqlite' and sqlite_full_scan(plan)
+
+            if full_scan:
+                full_scans.append(title)
+                self.stdout.write(self.style.ERROR(f'✗ {title}: полный просмотр таблицы'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'✓ {title}'))
+            self.stdout.write(plan)
+            self.stdout.write('')
+
+        if full_scans and options['fail']:
+            raise CommandError(f'Полный просмотр таблицы: {", ".join(full_scans)}')
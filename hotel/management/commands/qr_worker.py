@@ -0,0 +1,71 @@
+"""
+Management command для отложенной генерации QR-кодов.
+
+При QR_GENERATION = 'deferred' сохранение корпуса, этажа или номера не рисует
+QR-код: объект с пустым qr_code сам является заданием в очереди, а этот
+воркер заполняет поле позже. Запускается одним отдельным процессом:
+
+    python manage.py qr_worker
+    python manage.py qr_worker --once   # обработать всё и завершиться
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from hotel.models import Building, Floor, Room
+
+
+class Command(BaseCommand):
+    help = 'Генерирует QR-коды для корпусов, этажей и номеров без QR-кода'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Обработать текущую очередь и завершиться',
+        )
+        parser.add_argument(
+            '--batch',
+            type=int,
+            default=100,
+            help='Сколько объектов каждого типа выбирать за один проход (по умолчанию 100)',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=2.0,
+            help='Пауза в секундах, когда очередь пуста (по умолчанию 2)',
+        )
+
+    def handle(self, *args, **options):
+        # Объекты, на которых генерация упала, до перезапуска не повторяем
+        self.failed = {Building: set(), Floor: set(), Room: set()}
+
+        self.stdout.write('Воркер QR-кодов запущен')
+        try:
+            while True:
+                processed = self.process_batch(options['batch'])
+                if options['once'] and not processed:
+                    break
+                if not processed:
+                    time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            self.stdout.write('Воркер остановлен')
+
+    def process_batch(self, batch_size):
+        """Генерирует QR-коды для очередной порции объектов; возвращает их количество"""
+        processed = 0
+        for model in (Building, Floor, Room):
+            pending = model.objects.filter(
+                Q(qr_code='') | Q(qr_code__isnull=True)
+            ).exclude(pk__in=self.failed[model]).order_by('pk')[:batch_size]
+
+            for obj in pending:
+                try:
+                    obj.generate_qr_code()
+                    processed += 1
+                except Exception as e:
+                    self.failed[model].add(obj.pk)
+                    self.stdout.write(self.style.ERROR(f'QR-код для "{obj}" не создан: {e}'))
+        return processed
@@ -0,0 +1,153 @@
+"""
+Management command для отправки уведомлений из очереди TelegramOutbox.
+
+Заказы только записывают задание в очередь (в той же транзакции), а этот
+воркер отправляет их в Telegram, поэтому оформление заказа не зависит от
+скорости Telegram API. Запускается одним отдельным процессом:
+
+    python manage.py telegram_worker
+"""
+import time
+from datetime import timedelta
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from hotel.models import Order, TelegramOutbox
+from hotel.utils import (
+    TelegramAPIError, send_telegram_notification, update_order_status_telegram,
+    answer_telegram_callback,
+)
+
+
+class Command(BaseCommand):
+    help = 'Отправляет уведомления из очереди Telegram'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Обработать текущую очередь и завершиться',
+        )
+        parser.add_argument(
+            '--batch',
+            type=int,
+            default=50,
+            help='Сколько заданий выбирать за один проход (по умолчанию 50)',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=1.0,
+            help='Пауза в секундах, когда очередь пуста (по умолчанию 1)',
+        )
+        parser.add_argument(
+            '--max-attempts',
+            type=int,
+            default=8,
+            help='Число попыток до пометки задания как ошибочного (по умолчанию 8)',
+        )
+
+    def handle(self, *args, **options):
+        # Одна сессия на весь воркер - соединение с api.telegram.org переиспользуется
+        session = requests.Session()
+        session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=4))
+
+        # Задания, зависшие после аварийной остановки воркера, возвращаем в очередь
+        TelegramOutbox.objects.filter(status='processing').update(status='pending')
+
+        self.stdout.write('Воркер уведомлений Telegram запущен')
+        try:
+            while True:
+                processed = self.process_batch(session, options['batch'], options['max_attempts'])
+                if options['once']:
+                    break
+                if not processed:
+                    time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            self.stdout.write('Воркер остановлен')
+        finally:
+            session.close()
+
+    def process_batch(self, session, batch_size, max_attempts):
+        """Обрабатывает задания, срок которых наступил; возвращает их количество"""
+        jobs = list(
+            TelegramOutbox.objects.filter(
+                status='pending',
+                next_attempt_at__lte=timezone.now(),
+            ).select_related('order').order_by('id')[:batch_size]
+        )
+
+        processed = 0
+        for job in jobs:
+            # Захватываем задание, чтобы его не отправил второй экземпляр воркера
+            if not TelegramOutbox.objects.filter(pk=job.pk, status='pending').update(status='processing'):
+                continue
+            processed += 1
+
+            try:
+                delivered = self.deliver(job, session)
+            except TelegramAPIError as e:
+                if e.retry_after:
+                    # Ограничение частоты действует на весь бот: откладываем задание
+                    # без траты попытки и делаем паузу перед остальными
+                    self.reschedule(job, e.retry_after, str(e), count_attempt=False)
+                    time.sleep(min(e.retry_after, 60))
+                    break
+                self.fail_or_retry(job, str(e), max_attempts, permanent=e.permanent)
+            except Exception as e:
+                self.fail_or_retry(job, str(e), max_attempts)
+            else:
+                if delivered:
+                    job.status = 'sent'
+                    job.sent_at = timezone.now()
+                    job.save(update_fields=['status', 'sent_at'])
+                else:
+                    # Сообщение о заказе еще не отправлено - обновлять пока нечего
+                    self.reschedule(job, 2, '', count_attempt=False)
+
+        return processed
+
+    def deliver(self, job, session):
+        """Выполняет задание; False - задание нужно отложить"""
+        if job.kind == 'callback_answer':
+            answer_telegram_callback(job.payload.get('callback_id'), job.payload.get('text', ''), session=session)
+            return True
+
+        if job.order_id is None:
+            return True
+
+        order = Order.objects.select_related(
+            'room', 'room__floor', 'room__floor__building', 'building', 'floor', 'floor__building'
+        ).prefetch_related('items__product').get(pk=job.order_id)
+
+        if job.kind == 'new_order':
+            send_telegram_notification(order, session=session)
+        elif job.kind == 'status_update':
+            if not order.telegram_message_id and TelegramOutbox.objects.filter(
+                order_id=order.pk, kind='new_order', status__in=['pending', 'processing']
+            ).exists():
+                return False
+            update_order_status_telegram(order, session=session)
+        return True
+
+    def reschedule(self, job, delay, error, count_attempt=True):
+        job.status = 'pending'
+        if count_attempt:
+            job.attempts += 1
+        job.next_attempt_at = timezone.now() + timedelta(seconds=delay)
+        job.last_error = error
+        job.save(update_fields=['status', 'attempts', 'next_attempt_at', 'last_error'])
+
+    def fail_or_retry(self, job, error, max_attempts, permanent=False):
+        if permanent or job.attempts + 1 >= max_attempts:
+            job.status = 'failed'
+            job.attempts += 1
+            job.last_error = error
+            job.save(update_fields=['status', 'attempts', 'last_error'])
+            self.stdout.write(self.style.ERROR(f'Задание #{job.id} не отправлено: {error}'))
+            return
+        # Экспоненциальная задержка: 2, 4, 8 ... секунд, не более 5 минут
+        self.reschedule(job, min(2 ** (job.attempts + 1), 300), error)
@@ -0,0 +1,68 @@
+"""
+Кэш меню для гостевых страниц (номер, этаж, корпус).
+
+Меню меняется несколько раз в день, а QR-коды сканируют сотни раз в час,
+поэтому категории с доступными блюдами и отрисованный фрагмент меню
+кэшируются по глобальной версии меню. Версия меняется при сохранении или
+удалении Category/Product (см. hotel.signals): старые снимки просто
+перестают использоваться и истекают по таймауту.
+"""
+import time
+
+from django.core.cache import cache
+from django.db.models import Prefetch
+from django.utils.functional import SimpleLazyObject
+
+from .models import Category, Product
+
+MENU_VERSION_KEY = 'menu:version'
+MENU_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def get_menu_version():
+    """Текущая версия меню (создается при первом обращении)"""
+    version = cache.get(MENU_VERSION_KEY)
+    if version is None:
+        version = time.time_ns()
+        # add не перезапишет версию, которую успел выставить другой воркер
+        if not cache.add(MENU_VERSION_KEY, version, None):
+            version = cache.get(MENU_VERSION_KEY, version)
+    return version
+
+
+def bump_menu_version():
+    """Инвалидация меню: новая версия на основе времени уникальна для всех воркеров"""
+    version = time.time_ns()
+    cache.set(MENU_VERSION_KEY, version, None)
+    return version
+
+
+def get_menu_categories(version=None):
+    """Активные категории с доступными блюдами из кэша (или из БД при промахе)"""
+    if version is None:
+        version = get_menu_version()
+    key = f'menu:categories:{version}'
+    categories = cache.get(key)
+    if categories is None:
+        categories = list(
+            Category.objects.filter(is_active=True).prefetch_related(
+                Prefetch('products', queryset=Product.objects.filter(is_available=True))
+            )
+        )
+        cache.set(key, categories, MENU_CACHE_TIMEOUT)
+    return categories
+
+
+def get_menu_context():
+    """
+    Контекст меню для шаблона hotel/order_page.html.
+
+    Категории загружаются лениво: если фрагмент меню для текущей версии уже
+    отрисован и лежит в кэше, шаблон к ним не обращается вовсе.
+    """
+    version = get_menu_version()
+    return {
+        'categories': SimpleLazyObject(lambda: get_menu_categories(version)),
+        'menu_version': version,
+        'menu_cache_timeout': MENU_CACHE_TIMEOUT,
+    }
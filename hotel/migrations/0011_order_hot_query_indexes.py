@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-16 20:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0010_telegram_outbox'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['is_archived', '-created_at'], name='hotel_order_live_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['is_archived', 'status'], name='hotel_order_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['is_archived', 'is_viewed', '-created_at'], name='hotel_order_unviewed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['room', 'session_key', 'is_archived', 'status'], name='hotel_order_room_sess_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['building', 'session_key', 'is_archived', 'status'], name='hotel_order_bld_sess_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['floor', 'session_key', 'is_archived', 'status'], name='hotel_order_floor_sess_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['created_at'], name='hotel_order_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['updated_at'], name='hotel_order_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-16 20:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0011_order_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField(verbose_name='Час')),
+                ('location_type', models.CharField(blank=True, choices=[('', 'Не указано'), ('room', 'Номер'), ('building', 'Корпус'), ('floor', 'Этаж')], max_length=10, verbose_name='Тип места')),
+                ('location_id', models.PositiveIntegerField(default=0, verbose_name='ID места')),
+                ('orders', models.IntegerField(default=0, verbose_name='Заказов')),
+                ('quantity', models.IntegerField(default=0, verbose_name='Количество')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Выручка')),
+                ('product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to='hotel.product', verbose_name='Блюдо')),
+            ],
+            options={
+                'verbose_name': 'Сводка продаж',
+                'verbose_name_plural': 'Сводки продаж',
+                'ordering': ['-hour'],
+                'indexes': [models.Index(fields=['hour', 'location_type', 'location_id'], name='hotel_sales_hour_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.7 on 2026-10-16 20:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0012_sales_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='Номер заказа')),
+                ('room_id', models.BigIntegerField(blank=True, null=True, verbose_name='ID номера')),
+                ('building_id', models.BigIntegerField(blank=True, null=True, verbose_name='ID корпуса')),
+                ('floor_id', models.BigIntegerField(blank=True, null=True, verbose_name='ID этажа')),
+                ('location', models.CharField(blank=True, max_length=255, verbose_name='Место доставки')),
+                ('total_price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Общая сумма')),
+                ('status', models.CharField(choices=[('new', 'Новый'), ('cooking', 'Готовится'), ('done', 'Выполнен'), ('archived', 'Архив')], max_length=20, verbose_name='Статус')),
+                ('created_at', models.DateTimeField(verbose_name='Создан')),
+                ('updated_at', models.DateTimeField(verbose_name='Обновлен')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='Перенесен в архив')),
+            ],
+            options={
+                'verbose_name': 'Архивный заказ',
+                'verbose_name_plural': 'Архив заказов',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrderItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_name', models.CharField(max_length=200, verbose_name='Название блюда')),
+                ('quantity', models.IntegerField(verbose_name='Количество')),
+                ('price_at_moment', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Цена на момент заказа')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='hotel.archivedorder', verbose_name='Заказ')),
+                ('product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='hotel.product', verbose_name='Блюдо')),
+            ],
+            options={
+                'verbose_name': 'Позиция архивного заказа',
+                'verbose_name_plural': 'Позиции архивных заказов',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['created_at'], name='hotel_archorder_created_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-16 20:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0013_order_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CartItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('session_key', models.CharField(max_length=40, verbose_name='Ключ сессии')),
+                ('location_type', models.CharField(max_length=20, verbose_name='Тип места')),
+                ('location_id', models.BigIntegerField(verbose_name='ID места')),
+                ('quantity', models.IntegerField(default=0, verbose_name='Количество')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='hotel.product', verbose_name='Блюдо')),
+            ],
+            options={
+                'verbose_name': 'Позиция корзины',
+                'verbose_name_plural': 'Корзины гостей',
+                'indexes': [models.Index(fields=['updated_at'], name='hotel_cartitem_updated_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(fields=('session_key', 'location_type', 'location_id', 'product'), name='hotel_cartitem_unique'),
+        ),
+    ]
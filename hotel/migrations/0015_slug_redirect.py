@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-16 20:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0014_cart_item'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlugRedirect',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('location_type', models.CharField(choices=[('room', 'Номер'), ('floor', 'Этаж'), ('building', 'Корпус')], max_length=20, verbose_name='Тип места')),
+                ('old_slug', models.CharField(max_length=50, verbose_name='Старый URL-адрес')),
+                ('location_id', models.BigIntegerField(verbose_name='ID места')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+            ],
+            options={
+                'verbose_name': 'Перенаправление адреса',
+                'verbose_name_plural': 'Перенаправления адресов',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='slugredirect',
+            constraint=models.UniqueConstraint(fields=('location_type', 'old_slug'), name='hotel_slugredirect_unique'),
+        ),
+    ]
@@ -1,12 +1,51 @@
 from django.db import models
 from django.utils.text import slugify
 from django.urls import reverse
+from django.utils import timezone
+from django.core.files.base import ContentFile
+from django.core.cache import cache
 import uuid
 import re
-import qrcode
-from io import BytesIO
-from django.core.files import File
-from PIL import Image, ImageDraw, ImageFont
+import time
+
+from .qr_cache import get_qr_png
+
+
+def qr_generation_deferred():
+    """QR-коды новых объектов создает manage.py qr_worker, а не save()"""
+    from django.conf import settings
+    return getattr(settings, 'QR_GENERATION', 'sync') == 'deferred'
+
+
+# Base32 Crockford: только цифры и заглавные буквы без I, L, O, U
+SHORT_CODE_ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+SHORT_CODE_LENGTH = 8
+
+
+def token_short_code(token):
+    """Код короткой ссылки /t/<код>/: первые 40 бит токена в base32"""
+    value = uuid.UUID(str(token)).int >> (128 - 5 * SHORT_CODE_LENGTH)
+    chars = []
+    for _ in range(SHORT_CODE_LENGTH):
+        value, index = divmod(value, 32)
+        chars.append(SHORT_CODE_ALPHABET[index])
+    return ''.join(reversed(chars))
+
+
+def short_link_url(token):
+    """
+    Адрес для QR-кода: короткая ссылка по токену, не зависящая от slug.
+
+    Адрес пишется заглавными буквами (схема и домен регистр не различают,
+    маршрут /T/ тоже), поэтому QR-код кодирует его в буквенно-цифровом
+    режиме - 5.5 бит на символ вместо 8, меньшая версия QR-кода.
+    """
+    from django.conf import settings
+    site_url = getattr(settings, 'SITE_URL', 'http://localhost:8000').rstrip('/')
+    # Путь в SITE_URL может зависеть от регистра - его не трогаем
+    if '/' not in site_url.split('://', 1)[-1]:
+        site_url = site_url.upper()
+    return f"{site_url}/T/{token_short_code(token)}/"
 
 
 class Building(models.Model):
@@ -68,68 +107,25 @@ class Building(models.Model):
         if not self.token:
             self.token = uuid.uuid4()
         super().save(*args, **kwargs)
-        if not self.qr_code:
+        if not self.qr_code and not qr_generation_deferred():
             self.generate_qr_code()
     
     def generate_qr_code(self):
         """Генерация QR-кода для корпуса"""
-        from django.conf import settings
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
-        # Используем домен из настроек
-        site_url = getattr(settings, 'SITE_URL', 'http://localhost:8000')
-        # Убираем слэш в конце если есть
-        site_url = site_url.rstrip('/')
-        url = f"{site_url}/building/{self.slug}/"
-        qr.add_data(url)
-        qr.make(fit=True)
-        
-        # Создаем классический QR-код: черный на белом фоне
-        img = qr.make_image(fill_color="black", back_color="white")
-        # Убеждаемся, что изображение в режиме RGB (без альфа-канала)
-        if img.mode != 'RGB':
-            img = img.convert('RGB')
-        
-        # Добавляем белую рамку вокруг QR-кода
-        border_size = 20  # Размер рамки в пикселях
-        qr_width, qr_height = img.size
-        # Создаем новое изображение с рамкой
-        bordered_img = Image.new('RGB', 
-                               (qr_width + border_size * 2, qr_height + border_size * 2), 
-                               'white')
-        # Вставляем QR-код в центр (с рамкой вокруг)
-        bordered_img.paste(img, (border_size, border_size))
-        img = bordered_img
-        
-        # Добавляем текст с названием корпуса
-        draw = ImageDraw.Draw(img)
-        try:
-            font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 20)
-        except:
-            font = ImageFont.load_default()
-        
-        text = f"Building {self.name}"
-        bbox = draw.textbbox((0, 0), text, font=font)
-        text_width = bbox[2] - bbox[0]
-        text_height = bbox[3] - bbox[1]
+        # Короткая ссылка по токену переживает переименование
+        url = short_link_url(self.token)
         
-        img_width, img_height = img.size
-        position = ((img_width - text_width) // 2, img_height - text_height - 10)
-        draw.text(position, text, fill="black", font=font)
+        # Неизменившийся QR-код берется из кэша без повторной отрисовки
+        png = get_qr_png(url, label=f"Building {self.name}")
         
-        buffer = BytesIO()
-        img.save(buffer, format='PNG')
-        buffer.seek(0)
-        
-        self.qr_code.save(f'qr_building_{self.slug}.png', File(buffer), save=False)
-        super().save()
+        self.qr_code.save(f'qr_building_{self.slug}.png', ContentFile(png), save=False)
+        super().save(update_fields=['qr_code'])
     
     def get_absolute_url(self):
-        return reverse('building_page', kwargs={'building_slug': self.slug})
+        return reverse('building_page', kwargs={'slug': self.slug})
+    
+    def get_short_url(self):
+        return reverse('short_link', kwargs={'code': token_short_code(self.token)})
 
 
 class Floor(models.Model):
@@ -197,68 +193,25 @@ class Floor(models.Model):
         if not self.token:
             self.token = uuid.uuid4()
         super().save(*args, **kwargs)
-        if not self.qr_code:
+        if not self.qr_code and not qr_generation_deferred():
             self.generate_qr_code()
     
     def generate_qr_code(self):
         """Генерация QR-кода для этажа"""
-        from django.conf import settings
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
-        # Используем домен из настроек
-        site_url = getattr(settings, 'SITE_URL', 'http://localhost:8000')
-        # Убираем слэш в конце если есть
-        site_url = site_url.rstrip('/')
-        url = f"{site_url}/floor/{self.slug}/"
-        qr.add_data(url)
-        qr.make(fit=True)
+        # Короткая ссылка по токену переживает переименование
+        url = short_link_url(self.token)
         
-        # Создаем классический QR-код: черный на белом фоне
-        img = qr.make_image(fill_color="black", back_color="white")
-        # Убеждаемся, что изображение в режиме RGB (без альфа-канала)
-        if img.mode != 'RGB':
-            img = img.convert('RGB')
-        
-        # Добавляем белую рамку вокруг QR-кода
-        border_size = 20  # Размер рамки в пикселях
-        qr_width, qr_height = img.size
-        # Создаем новое изображение с рамкой
-        bordered_img = Image.new('RGB', 
-                               (qr_width + border_size * 2, qr_height + border_size * 2), 
-                               'white')
-        # Вставляем QR-код в центр (с рамкой вокруг)
-        bordered_img.paste(img, (border_size, border_size))
-        img = bordered_img
-        
-        # Добавляем текст с названием этажа
-        draw = ImageDraw.Draw(img)
-        try:
-            font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 20)
-        except:
-            font = ImageFont.load_default()
+        # Неизменившийся QR-код берется из кэша без повторной отрисовки
+        png = get_qr_png(url, label=f"Floor {self.name}")
         
-        text = f"Floor {self.name}"
-        bbox = draw.textbbox((0, 0), text, font=font)
-        text_width = bbox[2] - bbox[0]
-        text_height = bbox[3] - bbox[1]
-        
-        img_width, img_height = img.size
-        position = ((img_width - text_width) // 2, img_height - text_height - 10)
-        draw.text(position, text, fill="black", font=font)
-        
-        buffer = BytesIO()
-        img.save(buffer, format='PNG')
-        buffer.seek(0)
-        
-        self.qr_code.save(f'qr_floor_{self.slug}.png', File(buffer), save=False)
-        super().save()
+        self.qr_code.save(f'qr_floor_{self.slug}.png', ContentFile(png), save=False)
+        super().save(update_fields=['qr_code'])
     
     def get_absolute_url(self):
-        return reverse('floor_page', kwargs={'floor_slug': self.slug})
+        return reverse('floor_page', kwargs={'slug': self.slug})
+    
+    def get_short_url(self):
+        return reverse('short_link', kwargs={'code': token_short_code(self.token)})
 
 
 class Room(models.Model):
@@ -291,68 +244,25 @@ class Room(models.Model):
             else:
                 self.slug = slugify(f"{self.floor.number}-floor-room-{self.number}")
         super().save(*args, **kwargs)
-        if not self.qr_code:
+        if not self.qr_code and not qr_generation_deferred():
             self.generate_qr_code()
     
     def generate_qr_code(self):
         """Генерация QR-кода для номера"""
-        from django.conf import settings
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
-        # Используем домен из настроек
-        site_url = getattr(settings, 'SITE_URL', 'http://localhost:8000')
-        # Убираем слэш в конце если есть
-        site_url = site_url.rstrip('/')
-        url = f"{site_url}/order/{self.slug}/"
-        qr.add_data(url)
-        qr.make(fit=True)
-        
-        # Создаем классический QR-код: черный на белом фоне
-        img = qr.make_image(fill_color="black", back_color="white")
-        # Убеждаемся, что изображение в режиме RGB (без альфа-канала)
-        if img.mode != 'RGB':
-            img = img.convert('RGB')
+        # Короткая ссылка по токену переживает переименование
+        url = short_link_url(self.token)
         
-        # Добавляем белую рамку вокруг QR-кода
-        border_size = 20  # Размер рамки в пикселях
-        qr_width, qr_height = img.size
-        # Создаем новое изображение с рамкой
-        bordered_img = Image.new('RGB', 
-                               (qr_width + border_size * 2, qr_height + border_size * 2), 
-                               'white')
-        # Вставляем QR-код в центр (с рамкой вокруг)
-        bordered_img.paste(img, (border_size, border_size))
-        img = bordered_img
+        # Неизменившийся QR-код берется из кэша без повторной отрисовки
+        png = get_qr_png(url, label=f"Room {self.number}")
         
-        # Добавляем текст с номером комнаты
-        draw = ImageDraw.Draw(img)
-        try:
-            font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 20)
-        except:
-            font = ImageFont.load_default()
-        
-        text = f"Room {self.number}"
-        bbox = draw.textbbox((0, 0), text, font=font)
-        text_width = bbox[2] - bbox[0]
-        text_height = bbox[3] - bbox[1]
-        
-        img_width, img_height = img.size
-        position = ((img_width - text_width) // 2, img_height - text_height - 10)
-        draw.text(position, text, fill="black", font=font)
-        
-        buffer = BytesIO()
-        img.save(buffer, format='PNG')
-        buffer.seek(0)
-        
-        self.qr_code.save(f'qr_{self.slug}.png', File(buffer), save=False)
-        super().save()
+        self.qr_code.save(f'qr_{self.slug}.png', ContentFile(png), save=False)
+        super().save(update_fields=['qr_code'])
     
     def get_absolute_url(self):
-        return reverse('order_page', kwargs={'room_slug': self.slug})
+        return reverse('order_page', kwargs={'slug': self.slug})
+    
+    def get_short_url(self):
+        return reverse('short_link', kwargs={'code': token_short_code(self.token)})
 
 
 class Category(models.Model):
@@ -399,6 +309,22 @@ class Product(models.Model):
         return self.name
 
 
+class OrderQuerySet(models.QuerySet):
+    """Запросы к заказам, рассчитанные на составные индексы Order.Meta.indexes"""
+    
+    # Условие is_archived=False Django превращает в "WHERE NOT is_archived",
+    # которое не использует индексы ни в SQLite, ни в MySQL. Явное сравнение
+    # со значением дает поиск по индексу с is_archived в начале.
+    
+    def live(self):
+        """Заказы, не ушедшие в архив"""
+        return self.filter(is_archived=models.Value(False))
+    
+    def unviewed(self):
+        """Активные заказы, еще не просмотренные в дашборде"""
+        return self.live().filter(is_viewed=models.Value(False))
+
+
 class Order(models.Model):
     """Заказ"""
     STATUS_CHOICES = [
@@ -420,10 +346,28 @@ class Order(models.Model):
     is_viewed = models.BooleanField(default=False, verbose_name="Просмотрен в дашборде")
     telegram_message_id = models.CharField(max_length=50, blank=True, null=True, verbose_name="ID сообщения в Telegram")
     
+    objects = OrderQuerySet.as_manager()
+    
     class Meta:
         verbose_name = "Заказ"
         verbose_name_plural = "Заказы"
         ordering = ['-created_at']
+        # Индексы под горячие запросы (проверка: python manage.py explain_hot_queries)
+        indexes = [
+            # Живой список заказов: дашборд и /api/orders/live/
+            models.Index(fields=['is_archived', '-created_at'], name='hotel_order_live_idx'),
+            # Счетчики новых/готовящихся заказов
+            models.Index(fields=['is_archived', 'status'], name='hotel_order_status_idx'),
+            # Непросмотренные заказы: /api/notifications/unviewed/
+            models.Index(fields=['is_archived', 'is_viewed', '-created_at'], name='hotel_order_unviewed_idx'),
+            # Активный заказ гостя на странице меню
+            models.Index(fields=['room', 'session_key', 'is_archived', 'status'], name='hotel_order_room_sess_idx'),
+            models.Index(fields=['building', 'session_key', 'is_archived', 'status'], name='hotel_order_bld_sess_idx'),
+            models.Index(fields=['floor', 'session_key', 'is_archived', 'status'], name='hotel_order_floor_sess_idx'),
+            # Статистика по периодам и дельты ?since=
+            models.Index(fields=['created_at'], name='hotel_order_created_idx'),
+            models.Index(fields=['updated_at'], name='hotel_order_updated_idx'),
+        ]
     
     def __str__(self):
         if self.room:
@@ -463,6 +407,9 @@ class OrderItem(models.Model):
         return self.quantity * self.price_at_moment
 
 
+SITE_SETTINGS_VERSION_KEY = 'site_settings:version'
+
+
 class SiteSettings(models.Model):
     """Настройки сайта"""
     logo = models.ImageField(upload_to='settings/', blank=True, null=True, verbose_name="Логотип")
@@ -478,14 +425,232 @@ class SiteSettings(models.Model):
     def __str__(self):
         return "Настройки сайта"
     
+    # Копия настроек в памяти процесса: (версия, объект)
+    _cached = None
+    
     def save(self, *args, **kwargs):
         # Обеспечиваем единственную запись настроек
         self.pk = 1
         super().save(*args, **kwargs)
     
     @classmethod
-    def get_settings(cls):
-        """Получить настройки (создать если не существует)"""
+    def get_settings(cls, fresh=False):
+        """
+        Получить настройки (создать если не существует).
+        
+        Настройки читаются на каждой странице, поэтому объект хранится в памяти
+        процесса вместе с версией из общего кэша. Сохранение настроек меняет
+        версию (см. hotel.signals), и каждый воркер перечитывает запись из БД
+        только после этого. fresh=True - объект прямо из БД для редактирования.
+        """
+        if fresh:
+            settings, created = cls.objects.get_or_create(pk=1)
+            return settings
+        
+        version = cls.get_version()
+        cached = cls._cached
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        
         settings, created = cls.objects.get_or_create(pk=1)
+        cls._cached = (version, settings)
         return settings
+    
+    @classmethod
+    def get_version(cls):
+        """Версия настроек в общем кэше (создается при первом обращении)"""
+        version = cache.get(SITE_SETTINGS_VERSION_KEY)
+        if version is None:
+            version = time.time_ns()
+            if not cache.add(SITE_SETTINGS_VERSION_KEY, version, None):
+                version = cache.get(SITE_SETTINGS_VERSION_KEY, version)
+        return version
+    
+    @classmethod
+    def bump_version(cls):
+        """Новая версия настроек: все воркеры перечитают их при следующем обращении"""
+        version = time.time_ns()
+        cache.set(SITE_SETTINGS_VERSION_KEY, version, None)
+        return version
+
+
+
+class TelegramOutbox(models.Model):
+    """Очередь уведомлений Telegram (отправляется командой telegram_worker)"""
+    KIND_CHOICES = [
+        ('new_order', 'Новый заказ'),
+        ('status_update', 'Изменение статуса'),
+        ('callback_answer', 'Ответ на нажатие кнопки'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Ожидает отправки'),
+        ('processing', 'Отправляется'),
+        ('sent', 'Отправлено'),
+        ('failed', 'Ошибка'),
+    ]
+    
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, verbose_name="Тип")
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='telegram_outbox', blank=True, null=True, verbose_name="Заказ")
+    payload = models.JSONField(default=dict, blank=True, verbose_name="Данные")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name="Статус")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Попыток")
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name="Следующая попытка")
+    last_error = models.TextField(blank=True, verbose_name="Последняя ошибка")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Создано")
+    sent_at = models.DateTimeField(blank=True, null=True, verbose_name="Отправлено")
+    
+    class Meta:
+        verbose_name = "Уведомление Telegram"
+        verbose_name_plural = "Очередь уведомлений Telegram"
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='hotel_outbox_due_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.id} - {self.get_status_display()}"
+
+
+class SalesRollup(models.Model):
+    """
+    Сводка продаж за час по месту доставки и блюду (для страницы статистики).
+
+    Строка с product=None - итог по заказам за час: число заказов, позиций и
+    выручка. Строки обновляются при оформлении и удалении заказа (см.
+    hotel.sales) и пересчитываются командой backfill_sales. Отчеты всегда
+    суммируют строки, поэтому повторная строка с тем же ключом не искажает итог.
+    """
+    LOCATION_CHOICES = [
+        ('', 'Не указано'),
+        ('room', 'Номер'),
+        ('building', 'Корпус'),
+        ('floor', 'Этаж'),
+    ]
+    
+    hour = models.DateTimeField(verbose_name="Час")
+    location_type = models.CharField(max_length=10, choices=LOCATION_CHOICES, blank=True, verbose_name="Тип места")
+    location_id = models.PositiveIntegerField(default=0, verbose_name="ID места")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='sales_rollups', blank=True, null=True, verbose_name="Блюдо")
+    orders = models.IntegerField(default=0, verbose_name="Заказов")
+    quantity = models.IntegerField(default=0, verbose_name="Количество")
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="Выручка")
+    
+    class Meta:
+        verbose_name = "Сводка продаж"
+        verbose_name_plural = "Сводки продаж"
+        ordering = ['-hour']
+        indexes = [
+            models.Index(fields=['hour', 'location_type', 'location_id'], name='hotel_sales_hour_idx'),
+        ]
+    
+    def __str__(self):
+        product = self.product.name if self.product_id else "Все заказы"
+        return f"{self.hour:%Y-%m-%d %H:00} - {product}"
+
+
+class ArchivedOrder(models.Model):
+    """
+    Старый заказ, перенесенный из рабочей таблицы (manage.py archive_orders --move-after-days).
+
+    Номер заказа сохраняется. Место доставки хранится идентификаторами и текстом,
+    без внешних ключей: номер или корпус к этому времени могут быть удалены.
+    """
+    id = models.BigIntegerField(primary_key=True, verbose_name="Номер заказа")
+    room_id = models.BigIntegerField(blank=True, null=True, verbose_name="ID номера")
+    building_id = models.BigIntegerField(blank=True, null=True, verbose_name="ID корпуса")
+    floor_id = models.BigIntegerField(blank=True, null=True, verbose_name="ID этажа")
+    location = models.CharField(max_length=255, blank=True, verbose_name="Место доставки")
+    total_price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Общая сумма")
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES, verbose_name="Статус")
+    created_at = models.DateTimeField(verbose_name="Создан")
+    updated_at = models.DateTimeField(verbose_name="Обновлен")
+    archived_at = models.DateTimeField(auto_now_add=True, verbose_name="Перенесен в архив")
+    
+    class Meta:
+        verbose_name = "Архивный заказ"
+        verbose_name_plural = "Архив заказов"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at'], name='hotel_archorder_created_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Заказ #{self.id} - {self.location} - {self.get_status_display()}"
 
+
+class ArchivedOrderItem(models.Model):
+    """Позиция архивного заказа"""
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE, related_name='items', verbose_name="Заказ")
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, blank=True, null=True, verbose_name="Блюдо")
+    product_name = models.CharField(max_length=200, verbose_name="Название блюда")
+    quantity = models.IntegerField(verbose_name="Количество")
+    price_at_moment = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Цена на момент заказа")
+    
+    class Meta:
+        verbose_name = "Позиция архивного заказа"
+        verbose_name_plural = "Позиции архивных заказов"
+    
+    def __str__(self):
+        return f"{self.product_name} x{self.quantity}"
+
+
+class CartItem(models.Model):
+    """
+    Позиция корзины гостя (хранилище hotel.cart.DatabaseCartStore).
+
+    Корзина привязана к сессии и месту доставки; количество меняется
+    атомарными UPDATE, поэтому параллельные запросы с телефона не теряют
+    изменения, а строка сессии не перезаписывается на каждый клик.
+    """
+    session_key = models.CharField(max_length=40, verbose_name="Ключ сессии")
+    location_type = models.CharField(max_length=20, verbose_name="Тип места")
+    location_id = models.BigIntegerField(verbose_name="ID места")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, verbose_name="Блюдо")
+    quantity = models.IntegerField(default=0, verbose_name="Количество")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Обновлено")
+    
+    class Meta:
+        verbose_name = "Позиция корзины"
+        verbose_name_plural = "Корзины гостей"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['session_key', 'location_type', 'location_id', 'product'],
+                name='hotel_cartitem_unique',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['updated_at'], name='hotel_cartitem_updated_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.session_key} {self.location_type}#{self.location_id}: {self.product_id} x{self.quantity}"
+
+
+class SlugRedirect(models.Model):
+    """
+    Прежний slug места доставки.
+
+    Slug корпуса и этажа пересоздается из названия при каждом сохранении;
+    по старым адресам (напечатанные QR-коды, закладки) гость перенаправляется
+    на текущий адрес места.
+    """
+    LOCATION_TYPE_CHOICES = [
+        ('room', 'Номер'),
+        ('floor', 'Этаж'),
+        ('building', 'Корпус'),
+    ]
+    
+    location_type = models.CharField(max_length=20, choices=LOCATION_TYPE_CHOICES, verbose_name="Тип места")
+    old_slug = models.CharField(max_length=50, verbose_name="Старый URL-адрес")
+    location_id = models.BigIntegerField(verbose_name="ID места")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Создано")
+    
+    class Meta:
+        verbose_name = "Перенаправление адреса"
+        verbose_name_plural = "Перенаправления адресов"
+        constraints = [
+            models.UniqueConstraint(fields=['location_type', 'old_slug'], name='hotel_slugredirect_unique'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_location_type_display()} {self.old_slug} -> #{self.location_id}"
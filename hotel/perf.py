@@ -0,0 +1,319 @@
+"""
+Замер времени и запросов к БД по маршрутам.
+
+PerfMiddleware для каждого запроса записывает имя маршрута, время ответа,
+время в БД, число запросов и повторов: одинаковых запросов (тот же SQL с
+теми же параметрами) и однотипных (тот же SQL с другими параметрами -
+признак N+1, например Product.objects.get в цикле). Записи лежат в
+кольцевом буфере в памяти процесса (последние PERF_BUFFER_SIZE запросов),
+счетчики для Prometheus копятся с запуска процесса.
+
+Отчет: /dashboard/perf/ (персонал) и /dashboard/perf/metrics/ в текстовом
+формате Prometheus (персонал или заголовок Authorization: Bearer
+PERF_METRICS_TOKEN). У каждого воркера свои данные: в отчете видно, какой
+процесс ответил (pid).
+
+С PERF_PROFILE_SAMPLE_RATE > 0 доля запросов выполняется под cProfile, и
+профили запросов дольше PERF_PROFILE_THRESHOLD_MS мс сохраняются в
+PERF_PROFILE_DIR (смотреть: python -m pstats <файл>). Под ASGI middleware
+работает асинхронно (async views не уходят в поток), но без cProfile: он
+видит только поток цикла событий.
+
+Long-poll (PERF_UNTIMED_VIEWS) и потоковые ответы в процентили и
+гистограмму времени не попадают: их время - ожидание клиента или отдача
+по частям, а не работа сервера. Запросы к БД по ним считаются.
+"""
+import cProfile
+import math
+import os
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import ExitStack
+from datetime import datetime, timezone
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+
+UNRESOLVED = '<unresolved>'
+
+# Границы гистограммы времени ответа для Prometheus (секунды)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Маршруты, которые сами держат запрос открытым (long-poll)
+UNTIMED_VIEWS = frozenset(getattr(settings, 'PERF_UNTIMED_VIEWS', ('order_status_poll',)))
+
+_records = deque(maxlen=getattr(settings, 'PERF_BUFFER_SIZE', 5000))
+_totals = defaultdict(lambda: {
+    'requests': 0, 'timed': 0, 'errors': 0, 'seconds': 0.0, 'db_seconds': 0.0,
+    'queries': 0, 'duplicates': 0, 'similar': 0,
+    'buckets': [0] * len(LATENCY_BUCKETS),
+})
+_totals_lock = threading.Lock()
+_profile_lock = threading.Lock()
+_started_at = time.time()
+
+
+class QueryRecorder:
+    """execute_wrapper: время и тексты запросов одного HTTP-запроса"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.exact = defaultdict(int)
+        self.shapes = defaultdict(int)
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+            self.shapes[sql] += 1
+            try:
+                self.exact[(sql, repr(params))] += 1
+            except Exception:
+                pass
+
+    def duplicates(self):
+        """Лишние выполнения того же SQL с теми же параметрами"""
+        return sum(count - 1 for count in self.exact.values())
+
+    def similar(self):
+        """Лишние выполнения того же SQL (с любыми параметрами)"""
+        return sum(count - 1 for count in self.shapes.values())
+
+
+class PerfMiddleware:
+    """Записывает время и запросы к БД каждого запроса (см. модуль)"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PERF_MONITORING', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'PERF_PROFILE_SAMPLE_RATE', 0)
+        self.profile_threshold = getattr(settings, 'PERF_PROFILE_THRESHOLD_MS', 500) / 1000
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        recorder = QueryRecorder()
+        profiler = None
+        if self.sample_rate and random.random() < self.sample_rate and _profile_lock.acquire(blocking=False):
+            profiler = cProfile.Profile()
+
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(recorder))
+                if profiler is not None:
+                    profiler.enable()
+                try:
+                    response = self.get_response(request)
+                finally:
+                    if profiler is not None:
+                        profiler.disable()
+            elapsed = time.perf_counter() - started
+        finally:
+            if profiler is not None:
+                _profile_lock.release()
+
+        name = record_response(request, response, elapsed, recorder)
+        if profiler is not None and elapsed >= self.profile_threshold:
+            dump_profile(profiler, name)
+        return response
+
+    async def __acall__(self, request):
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(recorder))
+            response = await self.get_response(request)
+        record_response(request, response, time.perf_counter() - started, recorder)
+        return response
+
+
+def record_response(request, response, seconds, recorder):
+    """Записывает запрос; возвращает имя маршрута"""
+    match = getattr(request, 'resolver_match', None)
+    name = match.view_name if match is not None else UNRESOLVED
+    timed = name not in UNTIMED_VIEWS and not response.streaming
+    record_request(name, request.method, response.status_code, seconds, recorder, timed=timed)
+    return name
+
+
+def record_request(name, method, status, seconds, recorder, timed=True):
+    duplicates = recorder.duplicates()
+    similar = recorder.similar()
+    _records.append({
+        'name': name,
+        'method': method,
+        'status': status,
+        'time': time.time(),
+        'timed': timed,
+        'seconds': seconds,
+        'db_seconds': recorder.seconds,
+        'queries': recorder.count,
+        'duplicates': duplicates,
+        'similar': similar,
+    })
+    with _totals_lock:
+        totals = _totals[name]
+        totals['requests'] += 1
+        totals['errors'] += status >= 500
+        totals['db_seconds'] += recorder.seconds
+        totals['queries'] += recorder.count
+        totals['duplicates'] += duplicates
+        totals['similar'] += similar
+        if timed:
+            totals['timed'] += 1
+            totals['seconds'] += seconds
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    totals['buckets'][index] += 1
+
+
+def dump_profile(profiler, name):
+    directory = getattr(settings, 'PERF_PROFILE_DIR', settings.BASE_DIR / 'perf_profiles')
+    safe_name = ''.join(c if c.isalnum() or c in '-_' else '_' for c in name)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        profiler.dump_stats(os.path.join(directory, f'{safe_name}-{time.strftime("%Y%m%d-%H%M%S")}-{time.time_ns() % 10**9:09d}-{os.getpid()}.prof'))
+    except OSError as e:
+        print(f"Error saving profile: {e}")
+
+
+def percentile(values, fraction):
+    """Процентиль по ближайшему рангу (values отсортирован)"""
+    if not values:
+        return 0.0
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+def get_perf_summary():
+    """Сводка по маршрутам из кольцевого буфера, самые долгие (по сумме времени) - первыми"""
+    grouped = defaultdict(list)
+    for record in list(_records):
+        grouped[record['name']].append(record)
+
+    rows = []
+    for name, records in grouped.items():
+        count = len(records)
+        # Long-poll и потоковые ответы - без времени (см. модуль)
+        timings = sorted(record['seconds'] * 1000 for record in records if record['timed'])
+        rows.append({
+            'name': name,
+            'count': count,
+            'errors': sum(record['status'] >= 500 for record in records),
+            'total_ms': sum(timings),
+            'mean_ms': sum(timings) / len(timings) if timings else None,
+            'p50_ms': percentile(timings, 0.50) if timings else None,
+            'p95_ms': percentile(timings, 0.95) if timings else None,
+            'max_ms': timings[-1] if timings else None,
+            'db_mean_ms': sum(record['db_seconds'] for record in records) * 1000 / count,
+            'queries_mean': sum(record['queries'] for record in records) / count,
+            'queries_max': max(record['queries'] for record in records),
+            'duplicates_mean': sum(record['duplicates'] for record in records) / count,
+            'similar_mean': sum(record['similar'] for record in records) / count,
+        })
+    rows.sort(key=lambda row: row['total_ms'], reverse=True)
+    return rows
+
+
+def reset_perf():
+    """Очищает буфер процесса (счетчики Prometheus не сбрасываются)"""
+    _records.clear()
+
+
+def escape_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_prometheus():
+    """Счетчики процесса в текстовом формате Prometheus"""
+    pid = os.getpid()
+    with _totals_lock:
+        totals = {name: dict(values, buckets=list(values['buckets'])) for name, values in _totals.items()}
+
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        lines.extend(samples)
+
+    def label(view, **extra):
+        labels = {'view': view, 'pid': str(pid), **extra}
+        return '{' + ','.join(f'{key}="{escape_label(value)}"' for key, value in labels.items()) + '}'
+
+    counters = [
+        ('qrhotel_requests_total', 'requests', 'Requests handled by this process'),
+        ('qrhotel_request_errors_total', 'errors', 'Responses with status 5xx'),
+        ('qrhotel_db_seconds_total', 'db_seconds', 'Time spent in database queries'),
+        ('qrhotel_db_queries_total', 'queries', 'Database queries executed'),
+        ('qrhotel_db_duplicate_queries_total', 'duplicates', 'Repeated queries with the same SQL and parameters'),
+        ('qrhotel_db_similar_queries_total', 'similar', 'Repeated queries with the same SQL'),
+    ]
+    for metric_name, key, help_text in counters:
+        metric(metric_name, 'counter', help_text, [
+            f'{metric_name}{label(view)} {values[key]}' for view, values in sorted(totals.items())
+        ])
+
+    samples = []
+    for view, values in sorted(totals.items()):
+        for bound, count in zip(LATENCY_BUCKETS, values['buckets']):
+            samples.append(f'qrhotel_request_duration_seconds_bucket{label(view, le=str(bound))} {count}')
+        samples.append(f'qrhotel_request_duration_seconds_bucket{label(view, le="+Inf")} {values["timed"]}')
+        samples.append(f'qrhotel_request_duration_seconds_sum{label(view)} {values["seconds"]}')
+        samples.append(f'qrhotel_request_duration_seconds_count{label(view)} {values["timed"]}')
+    metric('qrhotel_request_duration_seconds', 'histogram', 'Request wall time', samples)
+
+    metric('qrhotel_process_start_time_seconds', 'gauge', 'Start time of this process', [
+        f'qrhotel_process_start_time_seconds{{pid="{pid}"}} {_started_at}',
+    ])
+    return '\n'.join(lines) + '\n'
+
+
+@staff_member_required
+def dashboard_perf(request):
+    """Отчет о времени ответа и запросах к БД по маршрутам (данные этого процесса)"""
+    if request.method == 'POST' and request.POST.get('action') == 'reset':
+        reset_perf()
+    rows = get_perf_summary()
+    context = {
+        'rows': rows,
+        'buffered': len(_records),
+        'buffer_size': _records.maxlen,
+        'pid': os.getpid(),
+        'started_at': datetime.fromtimestamp(_started_at, tz=timezone.utc),
+        'profiling': getattr(settings, 'PERF_PROFILE_SAMPLE_RATE', 0),
+    }
+    return render(request, 'dashboard/perf.html', context)
+
+
+def perf_metrics(request):
+    """Счетчики в формате Prometheus: для персонала или по PERF_METRICS_TOKEN"""
+    token = getattr(settings, 'PERF_METRICS_TOKEN', '')
+    authorization = request.headers.get('Authorization', '')
+    allowed = request.user.is_authenticated and request.user.is_staff
+    if not allowed and token:
+        allowed = constant_time_compare(authorization, f'Bearer {token}')
+    if not allowed:
+        return HttpResponseForbidden('Forbidden')
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
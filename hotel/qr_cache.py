@@ -0,0 +1,67 @@
+"""
+Кэш отрисованных QR-кодов на диске (MEDIA_ROOT/qr_cache/).
+
+Имя файла - хэш URL и параметров отрисовки, поэтому неизменившийся QR-код
+не перерисовывается ни при сохранении модели, ни при перегенерации из
+дашборда, ни при выгрузке ZIP-архива. Устаревшие файлы не мешают: новый URL
+дает новый ключ.
+"""
+import hashlib
+import json
+import os
+import tempfile
+
+from django.conf import settings
+
+from .qr_render import render_qr_png
+
+QR_CACHE_DIR = 'qr_cache'
+# Меняется вместе с алгоритмом отрисовки в qr_render, чтобы не отдавать старые PNG
+QR_RENDER_VERSION = 2
+
+
+def qr_cache_key(url, border=4, box_size=10, label=None):
+    """Ключ кэша: хэш URL и всех параметров, влияющих на картинку"""
+    options = json.dumps(
+        [QR_RENDER_VERSION, url, border, box_size, label or ''],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(options.encode('utf-8')).hexdigest()
+
+
+def qr_cache_path(key):
+    return os.path.join(settings.MEDIA_ROOT, QR_CACHE_DIR, key[:2], f'{key}.png')
+
+
+def get_cached_qr_png(key):
+    """PNG из кэша или None"""
+    try:
+        with open(qr_cache_path(key), 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def store_qr_png(key, png):
+    """Сохранение PNG в кэш (атомарно: параллельный читатель не увидит половину файла)"""
+    path = qr_cache_path(key)
+    directory = os.path.dirname(path)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(png)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        # Без кэша QR-код просто отрисуется заново в следующий раз
+        print(f"Error storing QR cache: {e}")
+
+
+def get_qr_png(url, border=4, box_size=10, label=None):
+    """PNG с QR-кодом: из кэша, а при промахе - отрисовка и сохранение"""
+    key = qr_cache_key(url, border=border, box_size=box_size, label=label)
+    png = get_cached_qr_png(key)
+    if png is None:
+        png = render_qr_png(url, border=border, box_size=box_size, label=label)
+        store_qr_png(key, png)
+    return png
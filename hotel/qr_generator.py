@@ -1,12 +1,22 @@
-from django.http import HttpResponse
+from django.http import StreamingHttpResponse, HttpResponse, Http404
+from django.shortcuts import get_object_or_404
 from django.contrib.auth.decorators import login_required
-from .models import Room, Building, Floor
-import qrcode
-from PIL import Image
-from io import BytesIO
+from django.conf import settings
+from django.db import connections
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
 import zipfile
+import os
 import re
 
+from .models import Room, Building, Floor, short_link_url
+from .qr_render import render_qr_png
+from .qr_vector import VECTOR_FORMATS, render_qr_vector, render_print_sheet
+from .qr_cache import qr_cache_key, qr_cache_path, get_cached_qr_png, store_qr_png, get_qr_png
+
+# Меньше этого числа QR-кодов пул процессов не окупает свой запуск
+POOL_MIN_JOBS = 8
+
 
 def sanitize_filename(name):
     """Очищает имя от недопустимых символов для файловой системы"""
@@ -19,241 +29,229 @@ def sanitize_filename(name):
     return name.strip('_')
 
 
+def build_absolute_url(request, obj):
+    """Адрес для QR-кода: короткая ссылка по токену, домен из настроек или из request"""
+    if getattr(settings, 'SITE_URL', None):
+        return short_link_url(obj.token)
+    return request.build_absolute_uri(obj.get_short_url())
+
+
+def room_filename(room):
+    """Имя файла номера: корпус, этаж и номер комнаты"""
+    parts = ['qr']
+
+    # Добавляем корпус, если есть
+    building = room.floor.building
+    if building and building.name:
+        building_name = sanitize_filename(building.name)
+        if building_name:
+            parts.append(f'building_{building_name}')
+
+    # Добавляем этаж (используем название этажа, если есть)
+    if room.floor.name:
+        floor_name = sanitize_filename(room.floor.name)
+        if floor_name:
+            parts.append(f'floor_{floor_name}')
+    elif room.floor.number is not None:
+        floor_number = sanitize_filename(str(room.floor.number))
+        if floor_number:
+            parts.append(f'floor_{floor_number}')
+
+    # Добавляем номер комнаты
+    room_number = sanitize_filename(str(room.number))
+    if room_number:
+        parts.append(f'room_{room_number}')
+
+    return '_'.join(parts) + '.png'
+
+
+def collect_qr_entries(request, building_id, include_buildings, include_floors):
+    """Список (путь в архиве, URL) для всех QR-кодов выгрузки"""
+    rooms = Room.objects.filter(is_active=True).select_related('floor', 'floor__building')
+    buildings = Building.objects.filter(is_active=True)
+    floors = Floor.objects.filter(is_active=True)
+    if building_id:
+        rooms = rooms.filter(floor__building_id=building_id)
+        buildings = buildings.filter(id=building_id)
+        floors = floors.filter(building_id=building_id)
+
+    entries = []
+    for room in rooms:
+        entries.append((f'rooms/{room_filename(room)}', build_absolute_url(request, room)))
+
+    if include_buildings:
+        for building in buildings:
+            building_name = sanitize_filename(building.name)
+            filename = f'qr_building_{building_name}.png' if building_name else f'qr_building_{building.id}.png'
+            entries.append((f'buildings/{filename}', build_absolute_url(request, building)))
+
+    if include_floors:
+        for floor in floors:
+            floor_name = sanitize_filename(floor.name)
+            filename = f'qr_floor_{floor_name}.png' if floor_name else f'qr_floor_{floor.id}.png'
+            entries.append((f'floors/{filename}', build_absolute_url(request, floor)))
+
+    return entries
+
+
+# Параметры выгрузки: без отступов QR (border=0) и без подписи
+EXPORT_QR_OPTIONS = {'border': 0}
+
+
+def render_qr_export_png(url):
+    """PNG для выгрузки (выполняется в процессе пула)"""
+    return render_qr_png(url, **EXPORT_QR_OPTIONS)
+
+
+def render_pngs(urls):
+    """
+    PNG по списку URL в исходном порядке.
+
+    Готовые PNG берутся из кэша, остальные отрисовываются в пуле процессов
+    и сохраняются в кэш. В работе одновременно не больше нескольких заданий
+    на процесс, поэтому память не зависит от числа номеров.
+    """
+    keys = [qr_cache_key(url, **EXPORT_QR_OPTIONS) for url in urls]
+    misses = sum(1 for key in keys if not os.path.exists(qr_cache_path(key)))
+
+    workers = getattr(settings, 'QR_EXPORT_WORKERS', 1)
+    if workers <= 1 or misses < POOL_MIN_JOBS:
+        for url in urls:
+            yield get_qr_png(url, **EXPORT_QR_OPTIONS)
+        return
+
+    # Дочерние процессы не должны унаследовать открытое соединение с БД
+    connections.close_all()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+
+        def next_png():
+            key, png, future = pending.popleft()
+            if future is not None:
+                png = future.result()
+                store_qr_png(key, png)
+            return png
+
+        for url, key in zip(urls, keys):
+            png = get_cached_qr_png(key)
+            future = executor.submit(render_qr_export_png, url) if png is None else None
+            pending.append((key, png, future))
+            if len(pending) >= workers * 4:
+                yield next_png()
+        while pending:
+            yield next_png()
+
+
+class ZipStream:
+    """Файлоподобный буфер без seek: zipfile пишет в него, генератор забирает байты"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def render_vectors(urls, kind):
+    """SVG/EPS по списку URL: векторный QR-код строится быстрее PNG и без пула"""
+    for url in urls:
+        yield render_qr_vector(url, kind, **EXPORT_QR_OPTIONS)
+
+
+def stream_zip(entries, kind='png'):
+    """ZIP-архив по частям: каждый файл отдается клиенту сразу после отрисовки"""
+    stream = ZipStream()
+    with zipfile.ZipFile(stream, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        urls = [url for _, url in entries]
+        files = render_pngs(urls) if kind == 'png' else render_vectors(urls, kind)
+        for (arcname, _), data in zip(entries, files):
+            if kind != 'png':
+                arcname = f'{os.path.splitext(arcname)[0]}.{kind}'
+            zip_file.writestr(arcname, data)
+            yield stream.pop()
+    yield stream.pop()
+
+
 @login_required
 def generate_qr_images(request):
     """Генерация PNG файлов с QR-кодами для всех номеров, корпусов и этажей (каждый отдельным файлом)"""
-    building_id = request.GET.get('building_id')
+    building_id = None
+    if request.GET.get('building_id'):
+        building_id = object_param(request, Building, 'building_id').id
     # По умолчанию включаем все типы QR-кодов
     include_buildings = request.GET.get('include_buildings', 'true').lower() == 'true'
     include_floors = request.GET.get('include_floors', 'true').lower() == 'true'
-    
-    # Используем select_related для оптимизации запросов и загрузки связанных объектов
-    if building_id:
-        rooms = Room.objects.filter(floor__building_id=building_id, is_active=True).select_related('floor', 'floor__building')
-        buildings = Building.objects.filter(id=building_id, is_active=True) if include_buildings else Building.objects.none()
-        floors = Floor.objects.filter(building_id=building_id, is_active=True) if include_floors else Floor.objects.none()
-    else:
-        rooms = Room.objects.filter(is_active=True).select_related('floor', 'floor__building')
-        buildings = Building.objects.filter(is_active=True) if include_buildings else Building.objects.none()
-        floors = Floor.objects.filter(is_active=True) if include_floors else Floor.objects.none()
-    
-    # Создаем ZIP архив в памяти
-    zip_buffer = BytesIO()
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-        for room in rooms:
-            # Генерируем QR-код без отступов (border=0)
-            qr = qrcode.QRCode(
-                version=1,
-                error_correction=qrcode.constants.ERROR_CORRECT_L,
-                box_size=10,
-                border=0,  # Без отступов - размер точно по QR-коду
-            )
-            # Используем домен из настроек или из request
-            from django.conf import settings
-            from django.urls import NoReverseMatch
-            site_url = getattr(settings, 'SITE_URL', None)
-            try:
-                if site_url:
-                    site_url = site_url.rstrip('/')
-                    url = f"{site_url}{room.get_absolute_url()}"
-                else:
-                    url = request.build_absolute_uri(room.get_absolute_url())
-            except NoReverseMatch:
-                # Если slug некорректный, пересоздаем его и используем новый URL
-                from django.utils.text import slugify
-                if room.floor.building:
-                    building_part = slugify(room.floor.building.name)
-                    room.slug = slugify(f"{building_part}-{room.floor.number}-floor-room-{room.number}")
-                else:
-                    room.slug = slugify(f"{room.floor.number}-floor-room-{room.number}")
-                room.save(update_fields=['slug'])
-                # Теперь формируем URL снова
-                if site_url:
-                    url = f"{site_url}{room.get_absolute_url()}"
-                else:
-                    url = request.build_absolute_uri(room.get_absolute_url())
-            qr.add_data(url)
-            qr.make(fit=True)
-            
-            # Создаем классический QR-код: черный на белом фоне
-            qr_img = qr.make_image(fill_color="black", back_color="white")
-            # Убеждаемся, что изображение в режиме RGB (без альфа-канала)
-            if qr_img.mode != 'RGB':
-                qr_img = qr_img.convert('RGB')
-            
-            # Добавляем белую рамку вокруг QR-кода
-            border_size = 20  # Размер рамки в пикселях
-            qr_width, qr_height = qr_img.size
-            # Создаем новое изображение с рамкой
-            bordered_img = Image.new('RGB', 
-                                   (qr_width + border_size * 2, qr_height + border_size * 2), 
-                                   'white')
-            # Вставляем QR-код в центр (с рамкой вокруг)
-            bordered_img.paste(qr_img, (border_size, border_size))
-            qr_img = bordered_img
-            
-            # Сохраняем в BytesIO как PNG без сжатия для максимального качества
-            img_buffer = BytesIO()
-            qr_img.save(img_buffer, format='PNG', optimize=False)
-            img_buffer.seek(0)
-            
-            # Собираем части имени файла с всеми доступными данными
-            parts = ['qr']
-            
-            # Добавляем корпус, если есть (явно указываем в имени файла)
-            try:
-                building = room.floor.building
-                if building and building.name:
-                    building_name = sanitize_filename(building.name)
-                    if building_name:
-                        parts.append(f'building_{building_name}')
-            except (AttributeError, TypeError):
-                pass  # Корпус отсутствует, пропускаем
-            
-            # Добавляем этаж (используем название этажа, если есть)
-            if room.floor.name:
-                floor_name = sanitize_filename(room.floor.name)
-                if floor_name:
-                    parts.append(f'floor_{floor_name}')
-            elif room.floor.number is not None:
-                floor_number = sanitize_filename(str(room.floor.number))
-                if floor_number:
-                    parts.append(f'floor_{floor_number}')
-            
-            # Добавляем номер комнаты (всегда есть, явно указываем в имени файла)
-            room_number = sanitize_filename(str(room.number))
-            if room_number:
-                parts.append(f'room_{room_number}')
-            
-            # Формируем итоговое имя файла
-            filename = '_'.join(parts) + '.png'
-            
-            # Добавляем в ZIP в папку rooms/
-            zip_file.writestr(f'rooms/{filename}', img_buffer.getvalue())
-        
-        # Добавляем QR-коды корпусов, если запрошено
-        if include_buildings:
-            for building in buildings:
-                # Генерируем QR-код без отступов (border=0)
-                qr = qrcode.QRCode(
-                    version=1,
-                    error_correction=qrcode.constants.ERROR_CORRECT_L,
-                    box_size=10,
-                    border=0,  # Без отступов - размер точно по QR-коду
-                )
-                # Используем домен из настроек или из request
-                from django.conf import settings
-                from django.urls import NoReverseMatch
-                site_url = getattr(settings, 'SITE_URL', None)
-                try:
-                    if site_url:
-                        site_url = site_url.rstrip('/')
-                        url = f"{site_url}{building.get_absolute_url()}"
-                    else:
-                        url = request.build_absolute_uri(building.get_absolute_url())
-                except NoReverseMatch:
-                    # Если slug некорректный, пересоздаем его
-                    from django.utils.text import slugify
-                    building.slug = slugify(building.name)
-                    building.save(update_fields=['slug'])
-                    if site_url:
-                        url = f"{site_url}{building.get_absolute_url()}"
-                    else:
-                        url = request.build_absolute_uri(building.get_absolute_url())
-                qr.add_data(url)
-                qr.make(fit=True)
-                
-                # Создаем классический QR-код: черный на белом фоне
-                qr_img = qr.make_image(fill_color="black", back_color="white")
-                # Убеждаемся, что изображение в режиме RGB (без альфа-канала)
-                if qr_img.mode != 'RGB':
-                    qr_img = qr_img.convert('RGB')
-                
-                # Добавляем белую рамку вокруг QR-кода
-                border_size = 20  # Размер рамки в пикселях
-                qr_width, qr_height = qr_img.size
-                # Создаем новое изображение с рамкой
-                bordered_img = Image.new('RGB', 
-                                       (qr_width + border_size * 2, qr_height + border_size * 2), 
-                                       'white')
-                # Вставляем QR-код в центр (с рамкой вокруг)
-                bordered_img.paste(qr_img, (border_size, border_size))
-                qr_img = bordered_img
-                
-                # Сохраняем в BytesIO как PNG без сжатия для максимального качества
-                img_buffer = BytesIO()
-                qr_img.save(img_buffer, format='PNG', optimize=False)
-                img_buffer.seek(0)
-                
-                # Формируем имя файла для корпуса
-                building_name = sanitize_filename(building.name)
-                filename = f'qr_building_{building_name}.png' if building_name else f'qr_building_{building.id}.png'
-                
-                # Добавляем в ZIP в папку buildings/
-                zip_file.writestr(f'buildings/{filename}', img_buffer.getvalue())
-        
-        # Добавляем QR-коды этажей, если запрошено
-        if include_floors:
-            for floor in floors:
-                # Генерируем QR-код без отступов (border=0)
-                qr = qrcode.QRCode(
-                    version=1,
-                    error_correction=qrcode.constants.ERROR_CORRECT_L,
-                    box_size=10,
-                    border=0,  # Без отступов - размер точно по QR-коду
-                )
-                # Используем домен из настроек или из request
-                from django.conf import settings
-                from django.urls import NoReverseMatch
-                site_url = getattr(settings, 'SITE_URL', None)
-                try:
-                    if site_url:
-                        site_url = site_url.rstrip('/')
-                        url = f"{site_url}{floor.get_absolute_url()}"
-                    else:
-                        url = request.build_absolute_uri(floor.get_absolute_url())
-                except NoReverseMatch:
-                    # Если slug некорректный, пересоздаем его
-                    from django.utils.text import slugify
-                    floor.slug = slugify(floor.name)
-                    floor.save(update_fields=['slug'])
-                    if site_url:
-                        url = f"{site_url}{floor.get_absolute_url()}"
-                    else:
-                        url = request.build_absolute_uri(floor.get_absolute_url())
-                qr.add_data(url)
-                qr.make(fit=True)
-                
-                # Создаем классический QR-код: черный на белом фоне
-                qr_img = qr.make_image(fill_color="black", back_color="white")
-                # Убеждаемся, что изображение в режиме RGB (без альфа-канала)
-                if qr_img.mode != 'RGB':
-                    qr_img = qr_img.convert('RGB')
-                
-                # Добавляем белую рамку вокруг QR-кода
-                border_size = 20  # Размер рамки в пикселях
-                qr_width, qr_height = qr_img.size
-                # Создаем новое изображение с рамкой
-                bordered_img = Image.new('RGB', 
-                                       (qr_width + border_size * 2, qr_height + border_size * 2), 
-                                       'white')
-                # Вставляем QR-код в центр (с рамкой вокруг)
-                bordered_img.paste(qr_img, (border_size, border_size))
-                qr_img = bordered_img
-                
-                # Сохраняем в BytesIO как PNG без сжатия для максимального качества
-                img_buffer = BytesIO()
-                qr_img.save(img_buffer, format='PNG', optimize=False)
-                img_buffer.seek(0)
-                
-                # Формируем имя файла для этажа
-                floor_name = sanitize_filename(floor.name)
-                filename = f'qr_floor_{floor_name}.png' if floor_name else f'qr_floor_{floor.id}.png'
-                
-                # Добавляем в ZIP в папку floors/
-                zip_file.writestr(f'floors/{filename}', img_buffer.getvalue())
-    
-    zip_buffer.seek(0)
-    response = HttpResponse(zip_buffer, content_type='application/zip')
+
+    # Формат файлов: png (по умолчанию), svg или eps
+    kind = request.GET.get('format', 'png').lower()
+    if kind != 'png' and kind not in VECTOR_FORMATS:
+        kind = 'png'
+
+    # Адреса собираются до начала ответа, отрисовка и упаковка - по мере отправки
+    entries = collect_qr_entries(request, building_id, include_buildings, include_floors)
+
+    response = StreamingHttpResponse(stream_zip(entries, kind), content_type='application/zip')
     response['Content-Disposition'] = 'attachment; filename="qr_codes.zip"'
     return response
+
+
+def int_param(request, name, default, low, high):
+    """Целый параметр запроса в пределах [low, high]"""
+    try:
+        value = int(request.GET.get(name, default))
+    except (TypeError, ValueError):
+        value = default
+    return max(low, min(high, value))
+
+
+def object_param(request, model, name):
+    """Объект по id из параметра запроса; нечисловой или неизвестный id - 404"""
+    try:
+        object_id = int(request.GET[name])
+    except (TypeError, ValueError):
+        raise Http404(f'Неверный параметр {name}')
+    return get_object_or_404(model, id=object_id)
+
+
+@login_required
+def print_qr_sheet(request):
+    """
+    PDF для печати табличек на двери: QR-коды номеров корпуса или этажа
+    (или всего отеля) по нескольку на листе A4.
+    """
+    rooms = Room.objects.filter(is_active=True).select_related('floor', 'floor__building').order_by(
+        'floor__building__name', 'floor__number', 'number',
+    )
+    title = 'QR-коды номеров'
+    if request.GET.get('floor_id'):
+        floor = object_param(request, Floor, 'floor_id')
+        rooms = rooms.filter(floor=floor)
+        title = f'QR-коды: {floor}'
+    elif request.GET.get('building_id'):
+        building = object_param(request, Building, 'building_id')
+        rooms = rooms.filter(floor__building=building)
+        title = f'QR-коды: {building}'
+
+    labels = [(build_absolute_url(request, room), str(room)) for room in rooms]
+    if not labels:
+        raise Http404('Нет активных номеров')
+
+    pdf = render_print_sheet(
+        labels,
+        columns=int_param(request, 'columns', 3, 1, 6),
+        rows=int_param(request, 'rows', 4, 1, 8),
+        title=title,
+    )
+    response = HttpResponse(pdf, content_type='application/pdf')
+    response['Content-Disposition'] = 'attachment; filename="qr_print_sheet.pdf"'
+    return response
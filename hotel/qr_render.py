@@ -0,0 +1,107 @@
+"""
+Отрисовка PNG с QR-кодом.
+
+Модуль не зависит от Django, поэтому функции можно выполнять в пуле
+процессов (см. qr_generator.generate_qr_images).
+"""
+from io import BytesIO
+
+import qrcode
+from PIL import Image, ImageDraw, ImageFont
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+FONT_PATH = "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"
+FRAME_SIZE = 20  # Белая рамка вокруг QR-кода в пикселях
+
+
+def qr_matrix(url, border=4):
+    """Матрица модулей QR-кода вместе с отступом (список строк из bool)"""
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=1,
+        border=border,
+    )
+    qr.add_data(url)
+    qr.make(fit=True)
+    return qr.get_matrix()
+
+
+def draw_label(img, label):
+    """Подпись по центру внизу изображения"""
+    draw = ImageDraw.Draw(img)
+    try:
+        font = ImageFont.truetype(FONT_PATH, 20)
+    except OSError:
+        font = ImageFont.load_default()
+
+    bbox = draw.textbbox((0, 0), label, font=font)
+    text_width = bbox[2] - bbox[0]
+    text_height = bbox[3] - bbox[1]
+
+    img_width, img_height = img.size
+    position = ((img_width - text_width) // 2, img_height - text_height - 10)
+    draw.text(position, label, fill="black", font=font)
+
+
+def render_qr_png(url, border=4, box_size=10, label=None):
+    """
+    PNG с QR-кодом (черный на белом, с белой рамкой и подписью внизу).
+
+    Матрица модулей масштабируется в NumPy сразу вместе с рамкой и
+    сохраняется как 1-битный PNG (с подписью - в оттенках серого): те же
+    пиксели, что у RGB-картинки qrcode, но без make_image/convert/paste и
+    в несколько раз меньше. Без NumPy используется render_qr_png_pil.
+    """
+    if np is None:
+        return render_qr_png_pil(url, border=border, box_size=box_size, label=label)
+
+    modules = np.asarray(qr_matrix(url, border), dtype=bool)
+    # True - белый пиксель: светлые модули, отступ и рамка
+    pixels = ~modules.repeat(box_size, axis=0).repeat(box_size, axis=1)
+    pixels = np.pad(pixels, FRAME_SIZE, constant_values=True)
+    img = Image.fromarray(pixels)
+
+    if label:
+        # Сглаживание текста требует оттенков серого
+        img = img.convert('L')
+        draw_label(img, label)
+
+    buffer = BytesIO()
+    img.save(buffer, format='PNG', optimize=False)
+    return buffer.getvalue()
+
+
+def render_qr_png_pil(url, border=4, box_size=10, label=None):
+    """PNG через фабрику изображений qrcode и Pillow (RGB) - прежний способ"""
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=box_size,
+        border=border,
+    )
+    qr.add_data(url)
+    qr.make(fit=True)
+
+    # Создаем классический QR-код: черный на белом фоне
+    qr_img = qr.make_image(fill_color="black", back_color="white")
+    # Убеждаемся, что изображение в режиме RGB (без альфа-канала)
+    if qr_img.mode != 'RGB':
+        qr_img = qr_img.convert('RGB')
+
+    # Добавляем белую рамку вокруг QR-кода
+    qr_width, qr_height = qr_img.size
+    img = Image.new('RGB', (qr_width + FRAME_SIZE * 2, qr_height + FRAME_SIZE * 2), 'white')
+    img.paste(qr_img, (FRAME_SIZE, FRAME_SIZE))
+
+    if label:
+        draw_label(img, label)
+
+    # PNG без дополнительного сжатия для максимального качества
+    buffer = BytesIO()
+    img.save(buffer, format='PNG', optimize=False)
+    return buffer.getvalue()
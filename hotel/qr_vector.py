@@ -0,0 +1,127 @@
+"""
+Векторные QR-коды (segno) и листы для печати (reportlab).
+
+SVG и EPS не зависят от разрешения и весят несколько килобайт, а лист
+для печати - один PDF, где QR-коды нарисованы векторными прямоугольниками,
+а не вставлены крупными PNG. Модуль, как и qr_render, не зависит от Django.
+"""
+import os
+from io import BytesIO, StringIO
+
+import segno
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from .qr_render import FONT_PATH
+
+PRINT_FONT = 'DejaVuSans-Bold'
+PRINT_FALLBACK_FONT = 'Helvetica-Bold'
+PRINT_MARGIN = 10 * mm
+PRINT_CAPTION_SIZE = 11
+PRINT_CAPTION_HEIGHT = 8 * mm
+
+VECTOR_FORMATS = ('svg', 'eps')
+
+
+def make_qr(url):
+    """QR-код с теми же параметрами, что и PNG: уровень коррекции L"""
+    return segno.make(url, error='l', boost_error=False, micro=False)
+
+
+def render_qr_vector(url, kind='svg', border=4, scale=10):
+    """QR-код в формате SVG или EPS (bytes)"""
+    if kind not in VECTOR_FORMATS:
+        raise ValueError(f'Unknown vector format: {kind}')
+    # EPS segno пишет в текстовый поток, SVG - в двоичный
+    buffer = StringIO() if kind == 'eps' else BytesIO()
+    make_qr(url).save(buffer, kind=kind, border=border, scale=scale)
+    data = buffer.getvalue()
+    return data.encode('ascii') if isinstance(data, str) else data
+
+
+def dark_runs(qr):
+    """Горизонтальные отрезки темных модулей: (строка, первый столбец, длина)"""
+    for y, row in enumerate(qr.matrix):
+        x = 0
+        width = len(row)
+        while x < width:
+            if row[x] & 0x1:
+                start = x
+                while x < width and row[x] & 0x1:
+                    x += 1
+                yield y, start, x - start
+            else:
+                x += 1
+
+
+def register_print_font():
+    """Шрифт с кириллицей для подписей; без него - встроенный Helvetica"""
+    if PRINT_FONT in pdfmetrics.getRegisteredFontNames():
+        return PRINT_FONT
+    if os.path.exists(FONT_PATH):
+        pdfmetrics.registerFont(TTFont(PRINT_FONT, FONT_PATH))
+        return PRINT_FONT
+    return PRINT_FALLBACK_FONT
+
+
+def draw_qr(pdf, qr, x, y, size, border=4):
+    """Рисует QR-код векторно в квадрате size x size с левым нижним углом (x, y)"""
+    modules = qr.symbol_size(scale=1, border=border)[0]
+    module = size / modules
+    # Координаты в модулях от левого верхнего угла: целые числа в PDF короче
+    pdf.saveState()
+    pdf.translate(x, y + size)
+    pdf.scale(module, -module)
+    path = pdf.beginPath()
+    for row, col, length in dark_runs(qr):
+        path.rect(col + border, row + border, length, 1)
+    pdf.drawPath(path, stroke=0, fill=1)
+    pdf.restoreState()
+
+
+def render_print_sheet(labels, columns=3, rows=4, title=None):
+    """
+    PDF формата A4: по columns x rows наклеек на странице.
+
+    labels - список (url, подпись). Каждая наклейка - QR-код и подпись под
+    ним, по краям ячейки тонкие линии для резки.
+    """
+    font = register_print_font()
+    buffer = BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4, pageCompression=1)
+    if title:
+        pdf.setTitle(title)
+
+    page_width, page_height = A4
+    cell_width = (page_width - 2 * PRINT_MARGIN) / columns
+    cell_height = (page_height - 2 * PRINT_MARGIN) / rows
+    qr_size = min(cell_width, cell_height - PRINT_CAPTION_HEIGHT) - 6 * mm
+    per_page = columns * rows
+
+    for index, (url, caption) in enumerate(labels):
+        position = index % per_page
+        if index and position == 0:
+            pdf.showPage()
+        column, row = position % columns, position // columns
+        left = PRINT_MARGIN + column * cell_width
+        bottom = page_height - PRINT_MARGIN - (row + 1) * cell_height
+
+        pdf.setStrokeGray(0.8)
+        pdf.setLineWidth(0.3)
+        pdf.rect(left, bottom, cell_width, cell_height, stroke=1, fill=0)
+
+        pdf.setFillGray(0)
+        qr_x = left + (cell_width - qr_size) / 2
+        qr_y = bottom + PRINT_CAPTION_HEIGHT + (cell_height - PRINT_CAPTION_HEIGHT - qr_size) / 2
+        draw_qr(pdf, make_qr(url), qr_x, qr_y, qr_size)
+
+        if caption:
+            pdf.setFont(font, PRINT_CAPTION_SIZE)
+            pdf.drawCentredString(left + cell_width / 2, bottom + PRINT_CAPTION_HEIGHT / 2, caption)
+
+    pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
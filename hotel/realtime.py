@@ -0,0 +1,205 @@
+"""
+Публикация событий заказов в группу "orders" (см. consumers.OrderConsumer)
+и статусов в группу конкретного заказа (см. consumers.OrderStatusConsumer).
+
+Дашборд и страница статуса гостя получают изменения через WebSocket и
+опрашивают API только если соединение недоступно.
+"""
+import time
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Order
+
+ORDERS_GROUP = 'orders'
+ORDERS_VERSION_KEY = 'orders:version'
+
+# Типы событий
+ORDER_CREATED = 'created'
+ORDER_STATUS_CHANGED = 'status_changed'
+ORDER_VIEWED = 'viewed'
+ORDER_ARCHIVED = 'archived'
+
+
+def order_status_group(order_id):
+    """Группа WebSocket страницы статуса одного заказа (см. consumers.OrderStatusConsumer)"""
+    return f'order_{order_id}'
+
+
+def get_orders_version():
+    """
+    Версия списка заказов (время последнего изменения в наносекундах).
+
+    Служит курсором ?since= и основой ETag для /api/orders/live/ и
+    /api/notifications/unviewed/: пока заказы не менялись, опрос отвечает 304.
+    """
+    version = cache.get(ORDERS_VERSION_KEY)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(ORDERS_VERSION_KEY, version, None):
+            version = cache.get(ORDERS_VERSION_KEY, version)
+    return version
+
+
+def bump_orders_version():
+    """Отметка об изменении заказов (вызывается после коммита, см. hotel.signals)"""
+    version = time.time_ns()
+    cache.set(ORDERS_VERSION_KEY, version, None)
+    return version
+
+
+def get_order_location(order):
+    """Краткая информация о месте доставки для дашборда"""
+    if order.room:
+        room_info = f"{order.room.number}"
+        if order.room.floor and order.room.floor.building:
+            room_info += f" ({order.room.floor.building.name}, {order.room.floor.name})"
+        elif order.room.floor:
+            room_info += f" ({order.room.floor.name})"
+        room_number = order.room.number
+        building_name = order.room.floor.building.name if order.room.floor and order.room.floor.building else None
+        floor_number = order.room.floor.name if order.room.floor else None
+    elif order.building:
+        room_info = f"Корпус {order.building.name}"
+        room_number = None
+        building_name = order.building.name
+        floor_number = None
+    elif order.floor:
+        room_info = f"Этаж {order.floor.name}"
+        room_number = None
+        building_name = order.floor.building.name if order.floor.building else None
+        floor_number = order.floor.name
+    else:
+        room_info = "Не указано"
+        room_number = None
+        building_name = None
+        floor_number = None
+    return room_info, room_number, building_name, floor_number
+
+
+def serialize_order(order):
+    """Заказ в формате /api/orders/live/"""
+    room_info, room_number, building_name, floor_number = get_order_location(order)
+
+    items_data = []
+    for item in order.items.all():
+        items_data.append({
+            'name': item.product.name,
+            'quantity': item.quantity,
+            'price': float(item.price_at_moment),
+        })
+
+    return {
+        'id': order.id,
+        'room': room_info,
+        'room_number': room_number,
+        'building': building_name,
+        'floor': floor_number,
+        'total_price': float(order.total_price),
+        'status': order.status,
+        'status_display': order.get_status_display(),
+        'is_archived': order.is_archived,
+        'is_viewed': order.is_viewed,
+        'created_at': order.created_at.strftime('%H:%M:%S'),
+        'items': items_data,
+        'items_count': len(items_data),
+    }
+
+
+def serialize_notification(order):
+    """Заказ в формате /api/notifications/unviewed/"""
+    room_info = get_order_location(order)[0]
+
+    items = list(order.items.all())
+    items_summary = [f"{item.product.name} x{item.quantity}" for item in items[:3]]
+    if len(items) > 3:
+        items_summary.append(f"+{len(items) - 3} еще")
+
+    return {
+        'order_id': order.id,
+        'title': f'Новый заказ #{order.id}',
+        'message': f'Комната {room_info} • {order.total_price} ₽',
+        'items': items_summary,
+        'time': order.created_at.strftime('%H:%M:%S'),
+        'status': order.status,
+        'created_at_timestamp': int(order.created_at.timestamp()),
+    }
+
+
+def serialize_order_status(order):
+    """Статус заказа для страницы гостя"""
+    return {
+        'order_id': order.id,
+        'status': order.status,
+        'status_display': order.get_status_display(),
+    }
+
+
+def live_orders_queryset():
+    """Заказы со всеми связями, нужными для сериализации"""
+    return Order.objects.select_related(
+        'room', 'room__floor', 'room__floor__building', 'building', 'floor', 'floor__building'
+    ).prefetch_related('items__product')
+
+
+def publish_order_event(order, event):
+    """Отправка события заказа в дашборд после коммита транзакции"""
+    order_id = order.pk
+    transaction.on_commit(lambda: send_order_event(order_id, event))
+
+
+def send_order_event(order_id, event):
+    """Рассылка события всем подключенным вкладкам дашборда"""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+
+    try:
+        order = live_orders_queryset().get(pk=order_id)
+        async_to_sync(channel_layer.group_send)(ORDERS_GROUP, {
+            'type': 'order_update',
+            'event': event,
+            'order': serialize_order(order),
+            'notification': serialize_notification(order),
+        })
+        if event == ORDER_STATUS_CHANGED:
+            # Гость на странице статуса узнает об изменении сразу
+            async_to_sync(channel_layer.group_send)(order_status_group(order.id), {
+                'type': 'order_status',
+                **serialize_order_status(order),
+            })
+    except Exception as e:
+        # Недоступный channel layer не должен ломать оформление заказа
+        print(f"Error publishing order event: {e}")
+
+
+def publish_orders_archived(order_ids):
+    """Убрать заказы из дашборда после коммита (массовая архивация)"""
+    order_ids = list(order_ids)
+    transaction.on_commit(lambda: send_orders_archived(order_ids))
+
+
+def send_orders_archived(order_ids):
+    """
+    Рассылка архивации без чтения заказов из БД.
+
+    Дашборду достаточно id и is_archived: заказ удаляется из списка и из
+    уведомлений.
+    """
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+
+    try:
+        for order_id in order_ids:
+            async_to_sync(channel_layer.group_send)(ORDERS_GROUP, {
+                'type': 'order_update',
+                'event': ORDER_ARCHIVED,
+                'order': {'id': order_id, 'is_archived': True},
+                'notification': None,
+            })
+    except Exception as e:
+        print(f"Error publishing archived orders: {e}")
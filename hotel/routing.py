@@ -3,6 +3,7 @@ from . import consumers
 
 websocket_urlpatterns = [
     re_path(r'ws/orders/$', consumers.OrderConsumer.as_asgi()),
+    re_path(r'ws/order/(?P<location_type>room|floor|building)/(?P<slug>[-\w]+)/(?P<order_id>\d+)/$', consumers.OrderStatusConsumer.as_asgi()),
 ]
 
 
@@ -0,0 +1,273 @@
+"""
+Сводка продаж (SalesRollup) по часам, местам доставки и блюдам.
+
+Страница статистики читает несколько сотен готовых строк вместо агрегации
+по всей истории заказов. Сводка обновляется в транзакции оформления заказа
+(services.place_order), при удалении заказа (hotel.signals) или мест
+доставки вместе с заказами (remove_orders_sales) и полностью
+пересчитывается командой backfill_sales.
+"""
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from .models import Order, OrderItem, Product, SalesRollup, ArchivedOrder, ArchivedOrderItem
+
+
+# Заказ удаляется при переносе в архив: из сводки его вычитать не нужно
+_keep_sales_on_delete = ContextVar('keep_sales_on_delete', default=False)
+
+
+@contextmanager
+def keep_sales_on_delete():
+    """Удаление заказов внутри блока не меняет сводку продаж"""
+    token = _keep_sales_on_delete.set(True)
+    try:
+        yield
+    finally:
+        _keep_sales_on_delete.reset(token)
+
+
+def deleting_keeps_sales():
+    return _keep_sales_on_delete.get()
+
+
+def hour_bucket(dt):
+    """Начало часа (UTC), к которому относится момент времени"""
+    return dt.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def order_location(room_id, building_id, floor_id):
+    """Место доставки заказа в виде (тип, id)"""
+    if room_id:
+        return 'room', room_id
+    if building_id:
+        return 'building', building_id
+    if floor_id:
+        return 'floor', floor_id
+    return '', 0
+
+
+def record_order_sales(order, items, sign=1):
+    """
+    Добавляет заказ в сводку (sign=-1 - вычитает, например при удалении).
+
+    items - позиции заказа (OrderItem). Выполняется за постоянное число
+    запросов: выборка строк часа с блокировкой, bulk_update и bulk_create.
+    При вычитании строк, которых в сводке нет (заказ еще не попал в
+    backfill_sales), ничего не создается - как в remove_orders_sales.
+    """
+    hour = hour_bucket(order.created_at)
+    location_type, location_id = order_location(order.room_id, order.building_id, order.floor_id)
+
+    # Изменения по ключу product_id (None - итог по заказу)
+    deltas = {None: [sign, 0, sign * order.total_price]}
+    for item in items:
+        delta = deltas.setdefault(item.product_id, [0, 0, Decimal('0')])
+        delta[0] = sign
+        delta[1] += sign * item.quantity
+        delta[2] += sign * item.quantity * item.price_at_moment
+        deltas[None][1] += sign * item.quantity
+
+    with transaction.atomic():
+        existing = {}
+        rows = SalesRollup.objects.select_for_update().filter(
+            hour=hour, location_type=location_type, location_id=location_id,
+        )
+        for row in rows:
+            if row.product_id in deltas and row.product_id not in existing:
+                existing[row.product_id] = row
+
+        to_update, to_create = [], []
+        for product_id, (orders, quantity, revenue) in deltas.items():
+            row = existing.get(product_id)
+            if row is None:
+                if sign < 0:
+                    continue
+                to_create.append(SalesRollup(
+                    hour=hour, location_type=location_type, location_id=location_id,
+                    product_id=product_id, orders=orders, quantity=quantity, revenue=revenue,
+                ))
+            else:
+                row.orders += orders
+                row.quantity += quantity
+                row.revenue += revenue
+                to_update.append(row)
+
+        if to_update:
+            SalesRollup.objects.bulk_update(to_update, ['orders', 'quantity', 'revenue'])
+        if to_create:
+            SalesRollup.objects.bulk_create(to_create)
+
+
+def remove_orders_sales(orders):
+    """
+    Вычитает заказы из сводки перед массовым удалением (корпус, этаж или
+    номер вместе с заказами). Сигнал pre_delete делает это по одному заказу -
+    несколько запросов на заказ; здесь сводка считается агрегацией в БД, и
+    число запросов не зависит от числа заказов. Само удаление нужно
+    выполнить внутри keep_sales_on_delete(), иначе заказы вычтутся дважды.
+    """
+    deltas = {
+        (row.hour, row.location_type, row.location_id, row.product_id): row
+        for row in iter_rollup_rows(orders, OrderItem.objects.filter(order__in=orders))
+    }
+    if not deltas:
+        return 0
+
+    with transaction.atomic():
+        rows = SalesRollup.objects.select_for_update().filter(
+            hour__in={key[0] for key in deltas},
+            location_type__in={key[1] for key in deltas},
+            location_id__in={key[2] for key in deltas},
+        )
+        to_update = []
+        for row in rows:
+            delta = deltas.pop((row.hour, row.location_type, row.location_id, row.product_id), None)
+            if delta is None:
+                continue
+            row.orders -= delta.orders
+            row.quantity -= delta.quantity
+            row.revenue -= delta.revenue
+            to_update.append(row)
+        SalesRollup.objects.bulk_update(to_update, ['orders', 'quantity', 'revenue'], batch_size=1000)
+    return len(to_update)
+
+
+def rebuild_sales_rollup(since=None, batch_size=1000):
+    """
+    Пересчитывает сводку по заказам начиная с since (по умолчанию - всю).
+
+    Учитываются и рабочие, и перенесенные в архив заказы (ArchivedOrder).
+    Агрегация выполняется в БД; возвращает число созданных строк.
+    """
+    sources = [
+        (Order.objects.all(), OrderItem.objects.all()),
+        # Позиции удаленных из меню блюд в сводку по блюдам не попадают
+        (ArchivedOrder.objects.all(), ArchivedOrderItem.objects.filter(product__isnull=False)),
+    ]
+    rollups = SalesRollup.objects.all()
+    if since is not None:
+        since = hour_bucket(since)
+        sources = [
+            (orders.filter(created_at__gte=since), items.filter(order__created_at__gte=since))
+            for orders, items in sources
+        ]
+        rollups = rollups.filter(hour__gte=since)
+
+    created = 0
+    with transaction.atomic():
+        rollups.delete()
+
+        batch = []
+        for orders, items in sources:
+            for rollup in iter_rollup_rows(orders, items):
+                batch.append(rollup)
+                if len(batch) >= batch_size:
+                    created += len(SalesRollup.objects.bulk_create(batch))
+                    batch = []
+
+        if batch:
+            created += len(SalesRollup.objects.bulk_create(batch))
+
+    return created
+
+
+def iter_rollup_rows(orders, items):
+    """Строки сводки (несохраненные SalesRollup) по заказам и их позициям"""
+    item_rows = items.annotate(
+        hour=TruncHour('order__created_at', tzinfo=dt_timezone.utc),
+    ).values(
+        'hour', 'order__room_id', 'order__building_id', 'order__floor_id', 'product_id',
+    ).annotate(
+        order_count=Count('order_id', distinct=True),
+        total_quantity=Sum('quantity'),
+        total_revenue=Sum(F('quantity') * F('price_at_moment')),
+    ).order_by()
+
+    order_rows = orders.annotate(
+        hour=TruncHour('created_at', tzinfo=dt_timezone.utc),
+    ).values(
+        'hour', 'room_id', 'building_id', 'floor_id',
+    ).annotate(
+        order_count=Count('id'),
+        total_revenue=Sum('total_price'),
+    ).order_by()
+
+    order_quantities = defaultdict(int)
+    for row in item_rows.iterator():
+        location_type, location_id = order_location(
+            row['order__room_id'], row['order__building_id'], row['order__floor_id'],
+        )
+        order_quantities[(row['hour'], location_type, location_id)] += row['total_quantity'] or 0
+        yield SalesRollup(
+            hour=row['hour'], location_type=location_type, location_id=location_id,
+            product_id=row['product_id'], orders=row['order_count'],
+            quantity=row['total_quantity'] or 0, revenue=row['total_revenue'] or 0,
+        )
+
+    for row in order_rows.iterator():
+        location_type, location_id = order_location(row['room_id'], row['building_id'], row['floor_id'])
+        yield SalesRollup(
+            hour=row['hour'], location_type=location_type, location_id=location_id,
+            product=None, orders=row['order_count'],
+            quantity=order_quantities.get((row['hour'], location_type, location_id), 0),
+            revenue=row['total_revenue'] or 0,
+        )
+
+
+def get_sales_statistics(days=7, revenue_days=30, popular_limit=10):
+    """
+    Данные для страницы статистики из сводки.
+
+    Выручка за сегодня, неделю и месяц и статистика по дням считаются по
+    итоговым строкам за последние revenue_days дней (не больше 24 строк в
+    сутки на место доставки), популярные блюда - по строкам блюд.
+    """
+    today = timezone.localdate()
+    week_ago = today - timedelta(days=days)
+    month_ago = today - timedelta(days=revenue_days)
+    month_start = timezone.make_aware(datetime.combine(month_ago, time.min))
+
+    hourly = SalesRollup.objects.filter(
+        product__isnull=True, hour__gte=month_start,
+    ).values('hour').annotate(orders=Sum('orders'), revenue=Sum('revenue')).order_by('hour')
+
+    daily = {}
+    for row in hourly:
+        day = timezone.localtime(row['hour']).date()
+        stat = daily.setdefault(day, {'day': day, 'count': 0, 'revenue': Decimal('0')})
+        stat['count'] += row['orders']
+        stat['revenue'] += row['revenue']
+
+    def revenue_since(start):
+        return sum((stat['revenue'] for day, stat in daily.items() if day >= start), Decimal('0'))
+
+    # Популярные блюда: сколько раз блюдо заказывали
+    top = list(
+        SalesRollup.objects.filter(product__isnull=False).values('product_id').annotate(
+            total_ordered=Sum('orders'),
+        ).filter(total_ordered__gt=0).order_by('-total_ordered')[:popular_limit]
+    )
+    products = Product.objects.select_related('category').in_bulk([row['product_id'] for row in top])
+    popular_products = []
+    for row in top:
+        product = products.get(row['product_id'])
+        if product is not None:
+            product.total_ordered = row['total_ordered']
+            popular_products.append(product)
+
+    return {
+        'popular_products': popular_products,
+        'daily_stats': [stat for day, stat in sorted(daily.items()) if day >= week_ago],
+        'today_revenue': revenue_since(today),
+        'week_revenue': revenue_since(week_ago),
+        'month_revenue': revenue_since(month_ago),
+    }
@@ -0,0 +1,81 @@
+"""
+Оформление заказа из корзины гостя.
+
+Все шаги выполняются в одной транзакции и за постоянное число запросов,
+независимо от количества позиций в корзине.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+
+from .models import Order, OrderItem, Product
+from .realtime import publish_order_event, ORDER_CREATED
+from .sales import record_order_sales
+from .utils import enqueue_order_notification
+
+
+class OrderPlacementError(Exception):
+    """Заказ не может быть оформлен (пустая корзина, блюдо в стоп-листе и т.п.)"""
+
+
+def place_order(cart, location, session_key=''):
+    """
+    Создает заказ для номера, корпуса или этажа из корзины гостя.
+
+    cart - содержимое корзины {product_id: quantity} (см. hotel.cart),
+    location - место доставки (hotel.locations.ServicePoint).
+    Цены берутся из БД на момент заказа: сумма заказа всегда совпадает
+    с суммой сохраненных позиций.
+    """
+    quantities = {
+        int(product_id): int(quantity)
+        for product_id, quantity in cart.items()
+        if int(quantity) > 0
+    }
+    if not quantities:
+        raise OrderPlacementError('Корзина пуста')
+
+    with transaction.atomic():
+        products = Product.objects.in_bulk(list(quantities))
+
+        unavailable = [
+            products[product_id].name if product_id in products else f'#{product_id}'
+            for product_id in quantities
+            if product_id not in products or not products[product_id].is_available
+        ]
+        if unavailable:
+            raise OrderPlacementError(f'Недоступно для заказа: {", ".join(unavailable)}')
+
+        total_price = sum(
+            (products[product_id].price * quantity for product_id, quantity in quantities.items()),
+            Decimal('0'),
+        )
+
+        order = Order.objects.create(
+            **location.order_filter(),
+            total_price=total_price,
+            status='new',
+            session_key=session_key or '',
+            is_viewed=False,  # Новый заказ не просмотрен
+        )
+
+        items = OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order,
+                product=products[product_id],
+                quantity=quantity,
+                price_at_moment=products[product_id].price,
+            )
+            for product_id, quantity in quantities.items()
+        ])
+        
+        # Сводка для страницы статистики
+        record_order_sales(order, items)
+
+        # Уведомление в Telegram отправит telegram_worker
+        enqueue_order_notification(order)
+
+        # Уведомляем открытые вкладки дашборда (после коммита)
+        publish_order_event(order, ORDER_CREATED)
+
+    return order
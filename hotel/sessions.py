@@ -0,0 +1,25 @@
+"""
+Сессии в БД без повторной записи в том же запросе.
+
+Корзине нужен ключ сессии до конца запроса, поэтому при первом обращении
+гостя сессия сохраняется сразу (см. cart.get_cart_session_key). Сессия при
+этом остается измененной - только так SessionMiddleware отправит cookie, -
+и middleware сохранял ее еще раз лишним UPDATE. SessionStore пропускает
+сохранение, если данные не менялись с последней записи в этом запросе.
+
+    SESSION_ENGINE = 'hotel.sessions'
+"""
+from django.contrib.sessions.backends.db import SessionStore as DBSessionStore
+
+
+class SessionStore(DBSessionStore):
+    """Сессия в таблице django_session; повторное сохранение тех же данных пропускается"""
+
+    _saved_data = None
+
+    def save(self, must_create=False):
+        data = getattr(self, '_session_cache', None)
+        if not must_create and self.session_key is not None and data is not None and data == self._saved_data:
+            return
+        super().save(must_create=must_create)
+        self._saved_data = dict(self._get_session(no_load=must_create))
@@ -0,0 +1,79 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from .models import Building, Floor, Room, Category, Product, Order, SiteSettings, SlugRedirect
+from .locations import bump_locations_version, LOCATION_MODELS
+from .menu_cache import bump_menu_version
+from .realtime import bump_orders_version
+from .sales import record_order_sales, deleting_keeps_sales
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_menu_cache(sender, **kwargs):
+    """Сброс кэша меню при изменении категорий и блюд"""
+    # После коммита, чтобы другой воркер не закэшировал старые данные под новой версией
+    transaction.on_commit(bump_menu_version)
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def invalidate_orders_version(sender, **kwargs):
+    """Новая версия заказов для ETag и курсора ?since= в API дашборда"""
+    transaction.on_commit(bump_orders_version)
+
+
+@receiver(pre_delete, sender=Order)
+def remove_order_sales(sender, instance, **kwargs):
+    """Удаленный заказ вычитается из сводки продаж (позиции еще не удалены)"""
+    if deleting_keeps_sales():
+        return
+    record_order_sales(instance, list(instance.items.all()), sign=-1)
+
+
+@receiver(post_save, sender=SiteSettings)
+@receiver(post_delete, sender=SiteSettings)
+def invalidate_site_settings(sender, **kwargs):
+    """Воркеры перечитают настройки сайта (и данные Telegram) после коммита"""
+    transaction.on_commit(SiteSettings.bump_version)
+
+
+@receiver(post_save, sender=Building)
+@receiver(post_delete, sender=Building)
+@receiver(post_save, sender=Floor)
+@receiver(post_delete, sender=Floor)
+@receiver(post_save, sender=Room)
+@receiver(post_delete, sender=Room)
+def invalidate_locations(sender, update_fields=None, **kwargs):
+    """Сброс кэша мест доставки (slug, названия, активность) после коммита"""
+    # Сохранение одного лишь QR-кода запись места не меняет
+    if update_fields is not None and set(update_fields) == {'qr_code'}:
+        return
+    transaction.on_commit(bump_locations_version)
+
+
+@receiver(pre_save, sender=Building)
+@receiver(pre_save, sender=Floor)
+@receiver(pre_save, sender=Room)
+def remember_old_slug(sender, instance, update_fields=None, **kwargs):
+    """Запоминает slug до сохранения: save() корпуса и этажа пересоздает его из названия"""
+    instance._old_slug = None
+    if instance.pk and (update_fields is None or 'slug' in update_fields):
+        instance._old_slug = sender.objects.filter(pk=instance.pk).values_list('slug', flat=True).first()
+
+
+@receiver(post_save, sender=Building)
+@receiver(post_save, sender=Floor)
+@receiver(post_save, sender=Room)
+def record_slug_redirect(sender, instance, **kwargs):
+    """Старый адрес места продолжает работать через перенаправление"""
+    old_slug = getattr(instance, '_old_slug', None)
+    if old_slug and old_slug != instance.slug:
+        location_type = next(key for key, model in LOCATION_MODELS.items() if model is sender)
+        SlugRedirect.objects.update_or_create(
+            location_type=location_type, old_slug=old_slug,
+            defaults={'location_id': instance.pk},
+        )
@@ -0,0 +1,222 @@
+"""
+SQLiteChannelLayer и RedisFallbackChannelLayer: несколько процессов.
+
+Каждый экземпляр слоя играет роль отдельного процесса (свой префикс
+каналов и свои очереди в памяти), общий у них только файл SQLite (и
+"Redis" - InMemoryChannelLayer - в тестах переключения).
+
+    python manage.py test hotel.tests.test_channel_layers
+"""
+import asyncio
+import os
+import shutil
+import tempfile
+
+from channels.exceptions import ChannelFull
+from channels.layers import InMemoryChannelLayer
+from django.test import SimpleTestCase
+
+from hotel.channel_layers import RedisFallbackChannelLayer, SQLiteChannelLayer
+
+# Сколько ждать сообщения, которое должно прийти, и тишины, если не должно (секунды)
+RECEIVE_TIMEOUT = 2
+SILENCE_TIMEOUT = 0.3
+
+
+class SQLiteChannelLayerTestCase(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp(prefix='qrhotel-channels-')
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.path = os.path.join(directory, 'channels.sqlite3')
+
+    def make_layer(self, **kwargs):
+        return SQLiteChannelLayer(path=self.path, poll_interval=0.01, **kwargs)
+
+    async def receive(self, layer, channel):
+        return await asyncio.wait_for(layer.receive(channel), RECEIVE_TIMEOUT)
+
+    async def assertNothingReceived(self, layer, channel):
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(layer.receive(channel), SILENCE_TIMEOUT)
+
+
+class SQLiteChannelLayerTests(SQLiteChannelLayerTestCase):
+    async def test_group_send_between_processes(self):
+        dashboard, worker = self.make_layer(), self.make_layer()
+        channel = await dashboard.new_channel()
+        await dashboard.group_add('orders', channel)
+
+        await worker.group_send('orders', {'type': 'order.update', 'order_id': 1})
+
+        self.assertEqual(await self.receive(dashboard, channel), {'type': 'order.update', 'order_id': 1})
+        await self.assertNothingReceived(dashboard, channel)
+
+    async def test_group_send_reaches_every_process(self):
+        first, second, sender = self.make_layer(), self.make_layer(), self.make_layer()
+        first_channel = await first.new_channel()
+        second_channel = await second.new_channel()
+        await first.group_add('orders', first_channel)
+        await second.group_add('orders', second_channel)
+
+        await sender.group_send('orders', {'type': 'order.update'})
+
+        self.assertEqual((await self.receive(first, first_channel))['type'], 'order.update')
+        self.assertEqual((await self.receive(second, second_channel))['type'], 'order.update')
+
+    async def test_send_between_processes(self):
+        receiver, sender = self.make_layer(), self.make_layer()
+        channel = await receiver.new_channel()
+
+        await sender.send(channel, {'type': 'hello'})
+        self.assertEqual(await self.receive(receiver, channel), {'type': 'hello'})
+
+    async def test_expired_message_is_dropped(self):
+        receiver, sender = self.make_layer(), self.make_layer(expiry=0.1)
+        channel = await receiver.new_channel()
+
+        await sender.send(channel, {'type': 'stale'})
+        await asyncio.sleep(0.2)
+        await self.assertNothingReceived(receiver, channel)
+
+    async def test_channel_capacity(self):
+        receiver, sender = self.make_layer(), self.make_layer(capacity=2)
+        channel = await receiver.new_channel()
+
+        await sender.send(channel, {'type': 'first'})
+        await sender.send(channel, {'type': 'second'})
+        with self.assertRaises(ChannelFull):
+            await sender.send(channel, {'type': 'third'})
+
+        # Прочитанное сообщение освобождает место
+        self.assertEqual((await self.receive(receiver, channel))['type'], 'first')
+        self.assertEqual((await self.receive(receiver, channel))['type'], 'second')
+        await sender.send(channel, {'type': 'third'})
+
+    async def test_group_send_skips_full_channel(self):
+        receiver, sender = self.make_layer(capacity=1), self.make_layer(capacity=1)
+        channel = await receiver.new_channel()
+        await receiver.group_add('orders', channel)
+
+        await sender.group_send('orders', {'type': 'first'})
+        await sender.group_send('orders', {'type': 'second'})
+
+        self.assertEqual((await self.receive(receiver, channel))['type'], 'first')
+        await self.assertNothingReceived(receiver, channel)
+
+    async def test_group_discard(self):
+        receiver, sender = self.make_layer(), self.make_layer()
+        kept = await receiver.new_channel()
+        discarded = await receiver.new_channel()
+        await receiver.group_add('orders', kept)
+        await receiver.group_add('orders', discarded)
+        await receiver.group_discard('orders', discarded)
+
+        await sender.group_send('orders', {'type': 'order.update'})
+
+        self.assertEqual((await self.receive(receiver, kept))['type'], 'order.update')
+        await self.assertNothingReceived(receiver, discarded)
+
+    async def test_idle_receive_takes_no_write_lock(self):
+        receiver = self.make_layer()
+        channel = await receiver.new_channel()
+        # Первый опрос заодно чистит просроченные записи
+        await self.assertNothingReceived(receiver, channel)
+
+        transactions = []
+        execute = receiver.execute
+
+        def counting_execute(func, *args):
+            transactions.append(func.__name__)
+            return execute(func, *args)
+
+        receiver.execute = counting_execute
+        await self.assertNothingReceived(receiver, channel)
+        self.assertEqual(transactions, [])
+
+        await self.make_layer().send(channel, {'type': 'hello'})
+        self.assertEqual(await self.receive(receiver, channel), {'type': 'hello'})
+        self.assertEqual(transactions, ['pop_messages'])
+
+    async def test_flush(self):
+        receiver, sender = self.make_layer(), self.make_layer()
+        channel = await receiver.new_channel()
+        await receiver.group_add('orders', channel)
+        await sender.send(channel, {'type': 'queued'})
+
+        await sender.flush()
+
+        await self.assertNothingReceived(receiver, channel)
+        # Подписки удалены вместе с сообщениями
+        await sender.group_send('orders', {'type': 'order.update'})
+        await self.assertNothingReceived(receiver, channel)
+
+
+class SharedRedis:
+    """
+    Redis, общий для нескольких процессов: InMemoryChannelLayer с
+    префиксом каналов своего процесса (как у RedisChannelLayer).
+    """
+
+    hosts = [{'host': 'redis'}]
+
+    def __init__(self, server, process):
+        self.server = server
+        self.process = process
+
+    async def new_channel(self, prefix='specific'):
+        return await self.server.new_channel(f'{prefix}.{self.process}')
+
+    def __getattr__(self, name):
+        return getattr(self.server, name)
+
+
+class RedisFallbackChannelLayerTests(SQLiteChannelLayerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.server = InMemoryChannelLayer()
+        self.run_id = None
+
+    def make_process(self, name):
+        layer = RedisFallbackChannelLayer(path=self.path, poll_interval=0.01, probe_interval=30)
+        layer.redis = SharedRedis(self.server, name)
+        # ping отвечает run_id текущего "сервера" (None - Redis недоступен)
+        layer.ping = lambda host: self.run_id
+        layer.probe()
+        return layer
+
+    async def test_switch_to_redis_loses_no_messages(self):
+        sender, dashboard = self.make_process('sender'), self.make_process('dashboard')
+        channel = await dashboard.new_channel()
+        await dashboard.group_add('orders', channel)
+
+        # Redis появился; dashboard его еще не проверял, его подписки только в SQLite
+        self.run_id = 'first'
+        sender.probe()
+        await sender.group_send('orders', {'type': 'order.update', 'n': 1})
+        self.assertEqual(await self.receive(dashboard, channel), {'type': 'order.update', 'n': 1})
+
+        # dashboard заметил Redis: сообщение приходит через оба слоя, но один раз
+        dashboard.probe()
+        await sender.group_send('orders', {'type': 'order.update', 'n': 2})
+        self.assertEqual(await self.receive(dashboard, channel), {'type': 'order.update', 'n': 2})
+        await self.assertNothingReceived(dashboard, channel)
+
+    async def test_redis_restart_loses_no_messages(self):
+        self.run_id = 'first'
+        sender, dashboard = self.make_process('sender'), self.make_process('dashboard')
+        channel = await dashboard.new_channel()
+        await dashboard.group_add('orders', channel)
+        # Окно после первого подключения прошло: отправка только через Redis
+        sender.switched_at = dashboard.switched_at = None
+
+        # Перезапуск стер группы Redis; sender заметил его раньше dashboard
+        await self.server.flush()
+        self.run_id = 'second'
+        sender.probe()
+        await sender.group_send('orders', {'type': 'order.update', 'n': 1})
+        self.assertEqual(await self.receive(dashboard, channel), {'type': 'order.update', 'n': 1})
+
+        dashboard.probe()
+        await sender.group_send('orders', {'type': 'order.update', 'n': 2})
+        self.assertEqual(await self.receive(dashboard, channel), {'type': 'order.update', 'n': 2})
+        await self.assertNothingReceived(dashboard, channel)
@@ -0,0 +1,72 @@
+"""
+PerfMiddleware: синхронный и асинхронный режимы, запросы без замера времени.
+
+    python manage.py test hotel.tests.test_perf
+"""
+from asgiref.sync import iscoroutinefunction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase
+from django.urls import ResolverMatch
+
+from hotel.perf import PerfMiddleware, get_perf_summary, render_prometheus, reset_perf
+
+
+def resolved(request, view_name):
+    request.resolver_match = ResolverMatch(lambda request: None, (), {}, url_name=view_name)
+    return request
+
+
+class PerfMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        reset_perf()
+        self.addCleanup(reset_perf)
+        self.factory = RequestFactory()
+
+    def summary(self, name):
+        return next(row for row in get_perf_summary() if row['name'] == name)
+
+    def test_sync_request(self):
+        middleware = PerfMiddleware(lambda request: HttpResponse('ok'))
+        self.assertFalse(iscoroutinefunction(middleware))
+
+        middleware(resolved(self.factory.get('/'), 'perf_test_sync'))
+
+        row = self.summary('perf_test_sync')
+        self.assertEqual(row['count'], 1)
+        self.assertIsNotNone(row['p95_ms'])
+
+    async def test_async_request_stays_async(self):
+        async def get_response(request):
+            return HttpResponse('ok')
+
+        middleware = PerfMiddleware(get_response)
+        self.assertTrue(iscoroutinefunction(middleware))
+
+        response = await middleware(resolved(self.factory.get('/'), 'perf_test_async'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.summary('perf_test_async')['count'], 1)
+
+    async def test_long_poll_is_not_timed(self):
+        async def get_response(request):
+            return HttpResponse('{}')
+
+        middleware = PerfMiddleware(get_response)
+        await middleware(resolved(self.factory.get('/'), 'order_status_poll'))
+
+        row = self.summary('order_status_poll')
+        self.assertEqual(row['count'], 1)
+        self.assertIsNone(row['p95_ms'])
+        # В гистограмме Prometheus запрос тоже не учтен
+        count_line = next(
+            line for line in render_prometheus().splitlines()
+            if line.startswith('qrhotel_request_duration_seconds_count{view="order_status_poll"')
+        )
+        self.assertTrue(count_line.endswith(' 0'), count_line)
+
+    def test_streaming_response_is_not_timed(self):
+        middleware = PerfMiddleware(lambda request: StreamingHttpResponse(iter([b'zip'])))
+
+        middleware(resolved(self.factory.get('/'), 'perf_test_streaming'))
+
+        self.assertIsNone(self.summary('perf_test_streaming')['p95_ms'])
@@ -0,0 +1,378 @@
+"""
+Бюджеты запросов к БД для горячих views.
+
+Фикстура - отель из нескольких корпусов, этажей и номеров, меню и история
+заказов. Каждый тест проверяет, что запрос укладывается в бюджет, а для
+списков и корзины - что число запросов не растет вместе с числом позиций,
+заказов или номеров. Возврат N+1 (запрос в цикле по позициям) ломает тест.
+
+Кэш перед каждым тестом пустой, поэтому бюджеты считаются для холодного
+кэша - худшего случая.
+
+    python manage.py test hotel.tests.test_query_budgets
+"""
+import json
+import shutil
+import tempfile
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Sum
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from hotel.models import Building, Category, Floor, Order, OrderItem, Product, Room, SalesRollup, SiteSettings
+from hotel.sales import rebuild_sales_rollup
+
+
+def create_hotel(buildings=2, floors=3, rooms=4, categories=4, products=5, name='Корпус'):
+    """Корпуса с этажами и номерами и меню; возвращает (номера, блюда)"""
+    all_rooms = []
+    for b in range(buildings):
+        building = Building.objects.create(name=f'{name} {b + 1}')
+        for f in range(floors):
+            floor = Floor.objects.create(building=building, name=f'{f + 1} этаж', number=f + 1)
+            for r in range(rooms):
+                all_rooms.append(Room.objects.create(floor=floor, number=str((f + 1) * 100 + r + 1)))
+
+    all_products = []
+    for c in range(categories):
+        category = Category.objects.create(name=f'Категория {c + 1}', order_priority=c)
+        for p in range(products):
+            all_products.append(Product.objects.create(
+                category=category, name=f'Блюдо {c + 1}.{p + 1}', price=Decimal(100 + p * 10),
+            ))
+    return all_rooms, all_products
+
+
+def create_orders(rooms, products, count, status='new', is_archived=False, lines=3):
+    """Заказы с позициями по номерам и блюдам по кругу"""
+    orders = []
+    for i in range(count):
+        items = [(products[(i + j) % len(products)], j + 1) for j in range(lines)]
+        order = Order.objects.create(
+            room=rooms[i % len(rooms)],
+            total_price=sum(product.price * quantity for product, quantity in items),
+            status=status,
+            is_archived=is_archived,
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=quantity, price_at_moment=product.price)
+            for product, quantity in items
+        ])
+        orders.append(order)
+    return orders
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+    QR_GENERATION='deferred',
+    PERF_PROFILE_SAMPLE_RATE=0,
+)
+class QueryBudgetTestCase(TestCase):
+    """Общая фикстура отеля и проверки числа запросов"""
+
+    @classmethod
+    def setUpTestData(cls):
+        SiteSettings.objects.create(pk=1)
+        cls.rooms, cls.products = create_hotel()
+        cls.room = cls.rooms[0]
+        cls.floor = cls.room.floor
+        cls.building = cls.floor.building
+        create_orders(cls.rooms, cls.products, 10, status='done', is_archived=True)
+        create_orders(cls.rooms, cls.products, 6, status='new')
+        create_orders(cls.rooms, cls.products, 4, status='cooking')
+        rebuild_sales_rollup()
+        cls.staff_user = get_user_model().objects.create_superuser('staff', 'staff@example.com', 'password')
+
+    @classmethod
+    def setUpClass(cls):
+        # Свой каталог для каждого класса: удаляется после его тестов
+        media_root = tempfile.mkdtemp(prefix='qrhotel-tests-')
+        cls.addClassCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media_override = override_settings(MEDIA_ROOT=media_root)
+        media_override.enable()
+        cls.addClassCleanup(media_override.disable)
+        super().setUpClass()
+
+    def setUp(self):
+        cache.clear()
+        self.guest = Client()
+        self.staff = Client()
+        self.staff.force_login(self.staff_user)
+
+    def count_queries(self, request):
+        """Число запросов и ответ для request()"""
+        with CaptureQueriesContext(connection) as queries:
+            response = request()
+        self.assertLess(response.status_code, 400, response.content[:500])
+        return len(queries), queries, response
+
+    def assertQueryBudget(self, budget, request):
+        count, queries, response = self.count_queries(request)
+        if count > budget:
+            self.fail(
+                f'{count} запросов при бюджете {budget}:\n'
+                + '\n'.join(f'{i}. {query["sql"]}' for i, query in enumerate(queries.captured_queries, 1))
+            )
+        return response
+
+    def assertQueriesIndependentOf(self, request, grow):
+        """Одинаковое число запросов до и после grow() (оба замера - с холодным кэшем)"""
+        cache.clear()
+        before = self.count_queries(request)[0]
+        grow()
+        cache.clear()
+        after, queries, _ = self.count_queries(request)
+        if after != before:
+            self.fail(
+                f'Запросов стало {after} вместо {before}:\n'
+                + '\n'.join(f'{i}. {query["sql"]}' for i, query in enumerate(queries.captured_queries, 1))
+            )
+
+    def post_json(self, url, data):
+        return self.guest.post(url, json.dumps(data), content_type='application/json')
+
+    def fill_cart(self, products, url_name='cart_add', slug=None):
+        for product in products:
+            response = self.post_json(
+                reverse(url_name, args=[slug or self.room.slug]),
+                {'product_id': product.id, 'quantity': 2},
+            )
+            self.assertTrue(response.json()['success'])
+
+
+class GuestPageQueryTests(QueryBudgetTestCase):
+    def test_order_page(self):
+        self.assertQueryBudget(5, lambda: self.guest.get(reverse('order_page', args=[self.room.slug])))
+
+    def test_floor_page(self):
+        self.assertQueryBudget(5, lambda: self.guest.get(reverse('floor_page', args=[self.floor.slug])))
+
+    def test_building_page(self):
+        self.assertQueryBudget(5, lambda: self.guest.get(reverse('building_page', args=[self.building.slug])))
+
+    def test_order_page_warm_cache(self):
+        url = reverse('order_page', args=[self.room.slug])
+        self.guest.get(url)
+        self.assertQueryBudget(1, lambda: self.guest.get(url))
+
+    def test_order_page_independent_of_menu_size(self):
+        category = Category.objects.create(name='Новая категория')
+
+        def grow():
+            Product.objects.bulk_create([
+                Product(category=category, name=f'Новое блюдо {i}', price=Decimal(200)) for i in range(20)
+            ])
+
+        self.assertQueriesIndependentOf(lambda: self.guest.get(reverse('order_page', args=[self.room.slug])), grow)
+
+    def test_order_status_poll(self):
+        # Тестовый клиент - WSGI: ответ сразу, с интервалом следующего запроса
+        order = Order.objects.filter(room=self.room, is_archived=False).first()
+        url = reverse('order_status_poll', args=['room', self.room.slug, order.id])
+        response = self.assertQueryBudget(3, lambda: self.guest.get(url, {'status': order.status}))
+        self.assertEqual(response.json()['status'], order.status)
+        self.assertTrue(response.json()['retry'])
+
+    def test_order_status_poll_other_location(self):
+        order = Order.objects.exclude(room=self.room).filter(room__isnull=False).first()
+        url = reverse('order_status_poll', args=['room', self.room.slug, order.id])
+        self.assertEqual(self.guest.get(url).status_code, 404)
+
+
+class CartQueryTests(QueryBudgetTestCase):
+    def test_cart_add(self):
+        self.fill_cart(self.products[:1])
+        self.assertQueryBudget(8, lambda: self.post_json(
+            reverse('cart_add', args=[self.room.slug]), {'product_id': self.products[1].id},
+        ))
+
+    def test_cart_update(self):
+        self.fill_cart(self.products[:3])
+        self.assertQueryBudget(7, lambda: self.post_json(
+            reverse('cart_update', args=[self.room.slug]), {'product_id': self.products[0].id, 'quantity': 5},
+        ))
+
+    def test_cart_remove(self):
+        self.fill_cart(self.products[:3])
+        self.assertQueryBudget(6, lambda: self.post_json(
+            reverse('cart_remove', args=[self.room.slug]), {'product_id': self.products[0].id},
+        ))
+
+    def test_get_cart(self):
+        self.fill_cart(self.products[:3])
+        cache.clear()
+        self.assertQueryBudget(5, lambda: self.guest.get(reverse('get_cart', args=[self.room.slug])))
+
+    def test_get_cart_not_modified(self):
+        self.fill_cart(self.products[:3])
+        url = reverse('get_cart', args=[self.room.slug])
+        etag = self.guest.get(url)['ETag']
+        response = self.assertQueryBudget(1, lambda: self.guest.get(url, HTTP_IF_NONE_MATCH=etag))
+        self.assertEqual(response.status_code, 304)
+
+    def test_cart_batch(self):
+        operations = [{'op': 'add', 'product_id': product.id, 'quantity': 1} for product in self.products[:10]]
+        self.fill_cart(self.products[:1])
+        response = self.assertQueryBudget(8, lambda: self.post_json(
+            reverse('cart_batch', args=[self.room.slug]), {'operations': operations},
+        ))
+        self.assertEqual(len(response.json()['items']), 10)
+
+    def test_cart_batch_independent_of_operations(self):
+        url = reverse('cart_batch', args=[self.room.slug])
+        self.fill_cart(self.products[:1])
+        counts = []
+        for products in (self.products[1:2], self.products[2:12]):
+            operations = [{'op': 'add', 'product_id': product.id, 'quantity': 1} for product in products]
+            operations.append({'op': 'remove', 'product_id': self.products[0].id})
+            counts.append(self.count_queries(lambda: self.post_json(url, {'operations': operations}))[0])
+        self.assertEqual(counts[0], counts[1], f'Запросов для 1 и 10 операций: {counts}')
+
+    def test_cart_batch_floor_and_building(self):
+        operations = [{'op': 'add', 'product_id': self.products[0].id, 'quantity': 1}]
+        # Первый запрос гостя создает сессию (одна запись, без повторного UPDATE),
+        # второй читает ее
+        self.assertQueryBudget(13, lambda: self.post_json(
+            reverse('floor_cart_batch', args=[self.floor.slug]), {'operations': operations},
+        ))
+        self.assertQueryBudget(8, lambda: self.post_json(
+            reverse('building_cart_batch', args=[self.building.slug]), {'operations': operations},
+        ))
+
+    def test_get_cart_independent_of_lines(self):
+        url = reverse('get_cart', args=[self.room.slug])
+        self.fill_cart(self.products[:1])
+        self.assertQueriesIndependentOf(lambda: self.guest.get(url), lambda: self.fill_cart(self.products[1:12]))
+
+
+class CreateOrderQueryTests(QueryBudgetTestCase):
+    def create_order(self, room=None):
+        return self.guest.post(reverse('create_order', args=[(room or self.room).slug]))
+
+    def test_create_order(self):
+        self.fill_cart(self.products[:5])
+        response = self.assertQueryBudget(16, self.create_order)
+        self.assertTrue(response.json()['success'])
+
+    def test_create_order_independent_of_lines(self):
+        # Номера без заказов в фикстуре: сводка продаж для обоих заказов создается заново
+        counts = []
+        for lines, room in ((1, self.rooms[-1]), (12, self.rooms[-2])):
+            self.fill_cart(self.products[:lines], slug=room.slug)
+            cache.clear()
+            count, queries, response = self.count_queries(lambda: self.create_order(room))
+            self.assertTrue(response.json()['success'])
+            self.assertEqual(Order.objects.latest('id').items.count(), lines)
+            counts.append(count)
+        self.assertEqual(counts[0], counts[1], f'Запросов для 1 и 12 позиций: {counts}')
+
+
+class DashboardQueryTests(QueryBudgetTestCase):
+    def test_orders_live(self):
+        response = self.assertQueryBudget(9, lambda: self.staff.get(reverse('orders_live')))
+        self.assertEqual(len(response.json()['orders']), 10)
+
+    def test_orders_live_independent_of_orders(self):
+        self.assertQueriesIndependentOf(
+            lambda: self.staff.get(reverse('orders_live')),
+            lambda: create_orders(self.rooms, self.products, 15, lines=5),
+        )
+
+    def test_unviewed_orders(self):
+        # Включая архивацию (первый запрос после паузы ORDER_AUTO_ARCHIVE_INTERVAL)
+        self.assertQueryBudget(10, lambda: self.staff.get(reverse('unviewed_orders')))
+
+    def test_unviewed_orders_independent_of_orders(self):
+        self.assertQueriesIndependentOf(
+            lambda: self.staff.get(reverse('unviewed_orders')),
+            lambda: create_orders(self.rooms, self.products, 15, lines=5),
+        )
+
+    def test_dashboard_home(self):
+        self.assertQueryBudget(14, lambda: self.staff.get(reverse('dashboard_home')))
+
+    def test_dashboard_home_independent_of_orders(self):
+        self.assertQueriesIndependentOf(
+            lambda: self.staff.get(reverse('dashboard_home')),
+            lambda: create_orders(self.rooms, self.products, 15, lines=5),
+        )
+
+    def test_dashboard_rooms(self):
+        self.assertQueryBudget(7, lambda: self.staff.get(reverse('dashboard_rooms')))
+
+    def test_dashboard_rooms_independent_of_rooms(self):
+        self.assertQueriesIndependentOf(
+            lambda: self.staff.get(reverse('dashboard_rooms')),
+            lambda: create_hotel(buildings=1, floors=2, rooms=5, categories=0, name='Block'),
+        )
+
+    def test_dashboard_floor_rooms(self):
+        response = self.assertQueryBudget(6, lambda: self.staff.get(reverse('dashboard_floor_rooms', args=[self.floor.id])))
+        self.assertContains(response, self.room.number)
+
+    def test_dashboard_floor_rooms_independent_of_rooms(self):
+        floor = self.floor
+        self.assertQueriesIndependentOf(
+            lambda: self.staff.get(reverse('dashboard_floor_rooms', args=[floor.id])),
+            lambda: [Room.objects.create(floor=floor, number=f'9{i:02d}') for i in range(5)],
+        )
+
+    def sales_totals(self):
+        return sorted((
+            SalesRollup.objects.values_list('hour', 'location_type', 'location_id', 'product_id')
+            .annotate(orders=Sum('orders'), quantity=Sum('quantity'), revenue=Sum('revenue'))
+            .filter(orders__gt=0)
+        ), key=str)
+
+    def test_building_delete_independent_of_orders(self):
+        counts = []
+        for orders in (1, 20):
+            rooms, _ = create_hotel(buildings=1, floors=2, rooms=3, categories=0, name='Block')
+            create_orders(rooms, self.products, orders)
+            rebuild_sales_rollup()
+            building = rooms[0].floor.building
+            count, queries, response = self.count_queries(
+                lambda: self.staff.post(reverse('dashboard_building_delete', args=[building.id]))
+            )
+            self.assertTrue(response.json()['success'])
+            counts.append(count)
+            # Сводка после удаления совпадает с пересчитанной с нуля
+            totals = self.sales_totals()
+            rebuild_sales_rollup()
+            self.assertEqual(totals, self.sales_totals())
+        self.assertEqual(counts[0], counts[1], f'Запросов для 1 и 20 заказов: {counts}')
+
+    def test_order_delete_without_rollup_rows(self):
+        # Заказ еще не попал в сводку: удаление не оставляет отрицательных строк
+        rooms, _ = create_hotel(buildings=1, floors=1, rooms=1, categories=0, name='Block')
+        order = create_orders(rooms, self.products, 1)[0]
+        order.delete()
+        self.assertFalse(SalesRollup.objects.filter(location_type='room', location_id=rooms[0].id).exists())
+        totals = self.sales_totals()
+        rebuild_sales_rollup()
+        self.assertEqual(totals, self.sales_totals())
+
+    def test_dashboard_menu(self):
+        self.assertQueryBudget(6, lambda: self.staff.get(reverse('dashboard_menu')))
+
+    def test_dashboard_menu_independent_of_products(self):
+        self.assertQueriesIndependentOf(
+            lambda: self.staff.get(reverse('dashboard_menu')),
+            lambda: create_hotel(buildings=0, categories=3, products=6),
+        )
+
+    def test_dashboard_statistics(self):
+        self.assertQueryBudget(7, lambda: self.staff.get(reverse('dashboard_statistics')))
+
+    def test_dashboard_statistics_independent_of_orders(self):
+        def grow():
+            create_orders(self.rooms, self.products, 20, status='done', is_archived=True, lines=4)
+            rebuild_sales_rollup()
+
+        self.assertQueriesIndependentOf(lambda: self.staff.get(reverse('dashboard_statistics')), grow)
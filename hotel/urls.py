@@ -1,28 +1,30 @@
-from django.urls import path
+from django.urls import path, re_path
 from . import views
 
+# Гостевые маршруты одинаковы для номера, этажа и корпуса: общие views
+# получают тип места доставки из маршрута
+GUEST_ROUTES = [
+    # (префикс URL, тип места, префикс имен маршрутов, имя страницы меню)
+    ('order', 'room', '', 'order_page'),
+    ('floor', 'floor', 'floor_', 'floor_page'),
+    ('building', 'building', 'building_', 'building_page'),
+]
+
 urlpatterns = [
     path('', views.home, name='home'),
-    path('building/<slug:building_slug>/', views.building_page, name='building_page'),
-    path('building/<slug:building_slug>/cart/', views.building_get_cart, name='building_get_cart'),
-    path('building/<slug:building_slug>/cart/add/', views.building_cart_add, name='building_cart_add'),
-    path('building/<slug:building_slug>/cart/remove/', views.building_cart_remove, name='building_cart_remove'),
-    path('building/<slug:building_slug>/cart/update/', views.building_cart_update, name='building_cart_update'),
-    path('building/<slug:building_slug>/create/', views.building_create_order, name='building_create_order'),
-    path('building/<slug:building_slug>/status/<int:order_id>/', views.building_order_status, name='building_order_status'),
-    path('floor/<slug:floor_slug>/', views.floor_page, name='floor_page'),
-    path('floor/<slug:floor_slug>/cart/', views.floor_get_cart, name='floor_get_cart'),
-    path('floor/<slug:floor_slug>/cart/add/', views.floor_cart_add, name='floor_cart_add'),
-    path('floor/<slug:floor_slug>/cart/remove/', views.floor_cart_remove, name='floor_cart_remove'),
-    path('floor/<slug:floor_slug>/cart/update/', views.floor_cart_update, name='floor_cart_update'),
-    path('floor/<slug:floor_slug>/create/', views.floor_create_order, name='floor_create_order'),
-    path('floor/<slug:floor_slug>/status/<int:order_id>/', views.floor_order_status, name='floor_order_status'),
-    path('order/<slug:room_slug>/', views.order_page, name='order_page'),
-    path('order/<slug:room_slug>/cart/', views.get_cart, name='get_cart'),
-    path('order/<slug:room_slug>/cart/add/', views.cart_add, name='cart_add'),
-    path('order/<slug:room_slug>/cart/remove/', views.cart_remove, name='cart_remove'),
-    path('order/<slug:room_slug>/cart/update/', views.cart_update, name='cart_update'),
-    path('order/<slug:room_slug>/create/', views.create_order, name='create_order'),
-    path('order/<slug:room_slug>/status/<int:order_id>/', views.order_status, name='order_status'),
+    # Короткие ссылки QR-кодов: адрес в QR-коде записан заглавными буквами
+    re_path(r'^[tT]/(?P<code>[0-9A-Za-z]+)/$', views.short_link, name='short_link'),
 ]
 
+for prefix, location_type, name, page_name in GUEST_ROUTES:
+    kwargs = {'location_type': location_type}
+    urlpatterns += [
+        path(f'{prefix}/<slug:slug>/', views.location_page, kwargs, name=page_name),
+        path(f'{prefix}/<slug:slug>/cart/', views.get_cart, kwargs, name=f'{name}get_cart'),
+        path(f'{prefix}/<slug:slug>/cart/add/', views.cart_add, kwargs, name=f'{name}cart_add'),
+        path(f'{prefix}/<slug:slug>/cart/remove/', views.cart_remove, kwargs, name=f'{name}cart_remove'),
+        path(f'{prefix}/<slug:slug>/cart/update/', views.cart_update, kwargs, name=f'{name}cart_update'),
+        path(f'{prefix}/<slug:slug>/cart/batch/', views.cart_batch, kwargs, name=f'{name}cart_batch'),
+        path(f'{prefix}/<slug:slug>/create/', views.create_order, kwargs, name=f'{name}create_order'),
+        path(f'{prefix}/<slug:slug>/status/<int:order_id>/', views.order_status, kwargs, name=f'{name}order_status'),
+    ]
@@ -1,6 +1,21 @@
 from django.conf import settings
 import requests
-from .models import Order, SiteSettings
+from .models import Order, SiteSettings, TelegramOutbox
+
+# (connect, read) - медленный Telegram не должен держать воркер бесконечно
+TELEGRAM_TIMEOUT = (3.05, 10)
+
+
+class TelegramAPIError(Exception):
+    """Ошибка Telegram API
+
+    retry_after - пауза в секундах, если Telegram ограничил частоту запросов;
+    permanent - повторная отправка не поможет (неверный токен, чат и т.п.)
+    """
+    def __init__(self, message, retry_after=None, permanent=False):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.permanent = permanent
 
 
 def format_order_location(order):
@@ -57,18 +72,42 @@ def format_order_location(order):
     return ", ".join(location_parts)
 
 
-def send_telegram_notification(order):
-    """Отправка уведомления о новом заказе в Telegram"""
+def get_telegram_credentials():
+    """Токен бота и ID чата: из настроек в БД, иначе из settings.py"""
     site_settings = SiteSettings.get_settings()
-    
-    # Используем настройки из БД, если они есть, иначе из settings.py
     bot_token = site_settings.telegram_bot_token or getattr(settings, 'TELEGRAM_BOT_TOKEN', '')
     chat_id = site_settings.telegram_chat_id or getattr(settings, 'TELEGRAM_CHAT_ID', '')
+    return bot_token, chat_id
+
+
+def telegram_request(bot_token, method, data, session=None):
+    """Вызов метода Telegram Bot API с таймаутом, возвращает поле result"""
+    http = session or requests
+    url = f"https://api.telegram.org/bot{bot_token}/{method}"
     
-    if not bot_token or not chat_id:
-        return None
+    try:
+        response = http.post(url, json=data, timeout=TELEGRAM_TIMEOUT)
+    except requests.RequestException as e:
+        raise TelegramAPIError(f"{method}: {e}")
     
-    # Формируем текст сообщения
+    try:
+        result = response.json()
+    except ValueError:
+        result = {}
+    description = result.get('description', f'HTTP {response.status_code}')
+    
+    if response.status_code == 429:
+        retry_after = result.get('parameters', {}).get('retry_after', 1)
+        raise TelegramAPIError(f"{method}: {description}", retry_after=retry_after)
+    if response.status_code >= 500:
+        raise TelegramAPIError(f"{method}: {description}")
+    if not result.get('ok'):
+        raise TelegramAPIError(f"{method}: {description}", permanent=True)
+    return result.get('result')
+
+
+def format_order_message(order, title):
+    """Текст сообщения о заказе"""
     items_text = "\n".join([
         f"• {item.product.name} x{item.quantity} - {item.price_at_moment * item.quantity} ₽"
         for item in order.items.all()
@@ -77,8 +116,8 @@ def send_telegram_notification(order):
     # Используем функцию для формирования полной иерархии
     location = format_order_location(order)
     
-    message = f"""
-🆕 Новый заказ #{order.id}
+    return f"""
+{title}
 
 📍 {location}
 💰 Сумма: {order.total_price} ₽
@@ -89,45 +128,36 @@ def send_telegram_notification(order):
 
 Статус: {order.get_status_display()}
 """
+
+
+def send_telegram_notification(order, session=None):
+    """Отправка уведомления о новом заказе в Telegram (выполняется в telegram_worker)"""
+    bot_token, chat_id = get_telegram_credentials()
     
-    url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
-    data = {
+    if not bot_token or not chat_id:
+        return None
+    
+    message = format_order_message(order, f"🆕 Новый заказ #{order.id}")
+    result = telegram_request(bot_token, 'sendMessage', {
         "chat_id": chat_id,
         "text": message,
         "parse_mode": "HTML"
-    }
-    
-    try:
-        response = requests.post(url, json=data)
-        if response.status_code == 200:
-            result = response.json()
-            if result.get('ok'):
-                message_id = result.get('result', {}).get('message_id')
-                order.telegram_message_id = str(message_id)
-                order.save()
-                return message_id
-    except Exception as e:
-        print(f"Error sending Telegram notification: {e}")
-    
-    return None
-
-
-def update_order_status_telegram(order):
-    """Обновление сообщения в Telegram при изменении статуса"""
-    site_settings = SiteSettings.get_settings()
+    }, session=session)
     
-    # Используем настройки из БД, если они есть, иначе из settings.py
-    bot_token = site_settings.telegram_bot_token or getattr(settings, 'TELEGRAM_BOT_TOKEN', '')
-    chat_id = site_settings.telegram_chat_id or getattr(settings, 'TELEGRAM_CHAT_ID', '')
+    message_id = result.get('message_id')
+    order.telegram_message_id = str(message_id)
+    # update, а не save: не перезаписываем статус, измененный пока шла отправка
+    Order.objects.filter(pk=order.pk).update(telegram_message_id=order.telegram_message_id)
+    return message_id
+
+
+def update_order_status_telegram(order, session=None):
+    """Обновление сообщения в Telegram при изменении статуса (выполняется в telegram_worker)"""
+    bot_token, chat_id = get_telegram_credentials()
     
     if not bot_token or not chat_id or not order.telegram_message_id:
         return
     
-    items_text = "\n".join([
-        f"• {item.product.name} x{item.quantity} - {item.price_at_moment * item.quantity} ₽"
-        for item in order.items.all()
-    ])
-    
     status_emoji = {
         'new': '🆕',
         'cooking': '🍳',
@@ -136,33 +166,47 @@ def update_order_status_telegram(order):
     }
     
     emoji = status_emoji.get(order.status, '📋')
+    message = format_order_message(order, f"{emoji} Заказ #{order.id}")
     
-    # Используем функцию для формирования полной иерархии
-    location = format_order_location(order)
-    
-    message = f"""
-{emoji} Заказ #{order.id}
-
-📍 {location}
-💰 Сумма: {order.total_price} ₽
-🕐 Время: {order.created_at.strftime('%H:%M')}
+    try:
+        telegram_request(bot_token, 'editMessageText', {
+            "chat_id": chat_id,
+            "message_id": int(order.telegram_message_id),
+            "text": message,
+            "parse_mode": "HTML"
+        }, session=session)
+    except TelegramAPIError as e:
+        # Повторное событие с тем же статусом - сообщение уже актуально
+        if 'message is not modified' not in str(e):
+            raise
 
-📋 Состав:
-{items_text}
 
-Статус: {order.get_status_display()}
-"""
+def answer_telegram_callback(callback_id, text, session=None):
+    """Ответ на нажатие inline-кнопки (выполняется в telegram_worker)"""
+    bot_token, chat_id = get_telegram_credentials()
     
-    url = f"https://api.telegram.org/bot{bot_token}/editMessageText"
-    data = {
-        "chat_id": chat_id,
-        "message_id": int(order.telegram_message_id),
-        "text": message,
-        "parse_mode": "HTML"
-    }
+    if not bot_token or not callback_id:
+        return
     
-    try:
-        requests.post(url, json=data)
-    except Exception as e:
-        print(f"Error updating Telegram message: {e}")
+    telegram_request(bot_token, 'answerCallbackQuery', {
+        "callback_query_id": callback_id,
+        "text": text
+    }, session=session)
+
+
+def enqueue_order_notification(order):
+    """Постановка уведомления о новом заказе в очередь (в транзакции заказа)"""
+    return TelegramOutbox.objects.create(kind='new_order', order=order)
+
+
+def enqueue_order_status_update(order):
+    """Постановка обновления статуса заказа в очередь"""
+    return TelegramOutbox.objects.create(kind='status_update', order=order)
+
 
+def enqueue_callback_answer(callback_id, text):
+    """Постановка ответа на нажатие кнопки в очередь"""
+    return TelegramOutbox.objects.create(
+        kind='callback_answer',
+        payload={'callback_id': callback_id, 'text': text}
+    )
@@ -1,15 +1,24 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import JsonResponse, HttpResponse
+from django.urls import reverse
+from django.http import JsonResponse, HttpResponse, Http404
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.decorators import login_required
-from django.db.models import Sum, Count, Q, Prefetch
+from django.db import transaction
+from django.db.models import Count, Sum, Q, Prefetch
 from django.utils import timezone
-from datetime import timedelta
+from django.utils.cache import get_conditional_response, patch_cache_control
 import json
 
-from .models import Room, Category, Product, Order, OrderItem, Building, Floor, SiteSettings
-from .utils import send_telegram_notification, update_order_status_telegram
+from .models import Room, Category, Product, Order, Building, Floor, SiteSettings
+from .utils import enqueue_order_status_update
+from .menu_cache import get_menu_context
+from .realtime import publish_order_event, ORDER_STATUS_CHANGED
+from .services import place_order, OrderPlacementError
+from .cart import CartError, get_request_cart, get_cart_contents, get_cart_etag, parse_operations
+from .locations import get_location_or_404, get_renamed_slug, resolve_short_code
+from .sales import get_sales_statistics, keep_sales_on_delete, remove_orders_sales
+from .archive import maybe_archive_orders
 
 
 def home(request):
@@ -17,105 +26,122 @@ def home(request):
     return render(request, 'hotel/home.html')
 
 
-def building_page(request, building_slug):
-    """Страница корпуса с меню - использует тот же шаблон, что и номер"""
-    building = get_object_or_404(Building, slug=building_slug, is_active=True)
+# Шаблоны и маршруты гостевых страниц по типу места доставки
+LOCATION_CONTEXT = {
+    'room': {'is_building': False, 'is_floor': False},
+    'floor': {'is_building': False, 'is_floor': True},
+    'building': {'is_building': True, 'is_floor': False},
+}
+ORDER_STATUS_TEMPLATES = {
+    'room': 'hotel/order_status.html',
+    'floor': 'hotel/floor_order_status.html',
+    'building': 'hotel/building_order_status.html',
+}
+LOCATION_PAGE_URLS = {
+    'room': 'order_page',
+    'floor': 'floor_page',
+    'building': 'building_page',
+}
+ORDER_STATUS_URLS = {
+    'room': 'order_status',
+    'floor': 'floor_order_status',
+    'building': 'building_order_status',
+}
+
+
+def short_link(request, code):
+    """Короткая ссылка из QR-кода (/t/<код>/) ведет на текущий адрес места доставки"""
+    target = resolve_short_code(code)
+    if target is None:
+        raise Http404('Ссылка не найдена')
+    location_type, slug = target
+    return redirect(LOCATION_PAGE_URLS[location_type], slug=slug)
+
+
+def location_page(request, location_type, slug):
+    """Страница меню для гостя - общая для номера, этажа и корпуса"""
+    # Старый адрес переименованного места (напечатанный QR-код)
+    new_slug = get_renamed_slug(location_type, slug)
+    if new_slug:
+        return redirect(LOCATION_PAGE_URLS[location_type], slug=new_slug, permanent=True)
+    
+    location = get_location_or_404(location_type, slug)
+    menu_context = get_menu_context()
     
-    # Получаем категории и продукты (как на странице номера)
-    categories = Category.objects.filter(is_active=True).prefetch_related(
-        Prefetch('products', queryset=Product.objects.filter(is_available=True))
-    )
-    
-    # Получаем активные заказы для корпуса
+    # Получаем активные заказы для этой сессии
     session_key = request.session.session_key
     active_order = None
     if session_key:
         active_order = Order.objects.filter(
-            building=building,
             session_key=session_key,
             is_archived=False,
-            status__in=['new', 'cooking']
+            status__in=['new', 'cooking'],
+            **location.order_filter()
         ).first()
     
     context = {
-        'building': building,
-        'room': None,  # Для совместимости с шаблоном
-        'categories': categories,
+        # Для совместимости с шаблоном: заполнен только ключ своего типа
+        'room': None,
+        'floor': None,
+        'building': None,
+        location_type: location,
         'active_order': active_order,
-        'is_building': True,  # Флаг для определения типа
+        **LOCATION_CONTEXT[location_type],
+        **menu_context,
     }
     return render(request, 'hotel/order_page.html', context)
 
 
-def order_page(request, room_slug):
-    """Страница меню для гостя"""
-    room = get_object_or_404(Room, slug=room_slug, is_active=True)
-    categories = Category.objects.filter(is_active=True).prefetch_related(
-        Prefetch('products', queryset=Product.objects.filter(is_available=True))
-    )
+def cart_operations_response(request, location, operations, full=False):
+    """Выполняет операции с корзиной гостя и возвращает JSON с итогами (full - с позициями)"""
+    try:
+        operations = parse_operations(operations)
+    except CartError as e:
+        return JsonResponse({'success': False, 'error': str(e)})
     
-    # Получаем активные заказы для этой сессии
-    session_key = request.session.session_key
-    active_order = None
-    if session_key:
-        active_order = Order.objects.filter(
-            room=room,
-            session_key=session_key,
-            is_archived=False,
-            status__in=['new', 'cooking']
-        ).first()
+    cart = get_request_cart(request, location.type, location.id, create_session=True)
+    cart.apply(operations)
+    contents = get_cart_contents(cart.get_lines())
     
-    context = {
-        'room': room,
-        'building': None,  # Для совместимости с шаблоном
-        'categories': categories,
-        'active_order': active_order,
-        'is_building': False,  # Флаг для определения типа
+    response = {
+        'success': True,
+        'total': contents['total'],
+        'cart_count': contents['count'],
     }
-    return render(request, 'hotel/order_page.html', context)
+    if full:
+        response.update(contents)
+    return JsonResponse(response)
+
+
+def get_cart(request, location_type, slug):
+    """
+    Получение содержимого корзины (AJAX).
+
+    Ответ с ETag: неизменившаяся корзина отдается как 304. Cache-Control:
+    no-cache заставляет браузер перепроверять ответ с If-None-Match при
+    каждом fetch.
+    """
+    location = get_location_or_404(location_type, slug)
+    cart = get_request_cart(request, location.type, location.id)
+    etag = get_cart_etag(cart)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = JsonResponse(get_cart_contents(cart.get_lines() if cart else {}))
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
 
 @csrf_exempt
-def cart_add(request, room_slug):
+def cart_add(request, location_type, slug):
     """Добавление товара в корзину (AJAX)"""
     if request.method == 'POST':
         try:
             data = json.loads(request.body)
-            product_id = data.get('product_id')
-            quantity = int(data.get('quantity', 1))
-            
-            room = get_object_or_404(Room, slug=room_slug)
-            product = get_object_or_404(Product, id=product_id, is_available=True)
-            
-            # Получаем или создаем корзину в сессии
-            if 'cart' not in request.session:
-                request.session['cart'] = {}
-            
-            cart = request.session['cart']
-            cart_key = str(product_id)
-            
-            if cart_key in cart:
-                cart[cart_key]['quantity'] += quantity
-            else:
-                cart[cart_key] = {
-                    'product_id': product_id,
-                    'quantity': quantity,
-                    'price': str(product.price),
-                }
-            
-            request.session.modified = True
-            
-            # Подсчитываем общую сумму
-            total = sum(
-                float(item['price']) * item['quantity']
-                for item in cart.values()
-            )
-            
-            return JsonResponse({
-                'success': True,
-                'total': total,
-                'cart_count': sum(item['quantity'] for item in cart.values())
-            })
+            location = get_location_or_404(location_type, slug)
+            return cart_operations_response(request, location, [
+                {'op': 'add', 'product_id': data.get('product_id'), 'quantity': data.get('quantity', 1)},
+            ])
         except Exception as e:
             return JsonResponse({'success': False, 'error': str(e)})
     
@@ -123,31 +149,15 @@ def cart_add(request, room_slug):
 
 
 @csrf_exempt
-def cart_remove(request, room_slug):
+def cart_remove(request, location_type, slug):
     """Удаление товара из корзины (AJAX)"""
     if request.method == 'POST':
         try:
             data = json.loads(request.body)
-            product_id = str(data.get('product_id'))
-            
-            if 'cart' in request.session:
-                cart = request.session['cart']
-                if product_id in cart:
-                    del cart[product_id]
-                    request.session.modified = True
-            
-            # Подсчитываем общую сумму
-            cart = request.session.get('cart', {})
-            total = sum(
-                float(item['price']) * item['quantity']
-                for item in cart.values()
-            )
-            
-            return JsonResponse({
-                'success': True,
-                'total': total,
-                'cart_count': sum(item['quantity'] for item in cart.values())
-            })
+            location = get_location_or_404(location_type, slug)
+            return cart_operations_response(request, location, [
+                {'op': 'remove', 'product_id': data.get('product_id')},
+            ])
         except Exception as e:
             return JsonResponse({'success': False, 'error': str(e)})
     
@@ -155,35 +165,15 @@ def cart_remove(request, room_slug):
 
 
 @csrf_exempt
-def cart_update(request, room_slug):
+def cart_update(request, location_type, slug):
     """Обновление количества товара в корзине (AJAX)"""
     if request.method == 'POST':
         try:
             data = json.loads(request.body)
-            product_id = str(data.get('product_id'))
-            quantity = int(data.get('quantity', 1))
-            
-            if 'cart' in request.session:
-                cart = request.session['cart']
-                if product_id in cart:
-                    if quantity > 0:
-                        cart[product_id]['quantity'] = quantity
-                    else:
-                        del cart[product_id]
-                    request.session.modified = True
-            
-            # Подсчитываем общую сумму
-            cart = request.session.get('cart', {})
-            total = sum(
-                float(item['price']) * item['quantity']
-                for item in cart.values()
-            )
-            
-            return JsonResponse({
-                'success': True,
-                'total': total,
-                'cart_count': sum(item['quantity'] for item in cart.values())
-            })
+            location = get_location_or_404(location_type, slug)
+            return cart_operations_response(request, location, [
+                {'op': 'set', 'product_id': data.get('product_id'), 'quantity': data.get('quantity', 1)},
+            ])
         except Exception as e:
             return JsonResponse({'success': False, 'error': str(e)})
     
@@ -191,164 +181,19 @@ def cart_update(request, room_slug):
 
 
 @csrf_exempt
-def create_order(request, room_slug):
-    """Создание заказа"""
-    if request.method == 'POST':
-        room = get_object_or_404(Room, slug=room_slug)
-        cart = request.session.get('cart', {})
-        
-        if not cart:
-            return JsonResponse({'success': False, 'error': 'Корзина пуста'})
-        
-        # Создаем заказ
-        total_price = sum(
-            float(item['price']) * item['quantity']
-            for item in cart.values()
-        )
-        
-        order = Order.objects.create(
-            room=room,
-            total_price=total_price,
-            status='new',
-            session_key=request.session.session_key or '',
-            is_viewed=False,  # Новый заказ не просмотрен
-        )
-        
-        # Создаем позиции заказа
-        for item_data in cart.values():
-            product = Product.objects.get(id=item_data['product_id'])
-            OrderItem.objects.create(
-                order=order,
-                product=product,
-                quantity=item_data['quantity'],
-                price_at_moment=product.price,
-            )
-        
-        # Очищаем корзину
-        request.session['cart'] = {}
-        request.session.modified = True
-        
-        # Отправляем уведомление в Telegram
-        send_telegram_notification(order)
-        
-        return JsonResponse({
-            'success': True,
-            'order_id': order.id,
-            'redirect_url': f'/order/{room_slug}/status/{order.id}/'
-        })
-    
-    return JsonResponse({'success': False})
-
-
-@csrf_exempt
-def building_cart_add(request, building_slug):
-    """Добавление товара в корзину для корпуса (AJAX)"""
+def cart_batch(request, location_type, slug):
+    """
+    Пакет операций с корзиной (AJAX).
+
+    Тело запроса: {"operations": [{"op": "add", "product_id": 1, "quantity": 1}, ...]}.
+    Быстрые клики "+"/"-" на странице меню уходят одним запросом, в ответе -
+    все содержимое корзины.
+    """
     if request.method == 'POST':
         try:
             data = json.loads(request.body)
-            product_id = data.get('product_id')
-            quantity = int(data.get('quantity', 1))
-            
-            building = get_object_or_404(Building, slug=building_slug, is_active=True)
-            product = get_object_or_404(Product, id=product_id, is_available=True)
-            
-            # Получаем или создаем корзину в сессии
-            if 'cart' not in request.session:
-                request.session['cart'] = {}
-            
-            cart = request.session['cart']
-            cart_key = str(product_id)
-            
-            if cart_key in cart:
-                cart[cart_key]['quantity'] += quantity
-            else:
-                cart[cart_key] = {
-                    'product_id': product_id,
-                    'quantity': quantity,
-                    'price': str(product.price),
-                }
-            
-            request.session.modified = True
-            
-            # Подсчитываем общую сумму
-            total = sum(
-                float(item['price']) * item['quantity']
-                for item in cart.values()
-            )
-            
-            return JsonResponse({
-                'success': True,
-                'total': total,
-                'cart_count': sum(item['quantity'] for item in cart.values())
-            })
-        except Exception as e:
-            return JsonResponse({'success': False, 'error': str(e)})
-    
-    return JsonResponse({'success': False})
-
-
-@csrf_exempt
-def building_cart_remove(request, building_slug):
-    """Удаление товара из корзины для корпуса (AJAX)"""
-    if request.method == 'POST':
-        try:
-            data = json.loads(request.body)
-            product_id = str(data.get('product_id'))
-            
-            if 'cart' in request.session:
-                cart = request.session['cart']
-                if product_id in cart:
-                    del cart[product_id]
-                    request.session.modified = True
-            
-            # Подсчитываем общую сумму
-            cart = request.session.get('cart', {})
-            total = sum(
-                float(item['price']) * item['quantity']
-                for item in cart.values()
-            )
-            
-            return JsonResponse({
-                'success': True,
-                'total': total,
-                'cart_count': sum(item['quantity'] for item in cart.values())
-            })
-        except Exception as e:
-            return JsonResponse({'success': False, 'error': str(e)})
-    
-    return JsonResponse({'success': False})
-
-
-@csrf_exempt
-def building_cart_update(request, building_slug):
-    """Обновление количества товара в корзине для корпуса (AJAX)"""
-    if request.method == 'POST':
-        try:
-            data = json.loads(request.body)
-            product_id = str(data.get('product_id'))
-            quantity = int(data.get('quantity', 1))
-            
-            if 'cart' in request.session:
-                cart = request.session['cart']
-                if product_id in cart:
-                    if quantity > 0:
-                        cart[product_id]['quantity'] = quantity
-                    else:
-                        del cart[product_id]
-                    request.session.modified = True
-            
-            # Подсчитываем общую сумму
-            cart = request.session.get('cart', {})
-            total = sum(
-                float(item['price']) * item['quantity']
-                for item in cart.values()
-            )
-            
-            return JsonResponse({
-                'success': True,
-                'total': total,
-                'cart_count': sum(item['quantity'] for item in cart.values())
-            })
+            location = get_location_or_404(location_type, slug)
+            return cart_operations_response(request, location, data.get('operations'), full=True)
         except Exception as e:
             return JsonResponse({'success': False, 'error': str(e)})
     
@@ -356,395 +201,69 @@ def building_cart_update(request, building_slug):
 
 
 @csrf_exempt
-def building_get_cart(request, building_slug):
-    """Получение содержимого корзины для корпуса (AJAX)"""
-    cart = request.session.get('cart', {})
-    products_data = []
-    total = 0
-    
-    for item_data in cart.values():
-        try:
-            product = Product.objects.get(id=item_data['product_id'], is_available=True)
-            quantity = item_data['quantity']
-            price = float(item_data['price'])
-            
-            products_data.append({
-                'id': product.id,
-                'name': product.name,
-                'quantity': quantity,
-                'price': price,
-                'total': price * quantity,
-            })
-            total += price * quantity
-        except Product.DoesNotExist:
-            continue
-    
-    return JsonResponse({
-        'items': products_data,
-        'total': total,
-        'count': sum(item['quantity'] for item in products_data)
-    })
-
-
-def floor_page(request, floor_slug):
-    """Страница этажа с меню - использует тот же шаблон, что и номер"""
-    floor = get_object_or_404(Floor, slug=floor_slug, is_active=True)
-    
-    # Получаем категории и продукты (как на странице номера)
-    categories = Category.objects.filter(is_active=True).prefetch_related(
-        Prefetch('products', queryset=Product.objects.filter(is_available=True))
-    )
-    
-    # Получаем активные заказы для этажа
-    session_key = request.session.session_key
-    active_order = None
-    if session_key:
-        active_order = Order.objects.filter(
-            floor=floor,
-            session_key=session_key,
-            is_archived=False,
-            status__in=['new', 'cooking']
-        ).first()
-    
-    context = {
-        'floor': floor,
-        'room': None,  # Для совместимости с шаблоном
-        'building': None,  # Для совместимости с шаблоном
-        'categories': categories,
-        'active_order': active_order,
-        'is_building': False,  # Флаг для определения типа
-        'is_floor': True,  # Флаг для определения типа
-    }
-    return render(request, 'hotel/order_page.html', context)
-
-
-@csrf_exempt
-def floor_cart_add(request, floor_slug):
-    """Добавление товара в корзину для этажа (AJAX)"""
+def create_order(request, location_type, slug):
+    """Создание заказа"""
     if request.method == 'POST':
+        location = get_location_or_404(location_type, slug)
+        cart = get_request_cart(request, location.type, location.id)
+        
         try:
-            data = json.loads(request.body)
-            product_id = data.get('product_id')
-            quantity = int(data.get('quantity', 1))
-            
-            floor = get_object_or_404(Floor, slug=floor_slug, is_active=True)
-            product = get_object_or_404(Product, id=product_id, is_available=True)
-            
-            # Получаем или создаем корзину в сессии
-            if 'cart' not in request.session:
-                request.session['cart'] = {}
-            
-            cart = request.session['cart']
-            cart_key = str(product_id)
-            
-            if cart_key in cart:
-                cart[cart_key]['quantity'] += quantity
-            else:
-                cart[cart_key] = {
-                    'product_id': product_id,
-                    'quantity': quantity,
-                    'price': str(product.price),
-                }
-            
-            request.session.modified = True
-            
-            # Подсчитываем общую сумму
-            total = sum(
-                float(item['price']) * item['quantity']
-                for item in cart.values()
-            )
-            
-            return JsonResponse({
-                'success': True,
-                'total': total,
-                'cart_count': sum(item['quantity'] for item in cart.values())
-            })
-        except Exception as e:
+            order = place_order(cart.get_lines() if cart else {}, location, request.session.session_key or '')
+        except OrderPlacementError as e:
             return JsonResponse({'success': False, 'error': str(e)})
-    
-    return JsonResponse({'success': False})
-
-
-@csrf_exempt
-def floor_cart_remove(request, floor_slug):
-    """Удаление товара из корзины для этажа (AJAX)"""
-    if request.method == 'POST':
-        try:
-            data = json.loads(request.body)
-            product_id = str(data.get('product_id'))
-            
-            if 'cart' in request.session:
-                cart = request.session['cart']
-                if product_id in cart:
-                    del cart[product_id]
-                    request.session.modified = True
-            
-            # Подсчитываем общую сумму
-            cart = request.session.get('cart', {})
-            total = sum(
-                float(item['price']) * item['quantity']
-                for item in cart.values()
-            )
-            
-            return JsonResponse({
-                'success': True,
-                'total': total,
-                'cart_count': sum(item['quantity'] for item in cart.values())
-            })
         except Exception as e:
-            return JsonResponse({'success': False, 'error': str(e)})
-    
-    return JsonResponse({'success': False})
-
-
-@csrf_exempt
-def floor_cart_update(request, floor_slug):
-    """Обновление количества товара в корзине для этажа (AJAX)"""
-    if request.method == 'POST':
+            print(f"Error creating order: {e}")
+            return JsonResponse({'success': False, 'error': 'Не удалось оформить заказ, попробуйте еще раз'})
+        
+        # Очищаем корзину (заказ уже создан: ошибка здесь не должна его скрыть)
         try:
-            data = json.loads(request.body)
-            product_id = str(data.get('product_id'))
-            quantity = int(data.get('quantity', 1))
-            
-            if 'cart' in request.session:
-                cart = request.session['cart']
-                if product_id in cart:
-                    if quantity > 0:
-                        cart[product_id]['quantity'] = quantity
-                    else:
-                        del cart[product_id]
-                    request.session.modified = True
-            
-            # Подсчитываем общую сумму
-            cart = request.session.get('cart', {})
-            total = sum(
-                float(item['price']) * item['quantity']
-                for item in cart.values()
-            )
-            
-            return JsonResponse({
-                'success': True,
-                'total': total,
-                'cart_count': sum(item['quantity'] for item in cart.values())
-            })
+            cart.apply([('clear', None, 0)])
         except Exception as e:
-            return JsonResponse({'success': False, 'error': str(e)})
-    
-    return JsonResponse({'success': False})
-
-
-@csrf_exempt
-def floor_get_cart(request, floor_slug):
-    """Получение содержимого корзины для этажа (AJAX)"""
-    cart = request.session.get('cart', {})
-    products_data = []
-    total = 0
-    
-    for item_data in cart.values():
-        try:
-            product = Product.objects.get(id=item_data['product_id'], is_available=True)
-            quantity = item_data['quantity']
-            price = float(item_data['price'])
-            
-            products_data.append({
-                'id': product.id,
-                'name': product.name,
-                'quantity': quantity,
-                'price': price,
-                'total': price * quantity,
-            })
-            total += price * quantity
-        except Product.DoesNotExist:
-            continue
-    
-    return JsonResponse({
-        'items': products_data,
-        'total': total,
-        'count': sum(item['quantity'] for item in products_data)
-    })
-
-
-@csrf_exempt
-def floor_create_order(request, floor_slug):
-    """Создание заказа для этажа"""
-    if request.method == 'POST':
-        floor = get_object_or_404(Floor, slug=floor_slug, is_active=True)
-        cart = request.session.get('cart', {})
-        
-        if not cart:
-            return JsonResponse({'success': False, 'error': 'Корзина пуста'})
-        
-        # Создаем заказ для этажа
-        total_price = sum(
-            float(item['price']) * item['quantity']
-            for item in cart.values()
-        )
-        
-        order = Order.objects.create(
-            floor=floor,
-            total_price=total_price,
-            status='new',
-            session_key=request.session.session_key or '',
-            is_viewed=False,
-        )
-        
-        # Создаем позиции заказа
-        for item_data in cart.values():
-            product = Product.objects.get(id=item_data['product_id'])
-            OrderItem.objects.create(
-                order=order,
-                product=product,
-                quantity=item_data['quantity'],
-                price_at_moment=product.price,
-            )
-        
-        # Очищаем корзину
-        request.session['cart'] = {}
-        request.session.modified = True
-        
-        # Отправляем уведомление в Telegram
-        send_telegram_notification(order)
-        
-        return JsonResponse({
-            'success': True,
-            'order_id': order.id,
-            'redirect_url': f'/floor/{floor_slug}/status/{order.id}/'
-        })
-    
-    return JsonResponse({'success': False})
-
-
-def floor_order_status(request, floor_slug, order_id):
-    """Страница статуса заказа для этажа"""
-    floor = get_object_or_404(Floor, slug=floor_slug, is_active=True)
-    order = get_object_or_404(Order, id=order_id, floor=floor)
-    
-    context = {
-        'order': order,
-        'floor': floor,
-    }
-    return render(request, 'hotel/floor_order_status.html', context)
-
-
-def building_order_status(request, building_slug, order_id):
-    """Страница статуса заказа для корпуса"""
-    building = get_object_or_404(Building, slug=building_slug, is_active=True)
-    order = get_object_or_404(Order, id=order_id, building=building)
-    
-    context = {
-        'order': order,
-        'building': building,
-    }
-    return render(request, 'hotel/building_order_status.html', context)
-
-
-@csrf_exempt
-def building_create_order(request, building_slug):
-    """Создание заказа для корпуса"""
-    if request.method == 'POST':
-        building = get_object_or_404(Building, slug=building_slug, is_active=True)
-        cart = request.session.get('cart', {})
-        
-        if not cart:
-            return JsonResponse({'success': False, 'error': 'Корзина пуста'})
-        
-        # Создаем заказ для корпуса
-        total_price = sum(
-            float(item['price']) * item['quantity']
-            for item in cart.values()
-        )
-        
-        order = Order.objects.create(
-            building=building,
-            total_price=total_price,
-            status='new',
-            session_key=request.session.session_key or '',
-            is_viewed=False,
-        )
-        
-        # Создаем позиции заказа
-        for item_data in cart.values():
-            product = Product.objects.get(id=item_data['product_id'])
-            OrderItem.objects.create(
-                order=order,
-                product=product,
-                quantity=item_data['quantity'],
-                price_at_moment=product.price,
-            )
-        
-        # Очищаем корзину
-        request.session['cart'] = {}
-        request.session.modified = True
+            print(f"Error clearing cart: {e}")
         
-        # Отправляем уведомление в Telegram
-        send_telegram_notification(order)
-        
-        # Для заказа корпуса создаем страницу статуса заказа
-        # Используем building_slug для редиректа
         return JsonResponse({
             'success': True,
             'order_id': order.id,
-            'redirect_url': f'/building/{building_slug}/status/{order.id}/'
+            'redirect_url': reverse(ORDER_STATUS_URLS[location_type], args=[slug, order.id]),
         })
     
     return JsonResponse({'success': False})
 
 
-def order_status(request, room_slug, order_id):
+def order_status(request, location_type, slug, order_id):
     """Страница статуса заказа"""
-    room = get_object_or_404(Room, slug=room_slug)
-    order = get_object_or_404(Order, id=order_id, room=room)
+    new_slug = get_renamed_slug(location_type, slug)
+    if new_slug:
+        return redirect(ORDER_STATUS_URLS[location_type], slug=new_slug, order_id=order_id, permanent=True)
+    
+    # Статус уже оформленного заказа виден и после отключения места
+    location = get_location_or_404(location_type, slug, active_only=False)
+    order = get_object_or_404(Order, id=order_id, **location.order_filter())
     
     context = {
-        'room': room,
         'order': order,
+        location_type: location,
     }
-    return render(request, 'hotel/order_status.html', context)
-
-
-def get_cart(request, room_slug):
-    """Получение содержимого корзины (AJAX)"""
-    cart = request.session.get('cart', {})
-    products_data = []
-    total = 0
-    
-    for item_data in cart.values():
-        try:
-            product = Product.objects.get(id=item_data['product_id'], is_available=True)
-            quantity = item_data['quantity']
-            price = float(item_data['price'])
-            products_data.append({
-                'id': product.id,
-                'name': product.name,
-                'quantity': quantity,
-                'price': price,
-                'total': price * quantity,
-            })
-            total += price * quantity
-        except Product.DoesNotExist:
-            continue
-    
-    return JsonResponse({
-        'items': products_data,
-        'total': total,
-        'count': sum(item['quantity'] for item in products_data)
-    })
+    return render(request, ORDER_STATUS_TEMPLATES[location_type], context)
 
 
 # Dashboard views
 @login_required
 def dashboard_home(request):
     """Главная страница дашборда - Live мониторинг"""
-    orders = Order.objects.filter(is_archived=False).select_related('room', 'room__floor', 'room__floor__building', 'building', 'floor', 'floor__building').prefetch_related('items__product').order_by('-created_at')[:50]
+    # Выполненные заказы уходят в архив по прошествии ORDER_AUTO_ARCHIVE_MINUTES
+    maybe_archive_orders()
     
-    # Статистика
-    today = timezone.now().date()
-    today_orders = Order.objects.filter(created_at__date=today)
+    orders = Order.objects.live().select_related('room', 'room__floor', 'room__floor__building', 'building', 'floor', 'floor__building').prefetch_related('items__product').order_by('-created_at')[:50]
+    
+    # Статистика (диапазон по created_at вместо created_at__date - чтобы работал индекс)
+    today_start = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+    today_orders = Order.objects.filter(created_at__gte=today_start)
     today_revenue = today_orders.aggregate(Sum('total_price'))['total_price__sum'] or 0
     
     stats = {
-        'new_orders': Order.objects.filter(status='new', is_archived=False).count(),
-        'cooking_orders': Order.objects.filter(status='cooking', is_archived=False).count(),
+        'new_orders': Order.objects.live().filter(status='new').count(),
+        'cooking_orders': Order.objects.live().filter(status='cooking').count(),
         'today_revenue': today_revenue,
         'today_orders_count': today_orders.count(),
     }
@@ -759,15 +278,13 @@ def dashboard_home(request):
 @login_required
 def dashboard_rooms(request):
     """Управление номерами и QR-кодами"""
-    buildings = Building.objects.prefetch_related('floors__rooms').all()
-    floors_without_building = Floor.objects.filter(building__isnull=True).prefetch_related('rooms').all()
-    
-    # Подсчитываем общее количество номеров для каждого корпуса
-    for building in buildings:
-        total_rooms = 0
-        for floor in building.floors.all():
-            total_rooms += floor.rooms.count()
-        building.total_rooms = total_rooms
+    # Счетчики считает БД; номера этажа подгружаются при раскрытии (dashboard_floor_rooms)
+    floors = Floor.objects.annotate(rooms_count=Count('rooms'))
+    buildings = Building.objects.annotate(
+        floors_count=Count('floors', distinct=True),
+        total_rooms=Count('floors__rooms', distinct=True),
+    ).prefetch_related(Prefetch('floors', queryset=floors))
+    floors_without_building = floors.filter(building__isnull=True)
     
     context = {
         'buildings': buildings,
@@ -776,6 +293,14 @@ def dashboard_rooms(request):
     return render(request, 'dashboard/rooms.html', context)
 
 
+@login_required
+def dashboard_floor_rooms(request, floor_id):
+    """Номера одного этажа с QR-кодами (фрагмент для htmx)"""
+    floor = get_object_or_404(Floor, id=floor_id)
+    rooms = floor.rooms.annotate(orders_count=Count('orders'))
+    return render(request, 'dashboard/floor_rooms.html', {'floor': floor, 'rooms': rooms})
+
+
 @login_required
 def dashboard_menu(request):
     """Управление меню"""
@@ -790,32 +315,8 @@ def dashboard_menu(request):
 @login_required
 def dashboard_statistics(request):
     """Статистика"""
-    today = timezone.now().date()
-    week_ago = today - timedelta(days=7)
-    month_ago = today - timedelta(days=30)
-    
-    # Популярные блюда
-    popular_products = Product.objects.annotate(
-        total_ordered=Count('orderitem')
-    ).order_by('-total_ordered')[:10]
-    
-    # Статистика по дням
-    daily_stats = Order.objects.filter(
-        created_at__date__gte=week_ago
-    ).extra(
-        select={'day': 'date(created_at)'}
-    ).values('day').annotate(
-        count=Count('id'),
-        revenue=Sum('total_price')
-    ).order_by('day')
-    
-    context = {
-        'popular_products': popular_products,
-        'daily_stats': daily_stats,
-        'today_revenue': Order.objects.filter(created_at__date=today).aggregate(Sum('total_price'))['total_price__sum'] or 0,
-        'week_revenue': Order.objects.filter(created_at__date__gte=week_ago).aggregate(Sum('total_price'))['total_price__sum'] or 0,
-        'month_revenue': Order.objects.filter(created_at__date__gte=month_ago).aggregate(Sum('total_price'))['total_price__sum'] or 0,
-    }
+    # Готовые почасовые сводки вместо агрегации по всей истории заказов
+    context = get_sales_statistics()
     return render(request, 'dashboard/statistics.html', context)
 
 
@@ -833,9 +334,10 @@ def update_order_status(request, order_id):
         # Отмечаем заказ как просмотренный при смене статуса
         order.is_viewed = True
         order.save()
+        publish_order_event(order, ORDER_STATUS_CHANGED)
         
-        # Обновляем статус в Telegram
-        update_order_status_telegram(order)
+        # Обновляем статус в Telegram (через очередь)
+        enqueue_order_status_update(order)
         
         return JsonResponse({'success': True, 'status': order.status})
     
@@ -927,7 +429,14 @@ def dashboard_building_delete(request, building_id):
     floors_count = building.floors.count()
     rooms_count = Room.objects.filter(floor__building=building).count()
     
-    building.delete()  # Каскадное удаление этажей и номеров
+    # Каскадное удаление этажей, номеров и их заказов; сводка продаж
+    # уменьшается одним пересчетом, а не сигналом на каждый заказ
+    orders = Order.objects.filter(
+        Q(building=building) | Q(floor__building=building) | Q(room__floor__building=building)
+    )
+    with transaction.atomic(), keep_sales_on_delete():
+        remove_orders_sales(orders)
+        building.delete()
     
     return JsonResponse({
         'success': True,
@@ -945,7 +454,11 @@ def dashboard_floor_delete(request, floor_id):
     rooms_count = floor.rooms.count()
     floor_name = f"{floor.building.name if floor.building else 'Без корпуса'} - Этаж {floor.number}"
     
-    floor.delete()  # Каскадное удаление номеров
+    # Каскадное удаление номеров и заказов (см. dashboard_building_delete)
+    orders = Order.objects.filter(Q(floor=floor) | Q(room__floor=floor))
+    with transaction.atomic(), keep_sales_on_delete():
+        remove_orders_sales(orders)
+        floor.delete()
     
     return JsonResponse({
         'success': True,
@@ -1202,7 +715,8 @@ def dashboard_product_delete(request, product_id):
 @login_required
 def dashboard_settings(request):
     """Настройки сайта"""
-    settings = SiteSettings.get_settings()
+    # Отдельный объект из БД: общий кэшированный экземпляр не редактируем
+    settings = SiteSettings.get_settings(fresh=True)
     
     if request.method == 'POST':
         settings.site_name = request.POST.get('site_name', 'QR Hotel Service')
@@ -56,6 +56,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so that its timings cover the other middleware
+    'hotel.perf.PerfMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -118,34 +120,40 @@ else:
         }
     }
 
-# Channels configuration
-# Отключаем Redis если он недоступен (для избежания ошибок 500)
-try:
-    import redis
-    redis_client = redis.Redis(host=os.environ.get('REDIS_HOST', '127.0.0.1'), 
-                               port=int(os.environ.get('REDIS_PORT', '6379')), 
-                               socket_connect_timeout=1)
-    redis_client.ping()
-    REDIS_AVAILABLE = True
-except:
-    REDIS_AVAILABLE = False
-
-if REDIS_AVAILABLE:
-    CHANNEL_LAYERS = {
-        'default': {
-            'BACKEND': 'channels_redis.core.RedisChannelLayer',
-            'CONFIG': {
-                "hosts": [(os.environ.get('REDIS_HOST', '127.0.0.1'), int(os.environ.get('REDIS_PORT', '6379')))],
-            },
+# Cache configuration
+# Файловый кэш общий для всех воркеров gunicorn на одном сервере, поэтому
+# версия меню и снимки меню видны каждому процессу сразу после изменения.
+# Стандартный FileBasedCache после 300 файлов удалял случайную треть кэша
+# вместе с бессрочными версиями; FileCache чистит только ключи со сроком
+# жизни и не чаще раза в CULL_INTERVAL секунд (см. hotel.cache_backends)
+CACHES = {
+    'default': {
+        'BACKEND': 'hotel.cache_backends.FileCache',
+        'LOCATION': os.environ.get('CACHE_DIR', str(BASE_DIR / 'cache')),
+        'TIMEOUT': 60 * 60 * 24,
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', 100000)),
+            'CULL_INTERVAL': 60,
         },
     }
-else:
-    # Используем in-memory channel layer если Redis недоступен
-    CHANNEL_LAYERS = {
-        'default': {
-            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+}
+
+# Channels configuration
+# Redis проверяется в фоне при первой отправке (не при импорте настроек);
+# пока Redis недоступен, процессы одного сервера обмениваются событиями
+# через файл SQLite (см. hotel.channel_layers)
+REDIS_HOST = os.environ.get('REDIS_HOST', '127.0.0.1')
+REDIS_PORT = int(os.environ.get('REDIS_PORT', '6379'))
+
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'hotel.channel_layers.RedisFallbackChannelLayer',
+        'CONFIG': {
+            'hosts': [{'host': REDIS_HOST, 'port': REDIS_PORT, 'socket_connect_timeout': 1}],
+            'path': os.environ.get('CHANNELS_DB', str(BASE_DIR / 'channels.sqlite3')),
         },
-    }
+    },
+}
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -198,12 +206,42 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Site URL for QR code generation
 SITE_URL = os.environ.get('SITE_URL', 'https://xn-----8kc3aabmtd0dn4l.xn--p1ai')
 
+# Number of processes rendering PNGs for the QR ZIP export (0 - in the request process)
+QR_EXPORT_WORKERS = int(os.environ.get('QR_EXPORT_WORKERS', os.cpu_count() or 1))
+
+# When QR codes for new buildings/floors/rooms are rendered:
+# 'sync' - in save(), 'deferred' - later by `python manage.py qr_worker`
+QR_GENERATION = os.environ.get('QR_GENERATION', 'sync')
+
+# Auto-archiving: 'done' orders leave the live dashboard after this many minutes (0 - off),
+# checked from dashboard requests at most once per interval (seconds) and by `manage.py archive_orders`
+ORDER_AUTO_ARCHIVE_MINUTES = int(os.environ.get('ORDER_AUTO_ARCHIVE_MINUTES', 120))
+ORDER_AUTO_ARCHIVE_INTERVAL = int(os.environ.get('ORDER_AUTO_ARCHIVE_INTERVAL', 300))
+# Archived orders older than this many days move to the archive tables (0 - keep in place)
+ORDER_ARCHIVE_MOVE_DAYS = int(os.environ.get('ORDER_ARCHIVE_MOVE_DAYS', 0))
+
+# Guest cart storage: 'hotel.cart.DatabaseCartStore' (CartItem table, atomic on any cache) or
+# 'hotel.cart.CacheCartStore' (needs a cache with atomic incr - Redis/Memcached, not FileBasedCache)
+CART_STORE = os.environ.get('CART_STORE', 'hotel.cart.DatabaseCartStore')
+
+# Per-view timings and query counts (hotel.perf): report at /dashboard/perf/,
+# Prometheus text at /dashboard/perf/metrics/ (staff or "Authorization: Bearer <PERF_METRICS_TOKEN>")
+PERF_MONITORING = os.environ.get('PERF_MONITORING', 'true').lower() == 'true'
+PERF_BUFFER_SIZE = int(os.environ.get('PERF_BUFFER_SIZE', 5000))
+PERF_METRICS_TOKEN = os.environ.get('PERF_METRICS_TOKEN', '')
+# Share of requests run under cProfile (0 - off); profiles slower than the threshold go to PERF_PROFILE_DIR
+PERF_PROFILE_SAMPLE_RATE = float(os.environ.get('PERF_PROFILE_SAMPLE_RATE', 0))
+PERF_PROFILE_THRESHOLD_MS = int(os.environ.get('PERF_PROFILE_THRESHOLD_MS', 500))
+PERF_PROFILE_DIR = os.environ.get('PERF_PROFILE_DIR', str(BASE_DIR / 'perf_profiles'))
+
 # Telegram Bot Settings
 TELEGRAM_BOT_TOKEN = os.environ.get('TELEGRAM_BOT_TOKEN', '')
 TELEGRAM_CHAT_ID = os.environ.get('TELEGRAM_CHAT_ID', '')
 
 # Session settings
 SESSION_COOKIE_AGE = 86400  # 24 hours
+# Сессия, уже сохраненная в запросе (ключ корзины гостя), не перезаписывается повторно
+SESSION_ENGINE = 'hotel.sessions'
 
 # Login settings
 LOGIN_URL = '/accounts/login/'